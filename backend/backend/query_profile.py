@@ -0,0 +1,199 @@
+"""
+请求级 SQL 分析中间件
+用 connection.execute_wrapper 记录每个请求执行的语句和耗时（不依赖 DEBUG），请求结束后：
+
+- 管理员（is_staff）的请求附带 Server-Timing 响应头：db（数据库耗时和查询数）、app（请求总耗时），
+  浏览器开发者工具的 Timing 面板可直接查看
+- 按 QUERY_PROFILE_SAMPLE_RATE 抽样的请求（管理员请求总是计入）：语句去掉参数和 IN 列表长度后
+  作为指纹，同一指纹在一个请求中执行超过 QUERY_PROFILE_N_PLUS_ONE_THRESHOLD 次判定为 N+1，
+  记录日志并计入按路由滚动的报告（每个路由保留最近 QUERY_PROFILE_WINDOW 个请求）
+
+未抽中的请求只在列表中追加 (语句, 耗时)，不计算指纹，生产环境可以常开。
+报告保存在进程内，管理员可通过 /api/query-profile/ 查看当前进程的统计（DELETE 清空）。
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+# 报告中每条语句保留的长度
+SQL_PREVIEW_LENGTH = 300
+
+
+def fingerprint(sql):
+    """语句指纹：IN 列表折叠为 IN (...)，字符串和数字字面量替换为 ?"""
+    return _LITERAL.sub('?', _IN_LIST.sub('IN (...)', sql))
+
+
+class QueryRecorder:
+    """execute_wrapper：记录 (语句, 耗时秒数)"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def db_time(self):
+        return sum(duration for _, duration in self.queries)
+
+
+def repeated_statements(queries, threshold):
+    """执行次数超过 threshold 的语句指纹：[{'sql', 'count', 'time_ms'}, ...]，按次数降序"""
+    counts = Counter()
+    times = defaultdict(float)
+    for sql, duration in queries:
+        key = fingerprint(sql)
+        counts[key] += 1
+        times[key] += duration
+    return [
+        {'sql': key[:SQL_PREVIEW_LENGTH], 'count': count, 'time_ms': round(times[key] * 1000, 2)}
+        for key, count in counts.most_common()
+        if count > threshold
+    ]
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class RouteReport:
+    """单个路由最近若干请求的统计，以及出现过的 N+1 语句"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)  # (查询数, 数据库毫秒, 总毫秒)
+        self.total_requests = 0
+        self.n_plus_one = {}  # 指纹 -> {'sql', 'max_count', 'requests', 'last_seen'}
+
+    def add(self, query_count, db_ms, total_ms, repeated):
+        self.samples.append((query_count, db_ms, total_ms))
+        self.total_requests += 1
+        for item in repeated:
+            entry = self.n_plus_one.setdefault(item['sql'], {'sql': item['sql'], 'max_count': 0, 'requests': 0})
+            entry['max_count'] = max(entry['max_count'], item['count'])
+            entry['requests'] += 1
+            entry['last_seen'] = time.time()
+
+    def summary(self):
+        queries = [sample[0] for sample in self.samples]
+        db_ms = [sample[1] for sample in self.samples]
+        total_ms = [sample[2] for sample in self.samples]
+        return {
+            'requests': self.total_requests,
+            'window': len(self.samples),
+            'queries': {
+                'avg': round(sum(queries) / len(queries), 1),
+                'p50': _percentile(queries, 50),
+                'p95': _percentile(queries, 95),
+                'max': max(queries),
+            },
+            'db_ms': {'p50': round(_percentile(db_ms, 50), 2), 'p95': round(_percentile(db_ms, 95), 2)},
+            'total_ms': {'p50': round(_percentile(total_ms, 50), 2), 'p95': round(_percentile(total_ms, 95), 2)},
+            'n_plus_one': sorted(self.n_plus_one.values(), key=lambda entry: -entry['requests']),
+        }
+
+
+class QueryProfile:
+    """进程内按路由的滚动报告"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, query_count, db_ms, total_ms, repeated):
+        with self.lock:
+            report = self.routes.get(route)
+            if report is None:
+                report = self.routes[route] = RouteReport(settings.QUERY_PROFILE_WINDOW)
+            report.add(query_count, db_ms, total_ms, repeated)
+
+    def summary(self, route=None):
+        with self.lock:
+            return {
+                name: report.summary()
+                for name, report in sorted(self.routes.items())
+                if route is None or name == route
+            }
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+
+
+profile = QueryProfile()
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+def _is_staff(request):
+    # DRF 认证后会把用户写回底层 HttpRequest
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+class QueryProfileMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_PROFILE_ENABLED:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        sampled = random.random() < settings.QUERY_PROFILE_SAMPLE_RATE
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = recorder.db_time * 1000
+
+        staff = _is_staff(request)
+        if staff:
+            response['Server-Timing'] = (
+                f'db;dur={db_ms:.1f};desc="{len(recorder.queries)} queries", app;dur={total_ms:.1f}'
+            )
+        if sampled or staff:
+            self.analyze(request, recorder.queries, db_ms, total_ms)
+        return response
+
+    def analyze(self, request, queries, db_ms, total_ms):
+        route = _route(request)
+        repeated = repeated_statements(queries, settings.QUERY_PROFILE_N_PLUS_ONE_THRESHOLD)
+        for item in repeated:
+            logger.warning('疑似 N+1 查询 %s：同一语句执行 %d 次: %s', route, item['count'], item['sql'])
+        profile.record(route, len(queries), db_ms, total_ms, repeated)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def query_profile_report(request):
+    """按路由的查询数、数据库耗时分布和 N+1 语句（当前进程）；?route= 只看指定路由，DELETE 清空"""
+    if request.method == 'DELETE':
+        profile.reset()
+        return Response(status=204)
+    return Response(profile.summary(request.query_params.get('route')))
@@ -0,0 +1,214 @@
+"""
+令牌桶限流中间件
+按 (路由, 用户或 IP) 维护令牌桶：桶容量为 burst，每秒补充 rate 个令牌，每个请求消耗一个，
+桶空时返回 429 和 Retry-After。需要限流的路由及参数在 settings.RATE_LIMITS 中配置：
+
+    RATE_LIMITS = {
+        'login': {'rate': '10/m', 'burst': 5, 'key': 'ip', 'methods': ['POST']},
+        'shopping:spu-list': {'rate': '120/m', 'burst': 30, 'param': 'search'},
+    }
+
+- 键为 URL 名称（带命名空间），rate 支持 /s /m /h /d，burst 默认等于每分钟的令牌数
+- key：'ip' 按客户端 IP；'user'（默认）已登录按用户、未登录按 IP。
+  用户 ID 从 JWT 中读取（只验签，不查库），中间件执行时 DRF 尚未认证
+- methods：只限制这些方法（默认全部）；param：只在带该查询参数时限制（如搜索）
+
+RATE_LIMIT_CACHE 指向的缓存为 Redis 时，用 Lua 脚本在 Redis 中原子地更新令牌桶，多个进程共享；
+否则（或 Redis 出错时）使用进程内令牌桶，不加锁：并发更新偶尔会多放行个别请求，可以接受。
+
+被拒绝的请求按路由计数：进程内计数器 + 共享缓存计数器，管理员可通过 /api/ratelimit/stats/ 查看。
+"""
+import logging
+import math
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.http import JsonResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# 本进程被拒绝的请求数（按路由）
+shed_counters = Counter()
+
+# KEYS[1] 桶；ARGV: 容量, 每秒令牌数, 当前时间（秒）
+# 返回 {是否放行, 需要等待的毫秒数}
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, wait}
+"""
+
+
+def parse_rate(rate):
+    """'10/m' -> 每秒令牌数"""
+    count, period = rate.split('/')
+    return int(count) / _PERIODS[period.strip()[0]]
+
+
+class RateLimitRule:
+
+    def __init__(self, route, config):
+        self.route = route
+        self.rate = parse_rate(config['rate'])
+        self.burst = int(config.get('burst') or max(1, round(self.rate * 60)))
+        self.key = config.get('key', 'user')
+        self.methods = {method.upper() for method in config.get('methods', [])}
+        self.param = config.get('param')
+
+    def applies(self, request):
+        if self.methods and request.method not in self.methods:
+            return False
+        return not self.param or bool(request.GET.get(self.param))
+
+
+class LocalTokenBuckets:
+    """进程内令牌桶：状态为不可变元组，整体替换，不加锁"""
+
+    MAX_BUCKETS = 100000
+
+    def __init__(self):
+        self.buckets = {}
+
+    def take(self, rule, ident, now):
+        key = (rule.route, ident)
+        tokens, ts = self.buckets.get(key, (rule.burst, now))
+        tokens = min(rule.burst, tokens + max(0.0, now - ts) * rule.rate)
+        if tokens >= 1:
+            self.buckets[key] = (tokens - 1, now)
+            return True, 0
+        self.buckets[key] = (tokens, now)
+        return False, (1 - tokens) / rule.rate
+
+    def prune(self, rules, now):
+        """桶数过多时丢弃已回满的桶（与新建的桶等价）"""
+        if len(self.buckets) < self.MAX_BUCKETS:
+            return
+        for key, (tokens, ts) in list(self.buckets.items()):
+            rule = rules.get(key[0])
+            if rule is None or tokens + (now - ts) * rule.rate >= rule.burst:
+                self.buckets.pop(key, None)
+
+
+def client_ip(request):
+    if settings.RATE_LIMIT_TRUST_X_FORWARDED_FOR:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _jwt_user_id(request):
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(header) != 2 or header[0] not in jwt_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        return AccessToken(header[1])[jwt_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+
+
+def identity(request, key):
+    if key == 'user':
+        user_id = _jwt_user_id(request)
+        if user_id is None and request.user.is_authenticated:
+            user_id = request.user.pk
+        if user_id is not None:
+            return f'user:{user_id}'
+    return f'ip:{client_ip(request)}'
+
+
+class RateLimitMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rules = {route: RateLimitRule(route, config) for route, config in settings.RATE_LIMITS.items()}
+        self.cache = caches[settings.RATE_LIMIT_CACHE]
+        self.local = LocalTokenBuckets()
+        self.script = None
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.RATE_LIMIT_ENABLED:
+            return None
+        rule = self.rules.get(request.resolver_match.view_name)
+        if rule is None or not rule.applies(request):
+            return None
+
+        allowed, wait = self.take(rule, identity(request, rule.key))
+        if allowed:
+            return None
+
+        record_shed(self.cache, rule.route)
+        response = JsonResponse({'error': '请求过于频繁，请稍后再试'}, status=429)
+        response['Retry-After'] = str(max(1, math.ceil(wait)))
+        return response
+
+    def take(self, rule, ident):
+        """消耗一个令牌，返回 (是否放行, 需要等待的秒数)"""
+        now = time.time()
+        if isinstance(self.cache, RedisCache):
+            key = self.cache.make_and_validate_key(f'ratelimit:{rule.route}:{ident}')
+            try:
+                if self.script is None:
+                    client = self.cache._cache.get_client(key, write=True)
+                    self.script = client.register_script(_TOKEN_BUCKET_LUA)
+                allowed, wait_ms = self.script(keys=[key], args=[rule.burst, rule.rate, now])
+                return bool(allowed), wait_ms / 1000
+            except Exception:
+                logger.warning('Redis 限流失败，使用进程内令牌桶', exc_info=True)
+        self.local.prune(self.rules, now)
+        return self.local.take(rule, ident, now)
+
+
+def record_shed(cache, route):
+    shed_counters[route] += 1
+    key = f'ratelimit:shed:{route}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+    except Exception:
+        logger.warning('记录限流计数失败: %s', route, exc_info=True)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def ratelimit_stats(request):
+    """各路由被拒绝的请求数：total 为所有进程合计（共享缓存），process 为当前进程"""
+    cache = caches[settings.RATE_LIMIT_CACHE]
+    totals = cache.get_many([f'ratelimit:shed:{route}' for route in settings.RATE_LIMITS])
+    return Response({
+        route: {
+            'total': totals.get(f'ratelimit:shed:{route}', 0),
+            'process': shed_counters[route],
+        }
+        for route in settings.RATE_LIMITS
+    })
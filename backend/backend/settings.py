@@ -61,6 +61,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.query_profile.QueryProfileMiddleware',  # 请求级 SQL 统计与 N+1 检测（见 QUERY_PROFILE_*）
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware', # CORS 中间件
@@ -69,6 +70,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.ratelimit.RateLimitMiddleware',  # 令牌桶限流（见 RATE_LIMITS）
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -105,6 +107,19 @@ DATABASES = {
     }
 }
 
+# ==================== 缓存配置 ====================
+# 限流、已购权益、发布目录版本号、JWT 认证用户缓存、令牌吊销序号都需要多进程共享的缓存。
+# 设置 REDIS_URL（如 redis://127.0.0.1:6379/1）时使用 Redis；未设置时为进程内缓存（LocMem），
+# 只适合单进程开发，多进程部署时各功能的退化情况见 backend/shared_cache.py
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -146,6 +161,18 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# 上传文件使用内容寻址去重存储：相同内容只保存一份，模型路径为指向它的硬链接（见 backend/storage.py）
+STORAGES = {
+    'default': {
+        'BACKEND': 'backend.storage.DedupFileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# blob 存放目录（相对 MEDIA_ROOT）
+DEDUP_BLOB_DIR = '.blobs'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -159,7 +186,7 @@ AUTH_USER_MODEL = 'user.User'
 REST_FRAMEWORK = {
     # 默认认证方式
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # JWT 认证
+        'user.authentication.CachedJWTAuthentication',  # JWT 认证（用户对象短时缓存）
     ],
     
     # 默认权限
@@ -180,7 +207,7 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=12),      # 访问令牌 12 小时有效
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),      # 刷新令牌 7 天有效
     'ROTATE_REFRESH_TOKENS': True,                    # 刷新后轮换令牌
-    'BLACKLIST_AFTER_ROTATION': True,                 # 旧令牌加入黑名单
+    'BLACKLIST_AFTER_ROTATION': True,                 # 旧令牌加入吊销表（见 user.revocation）
     'UPDATE_LAST_LOGIN': True,                       # 更新最后登录时间
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
@@ -188,6 +215,21 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
 }
 
+# JWT 认证缓存用户对象的时间（秒），用户信息变化时会主动清除；默认缓存不是共享缓存（LocMem）时不缓存
+AUTH_PRINCIPAL_CACHE_SECONDS = int(os.environ.get('AUTH_PRINCIPAL_CACHE_SECONDS', '60'))
+
+# 令牌吊销：布隆过滤器初始容量、进程同步吊销记录的间隔（秒）、清理过期记录的间隔（秒）
+TOKEN_REVOCATION_BLOOM_CAPACITY = int(os.environ.get('TOKEN_REVOCATION_BLOOM_CAPACITY', '100000'))
+TOKEN_REVOCATION_REFRESH_SECONDS = int(os.environ.get('TOKEN_REVOCATION_REFRESH_SECONDS', '5'))
+TOKEN_REVOCATION_COMPACT_SECONDS = int(os.environ.get('TOKEN_REVOCATION_COMPACT_SECONDS', '3600'))
+
+# 账户注销：提交后账户立即停用，关联数据由后台任务分批删除（见 user.account_deletion）
+# 关闭 ACCOUNT_DELETION_BACKGROUND 时在请求事务提交后同步执行
+ACCOUNT_DELETION_BACKGROUND = os.environ.get('ACCOUNT_DELETION_BACKGROUND', 'True') == 'True'
+ACCOUNT_DELETION_BATCH_SIZE = int(os.environ.get('ACCOUNT_DELETION_BATCH_SIZE', '500'))
+# 执行中的任务超过该时间（秒）没有进展视为已中断，可由 resume_account_deletions 继续
+ACCOUNT_DELETION_STALE_SECONDS = int(os.environ.get('ACCOUNT_DELETION_STALE_SECONDS', '600'))
+
 # ==================== CORS 配置 ====================
 # 开发环境：允许所有来源（生产环境必须关闭）
 CORS_ALLOW_ALL_ORIGINS = os.environ.get('CORS_ALLOW_ALL_ORIGINS', 'True') == 'True'
@@ -218,4 +260,90 @@ LOGOUT_REDIRECT_URL = '/'
 # ==================== Stripe 配置 ====================
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY')
-STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
\ No newline at end of file
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+
+# ==================== 论坛搜索配置 ====================
+# 单次搜索最多返回的帖子数（按 BM25 得分截断）
+FORUM_SEARCH_MAX_RESULTS = int(os.environ.get('FORUM_SEARCH_MAX_RESULTS', '1000'))
+# 按标签过滤需要数据库排序（指定 ordering、热门列表等）时，交集不超过该数量才以 id IN (...) 回表，
+# 否则把交集写入连接上的临时表、以子查询过滤，避免超长的 IN 列表
+FORUM_TAG_FILTER_MAX_INLINE_IDS = int(os.environ.get('FORUM_TAG_FILTER_MAX_INLINE_IDS', '1000'))
+
+# ==================== 论坛热度配置 ====================
+# 热度 = log10(1 + 回复数×回复权重 + 收藏数×收藏权重 + 关联商品销量×销量权重) + 发帖时间戳 / 衰减周期
+FORUM_HOT_REPLY_WEIGHT = float(os.environ.get('FORUM_HOT_REPLY_WEIGHT', '1'))
+FORUM_HOT_FAVORITE_WEIGHT = float(os.environ.get('FORUM_HOT_FAVORITE_WEIGHT', '2'))
+FORUM_HOT_SALES_WEIGHT = float(os.environ.get('FORUM_HOT_SALES_WEIGHT', '0.5'))
+# 衰减周期（秒）：晚发一个周期的帖子需要多 10 倍互动量才能排在同一位置
+FORUM_HOT_DECAY_SECONDS = int(os.environ.get('FORUM_HOT_DECAY_SECONDS', '45000'))
+
+# ==================== 媒体文件回收配置 ====================
+# collect_orphan_media 命令只处理修改时间早于宽限期的文件，避免误删正在上传的文件
+MEDIA_GC_GRACE_SECONDS = int(os.environ.get('MEDIA_GC_GRACE_SECONDS', '86400'))
+MEDIA_GC_WORKERS = int(os.environ.get('MEDIA_GC_WORKERS', '4'))
+
+# ==================== 图片处理配置 ====================
+# 生成商品图片变体、计算图片元数据（尺寸/主色/blurhash）、分析音频的进程数，0 表示在请求进程中同步处理（开发环境）
+IMAGE_PROCESS_WORKERS = int(os.environ.get('IMAGE_PROCESS_WORKERS', '2'))
+
+# ==================== 音频分析配置 ====================
+# 非 WAV 格式通过 ffprobe 读取时长/比特率/采样率、通过 ffmpeg 解码计算波形
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = os.environ.get('FFPROBE_BINARY', 'ffprobe')
+# 波形峰值的段数（每段 1 字节）
+AUDIO_WAVEFORM_PEAKS = int(os.environ.get('AUDIO_WAVEFORM_PEAKS', '800'))
+
+# ==================== 受保护媒体配置 ====================
+# 已购音乐下载：'nginx' 使用 X-Accel-Redirect，'sendfile' 使用 X-Sendfile，留空由 Django 直接返回文件（开发环境）
+PROTECTED_MEDIA_SERVER = os.environ.get('PROTECTED_MEDIA_SERVER', '')
+# X-Accel-Redirect 的内部路径前缀，nginx 中需配置为 internal 并指向 MEDIA_ROOT：
+#     location /protected-media/ { internal; alias /path/to/media/; }
+# 公开的 /media/ 不能直接提供音乐文件（需购买的音乐只能凭签名播放、下载）和去重存储的 blob 目录：
+#     location /media/publish/music/ { deny all; }
+#     location /media/.blobs/ { deny all; }
+PROTECTED_MEDIA_INTERNAL_URL = os.environ.get('PROTECTED_MEDIA_INTERNAL_URL', '/protected-media/')
+# 签名下载 URL 的有效期（秒）
+PROTECTED_MEDIA_URL_TTL = int(os.environ.get('PROTECTED_MEDIA_URL_TTL', '300'))
+# 用户已购商品集合的缓存时间（秒），购买记录变化时会主动清除
+ENTITLEMENT_CACHE_SECONDS = int(os.environ.get('ENTITLEMENT_CACHE_SECONDS', '600'))
+
+# ==================== 发布目录缓存配置 ====================
+# 艺术家/专辑/音乐/视频/公告列表的缓存时间（秒），相关数据变化时会主动失效
+PUBLISH_CATALOG_CACHE_SECONDS = int(os.environ.get('PUBLISH_CATALOG_CACHE_SECONDS', '600'))
+
+# ==================== 分片上传配置 ====================
+# 分片临时目录（不要放在 MEDIA_ROOT 下，否则会被当作未引用文件回收）
+CHUNKED_UPLOAD_DIR = os.environ.get('CHUNKED_UPLOAD_DIR', os.path.join(BASE_DIR, 'chunked_uploads'))
+# 默认分片大小与上限（字节）
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.environ.get('CHUNKED_UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = int(os.environ.get('CHUNKED_UPLOAD_MAX_CHUNK_SIZE', str(64 * 1024 * 1024)))
+# 单个文件大小上限（字节）
+CHUNKED_UPLOAD_MAX_SIZE = int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', str(8 * 1024 * 1024 * 1024)))
+# 超过该时间（秒）没有新分片的未完成上传由 sweep_chunked_uploads 清理
+CHUNKED_UPLOAD_EXPIRE_SECONDS = int(os.environ.get('CHUNKED_UPLOAD_EXPIRE_SECONDS', '86400'))
+
+# ==================== 限流配置 ====================
+# 令牌桶限流（backend/ratelimit.py）：键为 URL 名称，rate 为补充速率，burst 为桶容量
+# key: 'ip' 按 IP，'user' 已登录按用户、未登录按 IP；methods: 只限制这些方法；param: 只在带该查询参数时限制
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True') == 'True'
+RATE_LIMIT_CACHE = os.environ.get('RATE_LIMIT_CACHE', 'default')  # 为 Redis 缓存时多进程共享令牌桶
+# 位于反向代理之后时开启，从 X-Forwarded-For 读取客户端 IP
+RATE_LIMIT_TRUST_X_FORWARDED_FOR = os.environ.get('RATE_LIMIT_TRUST_X_FORWARDED_FOR', 'False') == 'True'
+RATE_LIMITS = {
+    'login': {'rate': '10/m', 'burst': 5, 'key': 'ip', 'methods': ['POST']},
+    'register': {'rate': '5/h', 'burst': 3, 'key': 'ip', 'methods': ['POST']},
+    'toggle_post_favorite': {'rate': '30/m', 'burst': 10, 'methods': ['POST']},
+    'toggle_product_favorite': {'rate': '30/m', 'burst': 10, 'methods': ['POST']},
+    'add_to_cart': {'rate': '60/m', 'burst': 20, 'methods': ['POST']},
+    'shopping:spu-list': {'rate': '60/m', 'burst': 20, 'param': 'search'},
+}
+
+# ==================== SQL 分析配置 ====================
+# 记录每个请求的查询数和数据库耗时（backend/query_profile.py）；管理员请求附带 Server-Timing 响应头
+QUERY_PROFILE_ENABLED = os.environ.get('QUERY_PROFILE_ENABLED', 'True') == 'True'
+# 计入按路由报告的请求比例（0-1），管理员请求总是计入
+QUERY_PROFILE_SAMPLE_RATE = float(os.environ.get('QUERY_PROFILE_SAMPLE_RATE', '0.05'))
+# 同一语句在一个请求中执行超过该次数判定为 N+1
+QUERY_PROFILE_N_PLUS_ONE_THRESHOLD = int(os.environ.get('QUERY_PROFILE_N_PLUS_ONE_THRESHOLD', '5'))
+# 每个路由保留最近多少个请求的统计
+QUERY_PROFILE_WINDOW = int(os.environ.get('QUERY_PROFILE_WINDOW', '200'))
@@ -0,0 +1,59 @@
+"""
+共享缓存判断
+LocMemCache 是进程内缓存：多个 worker 各有一份，一个进程中的写入和失效其他进程看不到。
+依赖缓存跨进程一致的功能：
+
+- 限流令牌桶（RATE_LIMIT_CACHE）：不共享时按进程分别计数，实际上限为 worker 数倍
+- 已购权益缓存、JWT 认证用户缓存：不共享时不缓存，每次查库
+- 令牌吊销序号 / 代数：不共享时各进程每个同步周期都增量加载吊销记录
+- 发布目录版本号：不共享时其他进程在缓存过期（PUBLISH_CATALOG_CACHE_SECONDS）前返回旧数据
+
+多进程部署应配置 REDIS_URL（见 settings 缓存配置）。未配置时 `manage.py check --deploy` 给出警告，
+DEBUG 关闭的进程启动时记录错误日志。
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+logger = logging.getLogger(__name__)
+
+
+def is_shared_cache(alias='default'):
+    """缓存是否在多个进程间共享（LocMemCache 不共享）"""
+    return not isinstance(caches[alias], LocMemCache)
+
+
+def unshared_cache_features():
+    """使用了进程内缓存的功能说明列表"""
+    features = []
+    if settings.RATE_LIMIT_ENABLED and not is_shared_cache(settings.RATE_LIMIT_CACHE):
+        features.append(f'限流（RATE_LIMIT_CACHE={settings.RATE_LIMIT_CACHE!r}）按进程计数')
+    if not is_shared_cache():
+        features.extend([
+            '已购权益、JWT 认证用户不缓存',
+            '令牌吊销记录按周期轮询数据库',
+            '发布目录缓存在其他进程中不能及时失效',
+        ])
+    return features
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    features = unshared_cache_features()
+    if not features:
+        return []
+    return [Warning(
+        '缓存不是多进程共享的（LocMemCache）：' + '；'.join(features),
+        hint='设置 REDIS_URL 使用 Redis 缓存',
+        id='backend.W001',
+    )]
+
+
+def log_unshared_cache():
+    """DEBUG 关闭时（生产环境）在进程启动时记录错误"""
+    features = unshared_cache_features()
+    if features and not settings.DEBUG:
+        logger.error('缓存不是多进程共享的（LocMemCache），请设置 REDIS_URL：%s', '；'.join(features))
@@ -0,0 +1,209 @@
+"""
+内容寻址去重存储
+上传文件按 SHA-256 摘要只保存一份实体（blob），存放在 MEDIA_ROOT/<DEDUP_BLOB_DIR>/ab/cd/<digest><ext>；
+模型中的文件路径（upload_to 生成的路径）是指向该 blob 的硬链接。
+
+- 引用计数即文件系统的硬链接数：blob 的 st_nlink - 1 为引用它的文件数
+- 上传时先流式计算摘要，blob 已存在则只创建硬链接，不写入文件内容
+- 删除最后一个引用时同时删除 blob。blob 的摘要记录在 inode 的扩展属性（user.dedup.sha256）上，
+  所有硬链接共享，删除时直接拼出 blob 路径；平台或文件系统不支持扩展属性时才重新计算摘要
+- FileField 的 url / path / open / delete 等接口不变，已有模型无需修改
+
+注意：所有引用同一内容的文件是同一个 inode。通过任一路径原地写入（以 r+ / a 模式打开、
+把处理结果保存回原路径等）会同时改变所有引用该内容的文件和 blob，且内容与摘要不再一致。
+修改文件必须另存为新文件（通过 storage.save），不能覆盖原路径。
+"""
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files import locks
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+CHUNK_SIZE = 64 * 1024
+DIGEST_XATTR = 'user.dedup.sha256'
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _record_digest(path, digest):
+    """把摘要记录在 inode 的扩展属性上（所有硬链接共享）；不支持时忽略"""
+    try:
+        os.setxattr(path, DIGEST_XATTR, digest.encode())
+    except (AttributeError, OSError):
+        pass
+
+
+def _recorded_digest(path):
+    try:
+        return os.getxattr(path, DIGEST_XATTR).decode()
+    except (AttributeError, OSError):
+        return None
+
+
+class DedupFileSystemStorage(FileSystemStorage):
+
+    @property
+    def blob_dir(self):
+        return getattr(settings, 'DEDUP_BLOB_DIR', '.blobs')
+
+    def blob_path(self, digest, ext=''):
+        """按摘要前 4 位分两级目录，避免单目录文件过多"""
+        return os.path.join(self.location, self.blob_dir, digest[:2], digest[2:4], digest + ext.lower())
+
+    def _hash_content(self, content):
+        """流式计算上传内容的摘要；内容不可回退时返回 None"""
+        try:
+            content.seek(0)
+        except (AttributeError, OSError, ValueError):
+            return None
+        digest = hashlib.sha256()
+        for chunk in content.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+
+    def _write_blob(self, content, ext, digest=None):
+        """写入临时文件（摘要未知时边写边计算），再移动到 blob 位置；返回 blob 路径"""
+        tmp_dir = os.path.join(self.location, self.blob_dir, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+
+        if hasattr(content, 'temporary_file_path'):
+            # 大文件已在磁盘临时目录中，直接移动而不是重新写入
+            if digest is None:
+                digest = _hash_file(content.temporary_file_path())
+            file_move_safe(content.temporary_file_path(), tmp_path)
+        else:
+            hasher = hashlib.sha256()
+            with open(tmp_path, 'wb') as f:
+                locks.lock(f, locks.LOCK_EX)
+                for chunk in content.chunks(CHUNK_SIZE):
+                    hasher.update(chunk)
+                    f.write(chunk)
+            digest = hasher.hexdigest()
+
+        blob = self.blob_path(digest, ext)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        if os.path.exists(blob):
+            os.remove(tmp_path)  # 并发上传了相同内容
+        else:
+            _record_digest(tmp_path, digest)
+            os.replace(tmp_path, blob)
+        return blob
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1]
+        digest = self._hash_content(content)
+        blob = self.blob_path(digest, ext) if digest else None
+        if blob is None or not os.path.exists(blob):
+            blob = self._write_blob(content, ext, digest)
+
+        # 与 FileSystemStorage 一致：路径冲突时换一个可用名称
+        while True:
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                os.link(blob, full_path)
+                break
+            except FileExistsError:
+                name = self.get_available_name(name)
+            except FileNotFoundError:
+                # blob 恰好被并发删除，重新写入
+                blob = self._write_blob(content, ext, digest)
+
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return str(name).replace('\\', '/')
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        full_path = self.path(name)
+        try:
+            stat = os.stat(full_path)
+        except FileNotFoundError:
+            return
+
+        # 只剩 blob 和当前文件两个链接时，删除后 blob 不再被引用
+        orphan_blob = None
+        if stat.st_nlink == 2:
+            digest = _recorded_digest(full_path) or _hash_file(full_path)
+            candidate = self.blob_path(digest, os.path.splitext(name)[1])
+            if os.path.exists(candidate) and os.path.samefile(candidate, full_path):
+                orphan_blob = candidate
+
+        super().delete(name)
+        if orphan_blob:
+            try:
+                os.remove(orphan_blob)
+            except FileNotFoundError:
+                pass
+
+    def ref_count(self, name):
+        """引用该文件内容的模型文件数量"""
+        try:
+            return os.stat(self.path(name)).st_nlink - 1
+        except FileNotFoundError:
+            return 0
+
+    def adopt(self, name):
+        """
+        将去重存储启用前保存的文件纳入 blob 管理：
+        内容已有 blob 时用硬链接替换该文件（释放重复空间），否则为它建立 blob
+        返回释放的字节数
+        """
+        full_path = self.path(name)
+        stat = os.stat(full_path)
+        if stat.st_nlink > 1:
+            # 已经是 blob 的链接；补记较早写入的 blob 缺少的摘要
+            if _recorded_digest(full_path) is None:
+                _record_digest(full_path, _hash_file(full_path))
+            return 0
+        digest = _hash_file(full_path)
+        blob = self.blob_path(digest, os.path.splitext(name)[1])
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        if not os.path.exists(blob):
+            _record_digest(full_path, digest)
+            os.link(full_path, blob)
+            return 0
+        tmp_link = f'{full_path}.{uuid.uuid4().hex}.tmp'
+        os.link(blob, tmp_link)
+        os.replace(tmp_link, full_path)
+        return stat.st_size
+
+    def prune_blobs(self, older_than=None):
+        """
+        删除不再被任何文件引用（硬链接数为 1）的 blob，返回删除数量
+        older_than 为时间戳，跳过刚写入、可能尚未建立链接的 blob
+        """
+        root = os.path.join(self.location, self.blob_dir)
+        removed = 0
+        stack = [root]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name != 'tmp':
+                            stack.append(entry.path)
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_nlink != 1:
+                        continue
+                    if older_than is not None and stat.st_mtime >= older_than:
+                        continue
+                    os.remove(entry.path)
+                    removed += 1
+        return removed
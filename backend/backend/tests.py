@@ -0,0 +1,184 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from user.authentication import tokens_for_user
+from user.models import User
+
+from .query_profile import QueryProfileMiddleware, fingerprint, profile, repeated_statements
+from .ratelimit import LocalTokenBuckets, RateLimitRule, parse_rate, shed_counters
+
+
+# ==================== 令牌桶限流 ====================
+
+class TokenBucketTests(SimpleTestCase):
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/s'), 10)
+        self.assertEqual(parse_rate('60/m'), 1)
+        self.assertEqual(parse_rate('7200/hour'), 2)
+
+    def test_default_burst_is_one_minute_of_tokens(self):
+        self.assertEqual(RateLimitRule('r', {'rate': '30/m'}).burst, 30)
+        self.assertEqual(RateLimitRule('r', {'rate': '1/h'}).burst, 1)
+
+    def test_burst_then_refill(self):
+        rule = RateLimitRule('r', {'rate': '1/s', 'burst': 2})
+        buckets = LocalTokenBuckets()
+        self.assertEqual([buckets.take(rule, 'a', 100)[0] for _ in range(3)], [True, True, False])
+        self.assertEqual(buckets.take(rule, 'a', 100.25), (False, 0.75))
+        self.assertTrue(buckets.take(rule, 'a', 101)[0])
+        # 其他客户端使用各自的桶
+        self.assertTrue(buckets.take(rule, 'b', 101)[0])
+
+    def test_prune_drops_full_buckets(self):
+        rule = RateLimitRule('r', {'rate': '1/s', 'burst': 2})
+        buckets = LocalTokenBuckets()
+        buckets.MAX_BUCKETS = 1
+        buckets.take(rule, 'a', 100)
+        buckets.take(rule, 'b', 100)
+        buckets.prune({'r': rule}, 100.5)
+        self.assertEqual(len(buckets.buckets), 2)
+        buckets.prune({'r': rule}, 102)
+        self.assertEqual(buckets.buckets, {})
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={
+    'login': {'rate': '1/m', 'burst': 2, 'key': 'ip', 'methods': ['POST']},
+    'add_to_cart': {'rate': '1/m', 'burst': 1, 'methods': ['POST']},
+})
+class RateLimitMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        shed_counters.clear()
+
+    def login(self, ip='10.0.0.1'):
+        return self.client.post('/api/login/', {'username': 'x', 'password': 'y'},
+                                content_type='application/json', REMOTE_ADDR=ip)
+
+    def test_429_with_retry_after(self):
+        self.assertNotEqual(self.login().status_code, 429)
+        self.assertNotEqual(self.login().status_code, 429)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), 60)
+        # 其他 IP 不受影响
+        self.assertNotEqual(self.login('10.0.0.2').status_code, 429)
+
+    def test_only_configured_methods_limited(self):
+        for _ in range(3):
+            self.login()
+        self.assertNotEqual(self.client.get('/api/login/', REMOTE_ADDR='10.0.0.1').status_code, 429)
+
+    def test_user_key_reads_jwt(self):
+        users = [User.objects.create_user(f'u{i}', f'u{i}@example.com', 'pw123456') for i in range(2)]
+
+        def add(user):
+            return self.client.post('/api/cart-add/', {}, content_type='application/json',
+                                    HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+
+        self.assertNotEqual(add(users[0]).status_code, 429)
+        self.assertEqual(add(users[0]).status_code, 429)
+        self.assertNotEqual(add(users[1]).status_code, 429)
+
+    def test_shed_requests_counted(self):
+        for _ in range(4):
+            self.login()
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw123456')
+        response = self.client.get('/api/ratelimit/stats/',
+                                   HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(admin).access_token}')
+        self.assertEqual(response.json()['login'], {'total': 2, 'process': 2})
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(3):
+            self.assertNotEqual(self.login().status_code, 429)
+
+
+# ==================== SQL 分析 ====================
+
+class FingerprintTests(SimpleTestCase):
+
+    def test_literals_and_in_lists_collapse(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "posts" WHERE "id" = 12 AND "title" = \'it\'\'s\''),
+            'SELECT * FROM "posts" WHERE "id" = ? AND "title" = ?',
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM "posts" WHERE "id" IN (%s, %s, %s)'),
+            fingerprint('SELECT * FROM "posts" WHERE "id" IN (%s)'),
+        )
+
+    def test_repeated_statements_over_threshold(self):
+        queries = [(f'SELECT * FROM "users" WHERE "id" = {i}', 0.001) for i in range(6)]
+        queries += [('SELECT * FROM "posts" LIMIT 20', 0.002)] * 5
+        repeated = repeated_statements(queries, 5)
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0]['sql'], 'SELECT * FROM "users" WHERE "id" = ?')
+        self.assertEqual((repeated[0]['count'], repeated[0]['time_ms']), (6, 6.0))
+
+
+@override_settings(QUERY_PROFILE_ENABLED=True, QUERY_PROFILE_SAMPLE_RATE=0, QUERY_PROFILE_N_PLUS_ONE_THRESHOLD=5)
+class QueryProfileMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        profile.reset()
+        self.addCleanup(profile.reset)
+        self.users = [User.objects.create_user(f'u{i}', f'u{i}@example.com', 'pw123456') for i in range(6)]
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw123456')
+
+    def n_plus_one_view(self, request):
+        # 逐个按主键查询：同一语句执行 6 次
+        for user in self.users:
+            User.objects.get(id=user.id)
+        return HttpResponse()
+
+    def call(self, user):
+        request = RequestFactory().get('/n-plus-one/')
+        request.user = user
+        return QueryProfileMiddleware(self.n_plus_one_view)(request)
+
+    def test_staff_request_reports_n_plus_one(self):
+        with self.assertLogs('backend.query_profile', 'WARNING'):
+            response = self.call(self.admin)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="6 queries", app;dur=[\d.]+$')
+        report = profile.summary()['unresolved']
+        self.assertEqual((report['requests'], report['queries']['max']), (1, 6))
+        self.assertEqual(len(report['n_plus_one']), 1)
+        self.assertEqual(report['n_plus_one'][0]['max_count'], 6)
+
+    def test_unsampled_request_not_analyzed(self):
+        response = self.call(self.users[0])
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(profile.summary(), {})
+
+    @override_settings(QUERY_PROFILE_SAMPLE_RATE=1)
+    def test_sampled_request_analyzed(self):
+        with self.assertLogs('backend.query_profile', 'WARNING'):
+            response = self.call(self.users[0])
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn('unresolved', profile.summary())
+
+    @override_settings(QUERY_PROFILE_ENABLED=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.call(self.admin))
+        self.assertEqual(profile.summary(), {})
+
+    def test_report_endpoint(self):
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {tokens_for_user(self.admin).access_token}'}
+        self.assertEqual(self.client.get('/api/query-profile/').status_code, 401)
+        user_auth = f'Bearer {tokens_for_user(self.users[0]).access_token}'
+        self.assertEqual(self.client.get('/api/query-profile/', HTTP_AUTHORIZATION=user_auth).status_code, 403)
+
+        response = self.client.get('/api/query-profile/', **auth)
+        self.assertIn('Server-Timing', response)
+        # 管理员请求总是计入报告，路由按 view_name 区分
+        report = self.client.get('/api/query-profile/', {'route': 'query_profile_report'}, **auth).json()
+        self.assertEqual(list(report), ['query_profile_report'])
+        self.assertEqual(report['query_profile_report']['requests'], 1)
+
+        self.assertEqual(self.client.delete('/api/query-profile/', **auth).status_code, 204)
+        # 清空后只剩 DELETE 请求本身
+        self.assertEqual(profile.summary()['query_profile_report']['requests'], 1)
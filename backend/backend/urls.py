@@ -23,10 +23,17 @@ from django.urls import path, include
 # 导入首页视图
 from shopping.index_views import index, index_login
 
+from publish.protected_media import serve_public_media
+
+from .query_profile import query_profile_report
+from .ratelimit import ratelimit_stats
+
 urlpatterns = [
     path('', index, name='index'),  # 首页
     path('login/', index_login, name='index_login'),  # 首页登录处理
     path('admin/', admin.site.urls),
+    path('api/ratelimit/stats/', ratelimit_stats, name='ratelimit_stats'),  # 限流统计（管理员）
+    path('api/query-profile/', query_profile_report, name='query_profile_report'),  # SQL 分析报告（管理员）
     path('api/', include('user.urls')),
     path('api/shopping/', include('shopping.urls')),  # API 路由
     path('api/', include('publish.urls')),
@@ -36,7 +43,8 @@ urlpatterns = [
 
 # ⭐ 开发环境：Django 提供文件服务
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # 音乐文件和 blob 目录不经 /media/ 提供（见 publish.protected_media）
+    urlpatterns += static(settings.MEDIA_URL, view=serve_public_media)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
 # 生产环境：由 Nginx 或云存储提供文件服务，不需要额外配置
\ No newline at end of file
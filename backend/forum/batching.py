@@ -0,0 +1,50 @@
+"""
+按事务合并的帖子维护任务
+同一事务中多次调度的帖子ID合并为一个集合，事务提交后只处理一次：
+删除一棵 N 条回复的子树（或注销账户时批量删除回复）只重建一次所在帖子的索引和热度。
+"""
+import threading
+from collections import Counter
+
+from django.db import transaction
+
+_pending = threading.local()
+
+
+def _batches():
+    if not hasattr(_pending, 'batches'):
+        _pending.batches = {}
+    return _pending.batches
+
+
+def schedule_post_task(handler, post_ids):
+    """事务提交后以去重后的帖子ID集合调用 handler(ids)；不在事务中时立即执行"""
+    _batches().setdefault(handler, set()).update(post_ids)
+    # 每次都注册回调：保存点回滚会丢弃其中注册的回调，不能只依赖第一次注册的那个。
+    # 先执行的回调处理整批ID，其余回调为空操作
+    transaction.on_commit(lambda: _flush(handler))
+
+
+def schedule_post_delta(handler, post_id, delta):
+    """事务提交后以 {帖子ID: Counter} 调用 handler(deltas)；同一帖子的多次变化先在内存中相加"""
+    _batches().setdefault(handler, {}).setdefault(post_id, Counter()).update(delta)
+    transaction.on_commit(lambda: _flush(handler))
+
+
+def is_scheduled(handler, post_id):
+    return post_id in _batches().get(handler, ())
+
+
+def discard_scheduled(handler, post_id):
+    """撤销尚未执行的帖子任务（例如同一事务中已安排了覆盖它的完整重建）"""
+    batch = _batches().get(handler)
+    if isinstance(batch, dict):
+        batch.pop(post_id, None)
+    elif batch:
+        batch.discard(post_id)
+
+
+def _flush(handler):
+    post_ids = _batches().pop(handler, None)
+    if post_ids:
+        handler(post_ids)
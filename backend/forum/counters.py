@@ -0,0 +1,72 @@
+"""
+帖子回复数 / 最后活跃时间（Post.reply_count / Post.last_activity_at）维护
+使用 F 表达式原子更新，避免并发回复时计数丢失。
+"""
+from collections import defaultdict
+
+from django.db.models import F, Count, Max, Value
+from django.db.models.functions import Greatest
+
+from .models import Post, Reply
+
+
+def subtree_size(reply):
+    """回复及其全部子孙回复的数量（删除回复时会级联删除整棵子树）"""
+    by_parent = defaultdict(list)
+    for reply_id, parent_id in Reply.objects.filter(post_id=reply.post_id).values_list('id', 'parent_id'):
+        by_parent[parent_id].append(reply_id)
+
+    size = 0
+    stack = [reply.id]
+    while stack:
+        size += 1
+        stack.extend(by_parent.get(stack.pop(), []))
+    return size
+
+
+def record_reply_created(reply):
+    Post.objects.filter(id=reply.post_id).update(
+        reply_count=F('reply_count') + 1,
+        last_activity_at=Greatest(F('last_activity_at'), Value(reply.created_at)),
+    )
+
+
+def record_replies_deleted(post_id, count):
+    """删除 count 条回复后扣减计数，并以剩余最新回复（或发帖时间）作为最后活跃时间"""
+    post = Post.objects.filter(id=post_id).only('created_at').first()
+    if post is None:
+        return
+    latest = Reply.objects.filter(post_id=post_id).aggregate(latest=Max('created_at'))['latest']
+    Post.objects.filter(id=post_id).update(
+        reply_count=Greatest(F('reply_count') - count, Value(0)),
+        last_activity_at=latest or post.created_at,
+    )
+
+
+def recount_replies(post_ids=None, batch_size=500):
+    """按回复表重新统计帖子的回复数和最后活跃时间，返回修正的帖子数"""
+    queryset = Post.objects.order_by('id')
+    if post_ids is not None:
+        queryset = queryset.filter(id__in=post_ids)
+
+    fixed = 0
+    last_id = 0
+    while True:
+        posts = list(
+            queryset.filter(id__gt=last_id)
+            .annotate(actual_count=Count('replies'), latest_reply=Max('replies__created_at'))
+            .only('id', 'created_at', 'reply_count', 'last_activity_at')[:batch_size]
+        )
+        if not posts:
+            return fixed
+
+        changed = []
+        for post in posts:
+            last_activity_at = max(post.created_at, post.latest_reply or post.created_at)
+            if post.reply_count != post.actual_count or post.last_activity_at != last_activity_at:
+                post.reply_count = post.actual_count
+                post.last_activity_at = last_activity_at
+                changed.append(post)
+        Post.objects.bulk_update(changed, ['reply_count', 'last_activity_at'])
+        fixed += len(changed)
+        last_id = posts[-1].id
@@ -0,0 +1,56 @@
+"""
+回收孤儿媒体文件
+- 删除从未关联到帖子（或所属帖子已删除）的论坛图片记录
+- 删除 MEDIA_ROOT 下不再被任何模型引用的文件（已删除的商品图片、被替换的头像等）
+- 清理去重存储中已无引用的 blob
+用法:
+    python manage.py collect_orphan_media --dry-run        # 只输出报告，不删除
+    python manage.py collect_orphan_media --grace 3600     # 只处理 1 小时前的文件
+    python manage.py collect_orphan_media --exclude tmp    # 跳过 MEDIA_ROOT/tmp
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from forum.media_gc import delete_files, find_orphan_files, find_unattached_images, prune_blobs, summarize
+from forum.models import Image
+
+
+class Command(BaseCommand):
+    help = '回收未被引用的论坛图片记录和媒体文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不删除')
+        parser.add_argument('--grace', type=int, default=settings.MEDIA_GC_GRACE_SECONDS,
+                            help='宽限期（秒），修改时间在此之内的文件不处理')
+        parser.add_argument('--exclude', action='append', default=[], help='跳过的目录（相对 MEDIA_ROOT），可重复')
+        parser.add_argument('--batch-size', type=int, default=200, help='每批删除的文件数')
+        parser.add_argument('--workers', type=int, default=settings.MEDIA_GC_WORKERS, help='并行删除的线程数')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        grace = options['grace']
+
+        images = find_unattached_images(older_than=time.time() - grace)
+        released = [image.file.name for image in images]
+        if images and not dry_run:
+            Image.objects.filter(id__in=[image.id for image in images]).delete()
+            released = []
+        self.stdout.write(f'未关联帖子的论坛图片记录: {len(images)}')
+
+        orphans = find_orphan_files(grace, exclude=options['exclude'], released=released)
+        for top, count, size in summarize(orphans):
+            self.stdout.write(f'  {top}/: {count} 个文件, {size / 1024 / 1024:.2f} MB')
+        if options['verbosity'] >= 2:
+            for name in sorted(orphans):
+                self.stdout.write(f'    {name}')
+
+        total_size = sum(orphans.values()) / 1024 / 1024
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'[dry-run] 可回收 {len(orphans)} 个文件，共 {total_size:.2f} MB'))
+            return
+
+        deleted = delete_files(orphans, batch_size=options['batch_size'], workers=options['workers'])
+        blobs = prune_blobs(grace)
+        self.stdout.write(self.style.SUCCESS(f'已删除 {deleted} 个文件（{total_size:.2f} MB），清理 {blobs} 个无引用 blob'))
@@ -0,0 +1,32 @@
+"""
+将启用去重存储之前上传的文件纳入 blob 管理，内容重复的文件改为硬链接以释放空间；
+已是 blob 链接但没有记录摘要的文件（较早写入的 blob）补记摘要，删除时无需重新计算
+用法:
+    python manage.py dedup_media
+"""
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from forum.media_gc import referenced_files
+
+
+class Command(BaseCommand):
+    help = '对已有媒体文件按内容去重'
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, 'adopt'):
+            raise CommandError('默认存储不是 DedupFileSystemStorage')
+
+        names = sorted(referenced_files())
+        freed = missing = 0
+        for i, name in enumerate(names, start=1):
+            try:
+                freed += default_storage.adopt(name)
+            except FileNotFoundError:
+                missing += 1
+            if i % 1000 == 0:
+                self.stdout.write(f'已处理 {i}/{len(names)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'去重完成，处理 {len(names)} 个文件（{missing} 个不存在），释放 {freed / 1024 / 1024:.2f} MB'
+        ))
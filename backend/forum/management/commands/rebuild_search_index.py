@@ -0,0 +1,50 @@
+"""
+重建论坛搜索索引
+用法:
+    python manage.py rebuild_search_index            # 重建全部帖子
+    python manage.py rebuild_search_index --post 12  # 只重建指定帖子
+升级到带搜索索引的版本（forum 0008 迁移）后需执行一次全量重建
+"""
+from django.core.management.base import BaseCommand
+
+from forum.models import Post, SearchDocument
+from forum.search import index_post
+
+
+class Command(BaseCommand):
+    help = '重建论坛全文搜索索引（倒排索引）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post', type=int, action='append', dest='post_ids', help='只重建指定帖子，可重复')
+
+        parser.add_argument('--batch-size', type=int, default=500, help='每批读取的帖子ID数')
+
+    def handle(self, *args, **options):
+        post_ids = options['post_ids']
+        if post_ids:
+            for post_id in post_ids:
+                index_post(post_id)
+            total = len(post_ids)
+        else:
+            # 清理已不存在帖子的残留索引
+            SearchDocument.objects.exclude(post_id__in=Post.objects.values('id')).delete()
+            total = 0
+            for batch in self.iter_post_ids(options['batch_size']):
+                for post_id in batch:
+                    index_post(post_id)
+                total += len(batch)
+                self.stdout.write(f'已索引 {total} 个帖子')
+
+        self.stdout.write(self.style.SUCCESS(f'搜索索引重建完成，共 {total} 个帖子'))
+
+    def iter_post_ids(self, batch_size):
+        """按ID分批读取帖子，不一次性加载全部ID"""
+        last_id = 0
+        while True:
+            batch = list(
+                Post.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1]
@@ -0,0 +1,16 @@
+"""
+重建标签倒排表
+用法:
+    python manage.py rebuild_tag_postings
+"""
+from django.core.management.base import BaseCommand
+
+from forum.tag_index import rebuild_posting_lists
+
+
+class Command(BaseCommand):
+    help = '根据帖子标签关联表重建标签倒排表（修复增量维护产生的偏差）'
+
+    def handle(self, *args, **options):
+        count = rebuild_posting_lists()
+        self.stdout.write(self.style.SUCCESS(f'标签倒排表重建完成，共 {count} 个标签'))
@@ -0,0 +1,21 @@
+"""
+重新统计帖子回复数和最后活跃时间（修复冗余字段偏差）
+用法:
+    python manage.py recount_replies
+    python manage.py recount_replies --post 12
+"""
+from django.core.management.base import BaseCommand
+
+from forum.counters import recount_replies
+
+
+class Command(BaseCommand):
+    help = '按回复表重新统计帖子的回复数和最后活跃时间'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post', type=int, action='append', dest='post_ids', help='只统计指定帖子，可重复')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批处理的帖子数')
+
+    def handle(self, *args, **options):
+        fixed = recount_replies(options['post_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'统计完成，修正 {fixed} 篇帖子'))
@@ -0,0 +1,24 @@
+"""
+刷新帖子热度（建议通过 cron 定时执行，用于同步关联商品销量等没有事件通知的变化）
+用法:
+    python manage.py update_hot_scores
+    python manage.py update_hot_scores --post 1 --post 2
+"""
+from django.core.management.base import BaseCommand
+
+from forum.ranking import refresh_all_hot_scores, update_hot_scores
+
+
+class Command(BaseCommand):
+    help = '重新计算帖子热度'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post', type=int, action='append', dest='post_ids', help='只刷新指定帖子，可重复')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批处理的帖子数')
+
+    def handle(self, *args, **options):
+        if options['post_ids']:
+            count = update_hot_scores(options['post_ids'])
+        else:
+            count = refresh_all_hot_scores(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'帖子热度刷新完成，共 {count} 篇'))
@@ -0,0 +1,147 @@
+"""
+媒体文件垃圾回收
+1. 删除上传后从未关联到帖子的论坛图片（forum.Image）记录
+2. 汇总所有模型中 FileField/ImageField 引用的文件路径（集合运算），
+   扫描 MEDIA_ROOT（os.scandir），未被引用的文件即为孤儿文件，分批并行删除
+
+为避免误删正在上传、尚未写入数据库的文件，只处理修改时间早于宽限期的文件。
+"""
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import FileField
+
+from .models import Image
+
+
+def _normalize(name):
+    return os.path.normpath(name).replace(os.sep, '/')
+
+
+def file_fields():
+    """所有模型中的文件字段，返回 [(model, field), ...]"""
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, FileField)
+    ]
+
+
+def referenced_files():
+    """数据库中引用的全部文件路径（相对 MEDIA_ROOT），包括字段默认值（如默认头像）"""
+    referenced = set()
+    for model, field in file_fields():
+        default = field.get_default()
+        if isinstance(default, str) and default:
+            referenced.add(_normalize(default))
+        names = (
+            model._default_manager.exclude(**{field.name: ''})
+            .exclude(**{f'{field.name}__isnull': True})
+            .values_list(field.name, flat=True)
+        )
+        referenced.update(_normalize(name) for name in names.iterator(chunk_size=5000))
+    # 不在 FileField 中的派生文件（如商品图片变体），由模型的 media_file_names() 提供
+    for model in apps.get_models():
+        if hasattr(model, 'media_file_names'):
+            referenced.update(_normalize(name) for name in model.media_file_names())
+    return referenced
+
+
+def scan_media_root(root=None, older_than=None):
+    """
+    遍历 MEDIA_ROOT，返回 {相对路径: 文件大小}
+    older_than 为时间戳，只返回修改时间早于它的文件
+    """
+    root = root or settings.MEDIA_ROOT
+    files = {}
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    if older_than is not None and stat.st_mtime >= older_than:
+                        continue
+                    files[_normalize(os.path.relpath(entry.path, root))] = stat.st_size
+    return files
+
+
+def find_unattached_images(older_than):
+    """未关联任何帖子、且文件早于宽限期的论坛图片"""
+    root = settings.MEDIA_ROOT
+    stale = []
+    for image in Image.objects.filter(posts=None).only('id', 'file').iterator(chunk_size=2000):
+        path = os.path.join(root, image.file.name)
+        try:
+            if os.path.getmtime(path) >= older_than:
+                continue
+        except OSError:
+            pass  # 文件已不存在，记录同样可以删除
+        stale.append(image)
+    return stale
+
+
+def find_orphan_files(grace_seconds, exclude=(), released=()):
+    """
+    返回 {相对路径: 文件大小}，为磁盘上存在但数据库未引用的文件
+    released 为即将删除的记录所引用的文件（dry-run 时记录尚未删除）
+    """
+    on_disk = scan_media_root(older_than=time.time() - grace_seconds)
+    # 去重存储的 blob 由其引用计数管理，见 prune_blobs
+    exclude = list(exclude) + [getattr(settings, 'DEDUP_BLOB_DIR', '.blobs')]
+    prefixes = tuple(_normalize(prefix).rstrip('/') + '/' for prefix in exclude)
+    orphans = set(on_disk) - (referenced_files() - {_normalize(name) for name in released})
+    return {
+        name: on_disk[name]
+        for name in orphans
+        if not name.startswith(prefixes)
+    }
+
+
+def prune_blobs(grace_seconds):
+    """删除去重存储中已无引用的 blob（孤儿文件删除后执行）"""
+    if not hasattr(default_storage, 'prune_blobs'):
+        return 0
+    return default_storage.prune_blobs(older_than=time.time() - grace_seconds)
+
+
+def _delete_batch(paths):
+    deleted = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            deleted += 1
+        except FileNotFoundError:
+            pass
+    return deleted
+
+
+def delete_files(names, batch_size=200, workers=4):
+    """分批并行删除文件，返回实际删除的数量"""
+    root = settings.MEDIA_ROOT
+    paths = [os.path.join(root, name) for name in sorted(names)]
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(_delete_batch, batches))
+
+
+def summarize(files):
+    """按顶级目录统计文件数和字节数，用于 dry-run 报告"""
+    counts, sizes = Counter(), Counter()
+    for name, size in files.items():
+        top = name.split('/', 1)[0] if '/' in name else '.'
+        counts[top] += 1
+        sizes[top] += size
+    return [(top, counts[top], sizes[top]) for top in sorted(counts)]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# 已有帖子的索引不在迁移中建立（分词规则会随代码演进，迁移不应依赖现有代码），
+# 迁移后执行 python manage.py rebuild_search_index 分批建立
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0007_remove_post_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='forum.post', verbose_name='帖子')),
+                ('length', models.PositiveIntegerField(default=0, verbose_name='文档长度')),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name='索引时间')),
+            ],
+            options={
+                'verbose_name': '搜索文档',
+                'verbose_name_plural': '搜索文档',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='词元')),
+                ('tf', models.PositiveIntegerField(default=1, verbose_name='词频')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='forum.searchdocument', verbose_name='搜索文档')),
+            ],
+            options={
+                'verbose_name': '倒排索引项',
+                'verbose_name_plural': '倒排索引项',
+                'unique_together': {('term', 'document')},
+            },
+        ),
+    ]
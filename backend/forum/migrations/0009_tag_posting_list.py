@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:47
+
+import sys
+from array import array
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_posting_lists(apps, schema_editor):
+    """根据已有的帖子标签关联生成倒排表（编码与 forum.tag_index.encode_ids 一致）"""
+    Post = apps.get_model('forum', 'Post')
+    TagPostingList = apps.get_model('forum', 'TagPostingList')
+    grouped = {}
+    for tag_id, post_id in Post.tags.through.objects.values_list('tag_id', 'post_id').order_by('tag_id', 'post_id'):
+        grouped.setdefault(tag_id, []).append(post_id)
+
+    postings = []
+    for tag_id, ids in grouped.items():
+        data = array('q', ids)
+        if sys.byteorder == 'big':
+            data.byteswap()
+        postings.append(TagPostingList(tag_id=tag_id, post_ids=data.tobytes(), size=len(ids)))
+    TagPostingList.objects.bulk_create(postings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagPostingList',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='posting_list', serialize=False, to='forum.tag', verbose_name='标签')),
+                ('post_ids', models.BinaryField(default=b'', verbose_name='帖子ID列表')),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='帖子数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '标签倒排表',
+                'verbose_name_plural': '标签倒排表',
+            },
+        ),
+        migrations.RunPython(build_posting_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:49
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+BATCH_SIZE = 500
+
+
+def backfill_hot_scores(apps, schema_editor):
+    """
+    按回复数和发帖时间计算已有帖子的热度，否则旧帖热度为 0，会排在所有新帖之后。
+    公式复制自编写本迁移时的 forum.ranking.hot_score（迁移不依赖现有代码）；
+    收藏数和关联商品销量由定时执行的 update_hot_scores 命令补上
+    """
+    reply_weight = getattr(settings, 'FORUM_HOT_REPLY_WEIGHT', 1.0)
+    decay = getattr(settings, 'FORUM_HOT_DECAY_SECONDS', 45000)
+
+    Post = apps.get_model('forum', 'Post')
+    last_id = 0
+    while True:
+        posts = list(
+            Post.objects.filter(id__gt=last_id).order_by('id')
+            .annotate(replies_total=Count('replies')).only('id', 'created_at')[:BATCH_SIZE]
+        )
+        if not posts:
+            return
+        for post in posts:
+            engagement = post.replies_total * reply_weight
+            post.hot_score = math.log10(1 + max(engagement, 0)) + post.created_at.timestamp() / decay
+        Post.objects.bulk_update(posts, ['hot_score'])
+        last_id = posts[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0009_tag_posting_list'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot_score',
+            field=models.FloatField(default=0, verbose_name='热度'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['updated_at'], name='forum_post_updated_20dcf1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['hot_score', 'id'], name='forum_post_hot_sco_f04674_idx'),
+        ),
+        migrations.RunPython(backfill_hot_scores, migrations.RunPython.noop),
+    ]
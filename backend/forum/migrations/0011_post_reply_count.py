@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:50
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def backfill_reply_stats(apps, schema_editor):
+    """根据已有回复填充回复数和最后活跃时间"""
+    Post = apps.get_model('forum', 'Post')
+    posts = list(Post.objects.annotate(actual_count=Count('replies'), latest_reply=Max('replies__created_at')))
+    for post in posts:
+        post.reply_count = post.actual_count
+        post.last_activity_at = max(post.created_at, post.latest_reply or post.created_at)
+    Post.objects.bulk_update(posts, ['reply_count', 'last_activity_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0010_post_hot_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='最后活跃时间'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='回复数'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['last_activity_at'], name='forum_post_last_ac_e04564_idx'),
+        ),
+        migrations.RunPython(backfill_reply_stats, migrations.RunPython.noop),
+    ]
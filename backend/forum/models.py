@@ -1,7 +1,5 @@
 from django.db import models
-
-from django.db.models.signals import pre_delete
-from django.dispatch import receiver
+from django.utils import timezone
 
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True, verbose_name="标签名")
@@ -22,6 +20,10 @@ class Post(models.Model):
     author = models.ForeignKey('user.User', on_delete=models.CASCADE, related_name='posts', verbose_name="作者")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+    hot_score = models.FloatField(default=0, verbose_name="热度")  # 见 forum.ranking
+    # 冗余字段，由 ReplyViewSet 维护，可用 recount_replies 命令修复
+    reply_count = models.PositiveIntegerField(default=0, verbose_name="回复数")
+    last_activity_at = models.DateTimeField(default=timezone.now, verbose_name="最后活跃时间")
 
     class Meta:
         verbose_name = "帖子"
@@ -29,6 +31,9 @@ class Post(models.Model):
         indexes = [
             models.Index(fields=['author']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['updated_at']),  # 列表默认按更新时间排序
+            models.Index(fields=['hot_score', 'id']),  # 热门帖子游标分页
+            models.Index(fields=['last_activity_at']),  # 按最后回复时间排序
         ]
 
         ordering = ['-created_at']
@@ -36,21 +41,16 @@ class Post(models.Model):
     def __str__(self):
         return self.title
 
-# 在删除帖子时，删除不再被任何帖子使用的图片文件：
-@receiver(pre_delete, sender=Post)
-def delete_unused_images(sender, instance, **kwargs):
-    images_to_delete = []
-    for image in instance.images.all():
-        if image.posts.count() == 1:  # 只有当前帖子使用（删除后为 0）
-            images_to_delete.append(image)
-
-    for image in images_to_delete:
-        image.file.delete(save=False)
-        image.delete()
-
+# 不再被任何帖子使用的图片由 collect_orphan_media 命令统一回收，不在删除帖子时同步处理
 
 class Image(models.Model):
     file = models.ImageField(upload_to='posts/images/%Y/%m/%d/', verbose_name="图片文件")
+    # 图片元数据，上传后由 shopping.image_metadata 异步计算
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name="宽度")
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name="高度")
+    dominant_color = models.CharField(max_length=7, blank=True, verbose_name="主色")
+    blurhash = models.CharField(max_length=64, blank=True, verbose_name="占位图")
+    metadata_failed = models.BooleanField(default=False, verbose_name="元数据计算失败")
 
     class Meta:
         verbose_name = "插入图片"
@@ -80,4 +80,49 @@ class Reply(models.Model):
         ordering = ['created_at']
 
     def __str__(self):
-        return f"Reply {self.id} by {self.author_id} on Post {self.post_id}"
\ No newline at end of file
+        return f"Reply {self.id} by {self.author_id} on Post {self.post_id}"
+
+# ==================== 搜索索引 ====================
+
+class TagPostingList(models.Model):
+    """标签倒排表：该标签下全部帖子ID，升序排列，以 int64 小端数组存储"""
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name='posting_list', verbose_name="标签")
+    post_ids = models.BinaryField(default=b'', verbose_name="帖子ID列表")
+    size = models.PositiveIntegerField(default=0, verbose_name="帖子数")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "标签倒排表"
+        verbose_name_plural = "标签倒排表"
+
+    def __str__(self):
+        return f"TagPostingList {self.tag_id} ({self.size})"
+
+
+class SearchDocument(models.Model):
+    """帖子的搜索文档，记录加权后的词元总数（BM25 的文档长度）"""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='search_document', verbose_name="帖子")
+    length = models.PositiveIntegerField(default=0, verbose_name="文档长度")
+    indexed_at = models.DateTimeField(auto_now=True, verbose_name="索引时间")
+
+    class Meta:
+        verbose_name = "搜索文档"
+        verbose_name_plural = "搜索文档"
+
+    def __str__(self):
+        return f"SearchDocument {self.post_id} ({self.length})"
+
+
+class SearchPosting(models.Model):
+    """倒排索引：词元 -> 帖子，tf 为加权后的词频"""
+    term = models.CharField(max_length=64, verbose_name="词元")
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings', verbose_name="搜索文档")
+    tf = models.PositiveIntegerField(default=1, verbose_name="词频")
+
+    class Meta:
+        verbose_name = "倒排索引项"
+        verbose_name_plural = "倒排索引项"
+        unique_together = ('term', 'document')  # 同时作为按词元查找的索引
+
+    def __str__(self):
+        return f"{self.term} -> {self.document_id} ({self.tf})"
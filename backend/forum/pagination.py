@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -8,3 +8,27 @@ class CustomPageNumberPagination(PageNumberPagination):
     page_size = 10  # 默认每页10条
     page_size_query_param = 'page_size'  # 允许客户端通过 page_size 参数指定
     max_page_size = 1000  # 最大每页1000条
+
+
+class ReplyThreadPagination(PageNumberPagination):
+    """
+    回复树分页类，按顶级回复（讨论串）分页
+    """
+    page_size = 20  # 默认每页20个讨论串
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class HotPostCursorPagination(CursorPagination):
+    """
+    热门帖子游标分页，按热度倒序
+    热度在翻页过程中可能变化，游标分页不会像页码分页那样出现重复或遗漏
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-hot_score', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        # 固定按热度排序，不使用视图上 OrderingFilter 的默认排序
+        return self.ordering
@@ -0,0 +1,101 @@
+"""
+热门帖子排序
+热度 = log10(1 + 互动量) + 发帖时间戳 / 衰减周期
+
+互动量 = 回复数 × 回复权重 + 收藏数 × 收藏权重 + 关联商品销量 × 销量权重
+
+时间衰减体现在发帖时间上：每晚发一个衰减周期，相当于互动量多一个数量级。
+由于时间项只与发帖时间有关，已存储的分数不会随时间"过期"，
+只需在回复/收藏变化时增量更新，并定期全量刷新（商品销量变化没有事件通知）。
+"""
+import math
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from .batching import schedule_post_task
+from .models import Post
+
+# 计入销量的订单状态
+SALES_ORDER_STATUSES = ('paid', 'shipped', 'completed')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def hot_score(replies, favorites, sales, created_at):
+    """根据互动数据和发帖时间计算热度"""
+    engagement = (
+        replies * _setting('FORUM_HOT_REPLY_WEIGHT', 1.0)
+        + favorites * _setting('FORUM_HOT_FAVORITE_WEIGHT', 2.0)
+        + sales * _setting('FORUM_HOT_SALES_WEIGHT', 0.5)
+    )
+    decay = _setting('FORUM_HOT_DECAY_SECONDS', 45000)
+    return math.log10(1 + max(engagement, 0)) + created_at.timestamp() / decay
+
+
+def _count_by_post(queryset, post_ids):
+    rows = queryset.filter(post_id__in=post_ids).values('post_id').annotate(n=Count('id'))
+    return {row['post_id']: row['n'] for row in rows}
+
+
+def _sales_by_post(post_ids):
+    """关联商品在有效订单中的总销量，按帖子汇总"""
+    OrderItem = apps.get_model('shopping', 'OrderItem')
+    links = list(Post.products.through.objects.filter(post_id__in=post_ids).values_list('post_id', 'productspu_id'))
+    if not links:
+        return {}
+
+    spu_sales = {
+        row['sku__spu_id']: row['n']
+        for row in OrderItem.objects.filter(
+            sku__spu_id__in={spu_id for _, spu_id in links},
+            order__status__in=SALES_ORDER_STATUSES,
+        ).values('sku__spu_id').annotate(n=Sum('quantity'))
+    }
+
+    sales = {}
+    for post_id, spu_id in links:
+        sales[post_id] = sales.get(post_id, 0) + (spu_sales.get(spu_id) or 0)
+    return sales
+
+
+def update_hot_scores(post_ids):
+    """批量重新计算帖子热度；回复数取冗余字段，收藏数和销量各一次聚合查询"""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+    PostFavorite = apps.get_model('user', 'PostFavorite')
+
+    posts = list(Post.objects.filter(id__in=post_ids).only('id', 'created_at', 'reply_count', 'hot_score'))
+    favorites = _count_by_post(PostFavorite.objects.all(), post_ids)
+    sales = _sales_by_post(post_ids)
+
+    for post in posts:
+        post.hot_score = hot_score(
+            post.reply_count, favorites.get(post.id, 0), sales.get(post.id, 0), post.created_at
+        )
+    # bulk_update 不会触发 post_save，不会引起搜索索引重建
+    Post.objects.bulk_update(posts, ['hot_score'])
+    return len(posts)
+
+
+def schedule_update_hot_score(post_id):
+    """事务提交后再更新热度；同一事务内的帖子合并为一次批量计算"""
+    schedule_post_task(update_hot_scores, [post_id])
+
+
+def refresh_all_hot_scores(batch_size=500):
+    """按ID分批刷新全部帖子热度（定时任务使用），返回处理的帖子数"""
+    total = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Post.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not batch:
+            return total
+        total += update_hot_scores(batch)
+        last_id = batch[-1]
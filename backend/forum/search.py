@@ -0,0 +1,266 @@
+"""
+论坛全文搜索
+倒排索引存放在 SearchDocument / SearchPosting 两张表中，
+索引范围：帖子标题、内容、标签、关联商品名称以及全部回复内容。
+
+分词规则：
+- 英文/数字按连续字母数字切分并转小写
+- 中日韩文字按二元组（bigram）切分，索引时额外保留每段末尾的单字，
+  因此单字查询可以用词元前缀匹配命中任意位置的字
+
+排序使用 BM25，检索语义为 AND（文档必须包含全部查询词元）。
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Count, Avg, Max, Sum
+
+from .batching import discard_scheduled, is_scheduled, schedule_post_delta, schedule_post_task
+from .models import Post, Reply, SearchDocument, SearchPosting
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 各字段权重：标题命中比正文命中更重要
+FIELD_WEIGHTS = {
+    'title': 3,
+    'tags': 2,
+    'products': 2,
+    'content': 1,
+    'replies': 1,
+}
+
+MAX_TERM_LENGTH = 64
+
+_CJK_RANGES = (
+    r'\u3040-\u30ff'  # 日文假名
+    r'\u3400-\u4dbf'  # CJK 扩展 A
+    r'\u4e00-\u9fff'  # CJK 统一汉字
+    r'\uf900-\ufaff'  # CJK 兼容汉字
+    r'\uac00-\ud7af'  # 韩文音节
+)
+_TOKEN_RE = re.compile(rf'[{_CJK_RANGES}]+|[0-9a-z\u00c0-\u024f]+')
+_CJK_RE = re.compile(rf'[{_CJK_RANGES}]')
+
+
+def _runs(text):
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return _TOKEN_RE.findall(text)
+
+
+def tokenize(text):
+    """索引分词：返回词元列表（允许重复，用于统计词频）"""
+    tokens = []
+    for run in _runs(text):
+        if _CJK_RE.match(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])  # 末尾单字，保证每个字都是某个词元的首字
+        else:
+            tokens.append(run[:MAX_TERM_LENGTH])
+    return tokens
+
+
+def tokenize_query(text):
+    """
+    查询分词：返回 (精确匹配词元, 前缀匹配单字)
+    单个中日韩文字无法组成 bigram，改用前缀匹配
+    """
+    exact, prefixes = [], []
+    for run in _runs(text):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                prefixes.append(run)
+            else:
+                exact.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            exact.append(run[:MAX_TERM_LENGTH])
+    return list(dict.fromkeys(exact)), list(dict.fromkeys(prefixes))
+
+
+# ==================== 建立索引 ====================
+
+def build_term_counts(post, reply_contents):
+    """计算帖子的加权词频"""
+    fields = {
+        'title': [post.title],
+        'content': [post.content],
+        'tags': [tag.name for tag in post.tags.all()],
+        'products': [product.name for product in post.products.all()],
+        'replies': reply_contents,
+    }
+    counts = Counter()
+    for field, texts in fields.items():
+        weight = FIELD_WEIGHTS[field]
+        for text in texts:
+            for token in tokenize(text):
+                counts[token] += weight
+    return counts
+
+
+def index_post(post_id):
+    """重建单个帖子的索引；帖子已删除时清理其索引"""
+    post = Post.objects.filter(id=post_id).prefetch_related('tags', 'products').first()
+    if post is None:
+        SearchDocument.objects.filter(post_id=post_id).delete()
+        return
+
+    reply_contents = list(Reply.objects.filter(post_id=post_id).values_list('content', flat=True))
+    counts = build_term_counts(post, reply_contents)
+
+    with transaction.atomic():
+        document, _ = SearchDocument.objects.update_or_create(
+            post_id=post_id,
+            defaults={'length': sum(counts.values())}
+        )
+        SearchPosting.objects.filter(document=document).delete()
+        SearchPosting.objects.bulk_create(
+            [SearchPosting(term=term, document=document, tf=tf) for term, tf in counts.items()],
+            batch_size=500
+        )
+
+
+def index_posts(post_ids):
+    for post_id in post_ids:
+        index_post(post_id)
+
+
+def schedule_index_post(post_id):
+    """事务提交后再更新索引，避免回滚的数据进入索引；同一事务内同一帖子只重建一次"""
+    # 完整重建已包含本事务中的回复变化，丢弃待应用的增量
+    discard_scheduled(apply_reply_deltas, post_id)
+    schedule_post_task(index_posts, [post_id])
+
+
+def reply_term_delta(old_content, new_content):
+    """回复内容从 old_content 变为 new_content 时帖子加权词频的变化（新增/删除时另一方为 None）"""
+    delta = Counter()
+    weight = FIELD_WEIGHTS['replies']
+    for token in tokenize(new_content):
+        delta[token] += weight
+    for token in tokenize(old_content):
+        delta[token] -= weight
+    return delta
+
+
+def schedule_reply_index(post_id, old_content, new_content):
+    """
+    回复增删改只把该回复的词频变化应用到帖子的倒排项上，不重新分词整个帖子和全部回复。
+    同一事务中帖子已安排完整重建时无需再应用增量
+    """
+    if is_scheduled(index_posts, post_id):
+        return
+    delta = reply_term_delta(old_content, new_content)
+    if any(delta.values()):
+        schedule_post_delta(apply_reply_deltas, post_id, delta)
+
+
+def apply_reply_deltas(deltas):
+    """把 {帖子ID: 词频变化} 写入倒排项和文档长度；帖子尚未建立索引时完整重建"""
+    for post_id, delta in deltas.items():
+        delta = {term: change for term, change in delta.items() if change}
+        if not delta:
+            continue
+        with transaction.atomic():
+            document = SearchDocument.objects.select_for_update().filter(post_id=post_id).first()
+            if document is None:
+                index_post(post_id)
+                continue
+
+            postings = {
+                posting.term: posting
+                for posting in SearchPosting.objects.filter(document=document, term__in=list(delta))
+            }
+            created, updated, removed = [], [], []
+            for term, change in delta.items():
+                posting = postings.get(term)
+                tf = (posting.tf if posting else 0) + change
+                if posting is None:
+                    if tf > 0:
+                        created.append(SearchPosting(term=term, document=document, tf=tf))
+                elif tf > 0:
+                    posting.tf = tf
+                    updated.append(posting)
+                else:
+                    removed.append(posting.id)
+
+            SearchPosting.objects.bulk_create(created, batch_size=500)
+            SearchPosting.objects.bulk_update(updated, ['tf'], batch_size=500)
+            SearchPosting.objects.filter(id__in=removed).delete()
+            document.length = max(0, document.length + sum(delta.values()))
+            document.save(update_fields=['length'])
+
+
+# ==================== 检索 ====================
+
+def search_posts(query, limit=None, candidates=None):
+    """
+    BM25 检索，返回按得分降序排列的 [(post_id, score), ...]
+    candidates 为其他过滤条件（作者、标签）允许的帖子ID集合，在截取前 limit 条之前过滤，
+    避免命中的帖子被排在前面的其他帖子挤出结果；IDF 仍按全部文档计算
+    """
+    exact, prefixes = tokenize_query(query)
+    keys = exact + prefixes
+    if not keys:
+        return []
+
+    if limit is None:
+        limit = getattr(settings, 'FORUM_SEARCH_MAX_RESULTS', 1000)
+
+    stats = SearchDocument.objects.aggregate(total=Count('pk'), avg_length=Avg('length'))
+    total_docs = stats['total'] or 0
+    avg_length = stats['avg_length'] or 1
+    if not total_docs:
+        return []
+
+    # 每个查询词元对应的倒排项：精确词元或以该单字开头的全部词元
+    key_conditions = {key: Q(term=key) for key in exact}
+    key_conditions.update({prefix: Q(term__startswith=prefix) for prefix in prefixes})
+
+    # 文档频率在数据库中计数
+    df = {
+        key: SearchPosting.objects.filter(condition).values('document_id').distinct().count()
+        for key, condition in key_conditions.items()
+    }
+    if not all(df.values()):
+        return []
+
+    # 按文档聚合每个查询词元的词频，并用 HAVING 过滤出命中全部词元的文档（AND 语义），
+    # 每个命中的文档只返回一行
+    aliases = {f'tf_{i}': key for i, key in enumerate(keys)}
+    condition = Q()
+    for key_condition in key_conditions.values():
+        condition |= key_condition
+    rows = (
+        SearchPosting.objects.filter(condition)
+        .values('document_id')
+        .annotate(
+            length=Max('document__length'),
+            **{alias: Sum('tf', filter=key_conditions[key]) for alias, key in aliases.items()}
+        )
+        .filter(**{f'{alias}__gt': 0 for alias in aliases})
+        .values_list('document_id', 'length', *aliases)
+    )
+
+    idf = {
+        key: math.log(1 + (total_docs - df[key] + 0.5) / (df[key] + 0.5))
+        for key in keys
+    }
+
+    scores = []
+    for document_id, length, *tfs in rows.iterator(chunk_size=2000):
+        if candidates is not None and document_id not in candidates:
+            continue
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+        score = sum(
+            idf[key] * tf * (BM25_K1 + 1) / (tf + norm)
+            for key, tf in zip(aliases.values(), tfs)
+        )
+        scores.append((document_id, score))
+
+    scores.sort(key=lambda item: (-item[1], -item[0]))
+    return scores[:limit]
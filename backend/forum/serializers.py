@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from .models import Tag, Post, Image, Reply
 from django.apps import apps  # 用于延迟导入模型
+from shopping.serializers import ProductCardSerializer
+from user.avatars import avatar_url
+from .threads import build_reply_tree, load_replies
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,37 +15,69 @@ class ImageSerializer(serializers.ModelSerializer):
         model = Image
         fields = '__all__'
 
+class AuthorField(serializers.ReadOnlyField):
+    """作者摘要：ID、用户名和小尺寸头像规格图（调用方需预加载 author）"""
+
+    def to_representation(self, user):
+        return {
+            'id': user.id,
+            'name': user.username,
+            'avatar': avatar_url(user, request=self.context.get('request'))  # 小尺寸规格图
+        }
+
+class SparseFieldsMixin:
+    """
+    稀疏字段集：GET 请求可通过 ?fields=id,title 只返回指定字段；
+    视图也可通过 context['omit_fields'] 排除字段（如列表页不返回回复树）。
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        omit = set(self.context.get('omit_fields', []))
+
+        request = self.context.get('request')
+        if request is not None and request.method == 'GET':
+            requested = request.query_params.get('fields')
+            if requested:
+                wanted = {name.strip() for name in requested.split(',') if name.strip()}
+                omit |= set(self.fields) - wanted
+
+        for name in omit:
+            self.fields.pop(name, None)
+
+
 class ReplySerializer(serializers.ModelSerializer):
-    author = serializers.SerializerMethodField(read_only=True)
+    author = AuthorField()
     children = serializers.SerializerMethodField()
 
     class Meta:
         model = Reply
         fields = '__all__'
 
-    def get_author(self, obj):
-        request = self.context.get('request')
-        avatar_url = obj.author.avatar.url if obj.author.avatar else None
+    def get_children(self, obj):
+        # 优先使用 build_reply_tree 在内存中组装好的子回复，避免逐层查询
+        children = getattr(obj, 'thread_children', None)
+        if children is None:
+            children = obj.children.all()
+        return ReplySerializer(children, many=True, context=self.context).data
 
-        if avatar_url and request:
-            avatar_url = request.build_absolute_uri(avatar_url)
 
-        return {
-            'id': obj.author.id,
-            'name': obj.author.username,
-            'avatar': avatar_url
-        }
+class ReplyThreadSerializer(ReplySerializer):
+    """回复树节点序列化器，额外返回直接子回复数量（深度截断时用于"展开更多"）"""
+    child_count = serializers.SerializerMethodField()
+
+    def get_child_count(self, obj):
+        return getattr(obj, 'child_count', 0)
 
     def get_children(self, obj):
-        children = obj.children.all()
-        return ReplySerializer(children, many=True, context=self.context).data
+        children = getattr(obj, 'thread_children', [])
+        return ReplyThreadSerializer(children, many=True, context=self.context).data
 
-class PostSerializer(serializers.ModelSerializer):
-    author = serializers.SerializerMethodField(read_only=True)
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = AuthorField()
     products = serializers.SerializerMethodField()
     images = ImageSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
-    replies = ReplySerializer(many=True, read_only=True)
+    replies = serializers.SerializerMethodField()
 
     tag_ids = serializers.PrimaryKeyRelatedField(
         many=True, 
@@ -69,6 +104,7 @@ class PostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = '__all__'
+        read_only_fields = ['hot_score', 'reply_count', 'last_activity_at']
 
     def create(self, validated_data):
         product_ids = validated_data.pop('product_ids', [])
@@ -92,27 +128,27 @@ class PostSerializer(serializers.ModelSerializer):
         
         return post
 
-    def get_author(self, obj):
-        request = self.context.get('request')
-        avatar_url = obj.author.avatar.url if obj.author.avatar else None
-
-        if avatar_url and request:
-            avatar_url = request.build_absolute_uri(avatar_url)
+    def get_replies(self, obj):
+        """返回顶级回复树（一次查询加载全部回复，在内存中组装）"""
+        if 'replies' in getattr(obj, '_prefetched_objects_cache', {}):
+            replies = obj.replies.all()
+        else:
+            replies = load_replies(obj.id)
+        roots = build_reply_tree(replies)
+        return ReplySerializer(roots, many=True, context=self.context).data
 
-        return {
-            'id': obj.author.id,
-            'name': obj.author.username,
-            'avatar': avatar_url
-        }
-    
     def get_products(self, obj):
         """返回关联商品信息，包含图片"""
         request = self.context.get('request')
         products = obj.products.all()
         result = []
         for product in products:
-            # 获取主图
-            image = product.images.filter(is_main=True).first()
+            # 获取主图：优先使用预加载的 main_images
+            main_images = getattr(product, 'main_images', None)
+            if main_images is not None:
+                image = main_images[0] if main_images else None
+            else:
+                image = product.images.filter(is_main=True).first()
             image_url = None
             if image:
                 if request:
@@ -129,4 +165,43 @@ class PostSerializer(serializers.ModelSerializer):
                 'description': product.description,
                 'image': image_url
             })
-        return result
\ No newline at end of file
+        return result
+
+class PostCardSerializer(serializers.ModelSerializer):
+    """
+    帖子卡片序列化器（精简投影），不包含回复树。
+    调用方需预加载 author、images、tags 以及 products 的主图
+    （见 shopping.serializers.main_image_prefetch）。
+    """
+    author = AuthorField()
+    images = ImageSerializer(many=True, read_only=True)
+    tags = TagSerializer(many=True, read_only=True)
+    products = ProductCardSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Post
+        fields = ['id', 'title', 'content', 'author', 'images', 'tags', 'products', 'created_at', 'updated_at']
+
+
+class PostListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    帖子列表精简序列化器（?view=slim）：回复数、首图、标签ID和商品卡片，
+    全部来自冗余字段/预加载数据，不展开回复树。
+    """
+    author = AuthorField()
+    first_image = serializers.SerializerMethodField()
+    tag_ids = serializers.SerializerMethodField()
+    products = ProductCardSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Post
+        fields = ['id', 'title', 'content', 'author', 'reply_count', 'last_activity_at', 'first_image', 'tag_ids', 'products', 'created_at', 'updated_at']
+
+    def get_first_image(self, obj):
+        images = obj.images.all()
+        if not images:
+            return None
+        return ImageSerializer(images[0], context=self.context).data
+
+    def get_tag_ids(self, obj):
+        return [tag.id for tag in obj.tags.all()]
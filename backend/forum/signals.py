@@ -0,0 +1,126 @@
+"""
+论坛信号处理
+- 帖子、标签/商品关联变化时重建帖子的搜索索引；回复增删改只应用该回复的词频变化
+- Post.tags 变化时，增量维护标签倒排表
+- 发帖、回复、收藏变化时，增量更新帖子热度
+"""
+import threading
+
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Post, Reply
+from .ranking import schedule_update_hot_score
+from .search import schedule_index_post, schedule_reply_index
+from .tag_index import add_post_to_tags, remove_post_from_tags, set_tag_posts
+
+# 正在级联删除的帖子，删除其回复时不必重建索引
+_deleting = threading.local()
+
+
+def _deleting_post_ids():
+    if not hasattr(_deleting, 'post_ids'):
+        _deleting.post_ids = set()
+    return _deleting.post_ids
+
+
+@receiver(post_save, sender=Post)
+def index_post_on_save(sender, instance, **kwargs):
+    schedule_index_post(instance.id)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+@receiver(m2m_changed, sender=Post.products.through)
+def index_post_on_relations_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # 从标签/商品一侧修改关联时，instance 不是帖子
+        for post_id in kwargs.get('pk_set') or []:
+            schedule_index_post(post_id)
+    else:
+        schedule_index_post(instance.id)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_tag_posting_lists(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # instance 为帖子，pk_set 为标签ID
+        if action == 'post_add':
+            add_post_to_tags(instance.id, pk_set)
+        elif action == 'post_remove':
+            remove_post_from_tags(instance.id, pk_set)
+        elif action == 'pre_clear':
+            instance._cleared_tag_ids = list(instance.tags.values_list('id', flat=True))
+        elif action == 'post_clear':
+            remove_post_from_tags(instance.id, getattr(instance, '_cleared_tag_ids', []))
+    else:
+        # instance 为标签，pk_set 为帖子ID
+        if action == 'post_add':
+            set_tag_posts(instance.id, add=pk_set)
+        elif action == 'post_remove':
+            set_tag_posts(instance.id, remove=pk_set)
+        elif action == 'post_clear':
+            set_tag_posts(instance.id, clear=True)
+
+
+@receiver(pre_delete, sender=Post)
+def mark_post_deleting(sender, instance, **kwargs):
+    _deleting_post_ids().add(instance.id)
+    # 级联删除关联表不会触发 m2m_changed，先记下帖子的标签
+    instance._deleted_tag_ids = list(instance.tags.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def unmark_post_deleting(sender, instance, **kwargs):
+    # 帖子的搜索文档随帖子级联删除
+    _deleting_post_ids().discard(instance.id)
+    remove_post_from_tags(instance.id, getattr(instance, '_deleted_tag_ids', []))
+
+
+def _saves_content(update_fields):
+    return update_fields is None or 'content' in update_fields
+
+
+@receiver(pre_save, sender=Reply)
+def remember_indexed_reply_content(sender, instance, update_fields=None, **kwargs):
+    # 编辑回复时记下旧内容，用于计算词频变化
+    if instance.pk and _saves_content(update_fields):
+        instance._indexed_content = (
+            Reply.objects.filter(pk=instance.pk).values_list('content', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Reply)
+def index_reply_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if instance.post_id in _deleting_post_ids() or not _saves_content(update_fields):
+        return
+    old_content = None if created else getattr(instance, '_indexed_content', None)
+    if old_content != instance.content:
+        schedule_reply_index(instance.post_id, old_content, instance.content)
+    instance._indexed_content = instance.content
+
+
+@receiver(post_delete, sender=Reply)
+def index_reply_on_delete(sender, instance, **kwargs):
+    if instance.post_id in _deleting_post_ids():
+        return
+    schedule_reply_index(instance.post_id, instance.content, None)
+
+
+@receiver(post_save, sender=Post)
+def init_hot_score(sender, instance, created, **kwargs):
+    if created:
+        schedule_update_hot_score(instance.id)
+
+
+@receiver(post_save, sender=Reply)
+@receiver(post_delete, sender=Reply)
+@receiver(post_save, sender='user.PostFavorite')
+@receiver(post_delete, sender='user.PostFavorite')
+def update_hot_score_on_engagement(sender, instance, **kwargs):
+    if kwargs.get('created') is False:
+        return  # 编辑回复不影响热度
+    if instance.post_id in _deleting_post_ids():
+        return
+    schedule_update_hot_score(instance.post_id)
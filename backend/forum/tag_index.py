@@ -0,0 +1,168 @@
+"""
+标签倒排表
+每个标签维护一个升序的帖子ID数组（TagPostingList），在 Post.tags 变化时增量更新。
+多标签过滤在内存中对数组求交集，再按ID回表，避免每个标签一次 JOIN。
+交集较大时写入连接上的临时表，以子查询过滤（见 filter_by_post_ids）。
+"""
+import sys
+from array import array
+from bisect import bisect_left
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Post, TagPostingList
+
+
+def encode_ids(post_ids):
+    """升序ID列表 -> int64 小端字节串"""
+    data = array('q', post_ids)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def decode_ids(raw):
+    """int64 小端字节串 -> array('q')"""
+    data = array('q')
+    data.frombytes(bytes(raw or b''))
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data
+
+
+def _contains(sorted_ids, value):
+    i = bisect_left(sorted_ids, value)
+    return i < len(sorted_ids) and sorted_ids[i] == value
+
+
+def intersect_sorted(id_lists):
+    """
+    多个升序ID数组求交集，返回升序列表。
+    从最短的数组出发，对其余数组二分查找，复杂度 O(m · k · log n)。
+    """
+    if not id_lists:
+        return []
+    id_lists = sorted(id_lists, key=len)
+    result = list(id_lists[0])
+    for other in id_lists[1:]:
+        if not result:
+            break
+        result = [post_id for post_id in result if _contains(other, post_id)]
+    return result
+
+
+def load_posting_lists(tag_ids=None):
+    """一次查询加载标签倒排表，返回 {tag_id: array('q')}；不传 tag_ids 时加载全部"""
+    queryset = TagPostingList.objects.all()
+    if tag_ids is not None:
+        queryset = queryset.filter(tag_id__in=tag_ids)
+    return {tag_id: decode_ids(raw) for tag_id, raw in queryset.values_list('tag_id', 'post_ids')}
+
+
+def posts_with_all_tags(tag_ids):
+    """返回同时带有全部标签的帖子ID（升序）"""
+    tag_ids = set(tag_ids)
+    lists = load_posting_lists(tag_ids)
+    if len(lists) < len(tag_ids):
+        return []  # 有标签没有任何帖子
+    return intersect_sorted(list(lists.values()))
+
+
+FILTER_TABLE = 'forum_tag_filter_ids'
+FILTER_INSERT_BATCH = 1000
+
+
+def filter_by_post_ids(queryset, post_ids):
+    """
+    把帖子ID写入当前数据库连接的临时表，queryset 以 id IN (SELECT ...) 过滤，由数据库排序和分页。
+    临时表只对本连接可见，每次调用先重建，queryset 需在同一连接（同一请求）中求值
+    """
+    drop = 'DROP TEMPORARY TABLE' if connection.vendor == 'mysql' else 'DROP TABLE'
+    with connection.cursor() as cursor:
+        cursor.execute(f'{drop} IF EXISTS {FILTER_TABLE}')
+        cursor.execute(f'CREATE TEMPORARY TABLE {FILTER_TABLE} (post_id BIGINT PRIMARY KEY)')
+        for start in range(0, len(post_ids), FILTER_INSERT_BATCH):
+            cursor.executemany(
+                f'INSERT INTO {FILTER_TABLE} (post_id) VALUES (%s)',
+                [(post_id,) for post_id in post_ids[start:start + FILTER_INSERT_BATCH]],
+            )
+    return queryset.filter(id__in=RawSQL(f'SELECT post_id FROM {FILTER_TABLE}', []))
+
+
+def tag_facets(post_ids, tag_ids=None):
+    """
+    统计结果集中每个标签的帖子数，返回 {tag_id: count}（只包含非零项）
+    tag_ids 为需要统计的标签（通常是结果集中出现过的标签），不传时统计全部标签
+    """
+    post_ids = set(post_ids)
+    facets = {}
+    if not post_ids:
+        return facets
+    for tag_id, ids in load_posting_lists(tag_ids).items():
+        # 遍历较短的一侧
+        if len(ids) <= len(post_ids):
+            count = sum(1 for post_id in ids if post_id in post_ids)
+        else:
+            count = sum(1 for post_id in post_ids if _contains(ids, post_id))
+        if count:
+            facets[tag_id] = count
+    return facets
+
+
+# ==================== 增量维护 ====================
+
+def _update_list(tag_id, add=(), remove=()):
+    """在升序数组中二分定位后插入 / 删除，不重新排序整个列表；新帖的ID最大，插入即追加到末尾"""
+    with transaction.atomic():
+        posting, created = TagPostingList.objects.select_for_update().get_or_create(tag_id=tag_id)
+        ids = decode_ids(posting.post_ids)
+        changed = False
+        for post_id in remove:
+            i = bisect_left(ids, post_id)
+            if i < len(ids) and ids[i] == post_id:
+                del ids[i]
+                changed = True
+        for post_id in add:
+            i = bisect_left(ids, post_id)
+            if i == len(ids) or ids[i] != post_id:
+                ids.insert(i, post_id)
+                changed = True
+        if changed or created:
+            posting.post_ids = encode_ids(ids)
+            posting.size = len(ids)
+            posting.save()
+
+
+def add_post_to_tags(post_id, tag_ids):
+    for tag_id in tag_ids:
+        _update_list(tag_id, add=[post_id])
+
+
+def remove_post_from_tags(post_id, tag_ids):
+    for tag_id in tag_ids:
+        _update_list(tag_id, remove=[post_id])
+
+
+def set_tag_posts(tag_id, add=(), remove=(), clear=False):
+    """从标签一侧修改关联（Tag.post_set）时使用"""
+    if clear:
+        TagPostingList.objects.update_or_create(tag_id=tag_id, defaults={'post_ids': b'', 'size': 0})
+    else:
+        _update_list(tag_id, add=add, remove=remove)
+
+
+def rebuild_posting_lists():
+    """根据 Post.tags 关联表重建全部标签倒排表"""
+    through = Post.tags.through
+    grouped = {}
+    for tag_id, post_id in through.objects.values_list('tag_id', 'post_id').order_by('tag_id', 'post_id'):
+        grouped.setdefault(tag_id, []).append(post_id)
+
+    with transaction.atomic():
+        TagPostingList.objects.all().delete()
+        TagPostingList.objects.bulk_create([
+            TagPostingList(tag_id=tag_id, post_ids=encode_ids(ids), size=len(ids))
+            for tag_id, ids in grouped.items()
+        ])
+    return len(grouped)
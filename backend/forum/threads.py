@@ -0,0 +1,58 @@
+"""
+回复树加载工具
+一次查询取出帖子的全部回复（作者通过 select_related 一并取出），
+再在内存中按 parent_id 组装为树，避免 ReplySerializer 逐层查询子回复。
+"""
+from collections import defaultdict
+
+from .models import Reply
+
+
+def load_replies(post_id):
+    """一次查询加载帖子的全部回复及作者信息"""
+    return list(
+        Reply.objects.filter(post_id=post_id)
+        .select_related('author')
+        .only(
+            'id', 'content', 'post_id', 'parent_id', 'created_at',
+            'author__id', 'author__username', 'author__avatar',
+            'author__avatar_version', 'author__avatar_rendered_version',
+        )
+        .order_by('created_at', 'id')
+    )
+
+
+def build_reply_tree(replies, max_depth=None, root_id=None):
+    """
+    将邻接表形式的回复列表组装为树，返回顶级回复列表。
+
+    每个回复会被附加两个属性：
+    - thread_children: 已展开的子回复列表（超过 max_depth 时为空）
+    - child_count: 直接子回复数量（不受深度限制，便于前端显示"展开更多"）
+
+    max_depth 为 1 时只返回顶级回复；root_id 指定时只返回以该回复为根的子树。
+    """
+    by_parent = defaultdict(list)
+    by_id = {}
+    for reply in replies:
+        by_parent[reply.parent_id].append(reply)
+        by_id[reply.id] = reply
+
+    if root_id is not None:
+        roots = [by_id[root_id]] if root_id in by_id else []
+    else:
+        roots = by_parent.get(None, [])
+
+    # 迭代而非递归，深层回复链不会触发递归深度限制
+    stack = [(root, 1) for root in roots]
+    while stack:
+        node, depth = stack.pop()
+        children = by_parent.get(node.id, [])
+        node.child_count = len(children)
+        if max_depth is not None and depth >= max_depth:
+            node.thread_children = []
+        else:
+            node.thread_children = children
+            stack.extend((child, depth + 1) for child in children)
+
+    return roots
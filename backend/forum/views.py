@@ -1,10 +1,22 @@
 from rest_framework import viewsets
 from rest_framework import filters
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Case, When, IntegerField
 from .models import Tag, Post, Image, Reply
-from .serializers import TagSerializer, PostSerializer, ImageSerializer, ReplySerializer
-from .pagination import CustomPageNumberPagination
+from .serializers import (
+    TagSerializer, PostSerializer, PostListSerializer, ImageSerializer,
+    ReplySerializer, ReplyThreadSerializer
+)
+from shopping.serializers import main_image_prefetch
+from .pagination import CustomPageNumberPagination, ReplyThreadPagination, HotPostCursorPagination
+from .threads import build_reply_tree, load_replies
+from .search import search_posts
+from .tag_index import filter_by_post_ids, posts_with_all_tags, tag_facets
+from .counters import record_reply_created, record_replies_deleted, subtree_size
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, IsAdminUser
 
 class TagViewSet(viewsets.ModelViewSet):
@@ -21,43 +33,179 @@ class TagViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
 
+class PostOrderingFilter(filters.OrderingFilter):
+    """
+    搜索时如果没有显式传入 ordering 参数，保持相关度排序；
+    按标签过滤时默认按发帖先后（ID 倒序），与标签倒排表的顺序一致，列表页可直接在ID数组上分页
+    """
+    def get_default_ordering(self, view):
+        if view.request.query_params.get('search'):
+            return None
+        if view.tag_filter_ids():
+            return ['-id']
+        return super().get_default_ordering(view)
+
 class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = CustomPageNumberPagination  # 使用自定义分页
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
-    ordering_fields = ['created_at', 'updated_at']
+    filter_backends = [DjangoFilterBackend, PostOrderingFilter, filters.SearchFilter]
+    ordering_fields = ['created_at', 'updated_at', 'hot_score', 'last_activity_at', 'reply_count']
     ordering = ['-updated_at']  # 默认按更新时间倒序
 
+    def base_queryset(self):
+        queryset = Post.objects.select_related('author').prefetch_related(
+            'images',
+            'tags',
+            'products',
+            main_image_prefetch('products__images')
+        )
+
+        # 只有详情页返回完整回复树
+        if self.action not in ('list', 'hot', 'facets'):
+            queryset = queryset.prefetch_related(
+                Prefetch('replies', queryset=Reply.objects.select_related('author'))
+            )
+        return queryset
+
+    def tag_filter_ids(self):
+        """?tags= 中的标签ID"""
+        tags = self.request.query_params.get('tags', None)
+        return [int(tag_id) for tag_id in tags.split(',') if tag_id.isdigit()] if tags else []
+
+    def tagged_post_ids(self, tag_ids):
+        """带有全部标签（且属于 ?author= 作者）的帖子ID，升序"""
+        post_ids = posts_with_all_tags(tag_ids)
+        author_id = self.request.query_params.get('author', None)
+        if author_id and post_ids:
+            authored = set(Post.objects.filter(author_id=author_id).values_list('id', flat=True))
+            post_ids = [post_id for post_id in post_ids if post_id in authored]
+        return post_ids
+
     def get_queryset(self):
-        queryset = Post.objects.all()
-        
+        queryset = self.base_queryset()
+
         # 按作者过滤
         author_id = self.request.query_params.get('author', None)
         if author_id:
             queryset = queryset.filter(author_id=author_id)
-        
-        # 搜索标题或关联商品名称
+
+        tag_ids = self.tag_filter_ids()
+
+        # 全文搜索（倒排索引 + BM25）：标题、内容、标签、关联商品名称和回复
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |  # 模糊搜索标题
-                Q(products__name__icontains=search)  # 模糊搜索商品名称（从iexact改为icontains）
-            ).distinct()
-        
-        # 按标签过滤（交集）
-        tags = self.request.query_params.get('tags', None)
-        if tags:
-            tag_ids = [int(tag_id) for tag_id in tags.split(',') if tag_id.isdigit()]
-            for tag_id in tag_ids:
-                queryset = queryset.filter(tags__id=tag_id)
-        
+            # 作者、标签条件在截取最多 FORUM_SEARCH_MAX_RESULTS 条结果之前过滤
+            candidates = None
+            if tag_ids:
+                candidates = set(self.tagged_post_ids(tag_ids))
+            elif author_id:
+                candidates = set(Post.objects.filter(author_id=author_id).values_list('id', flat=True))
+            ranked_ids = [post_id for post_id, _ in search_posts(search, candidates=candidates)]
+            if not ranked_ids:
+                return queryset.none()
+            # 按相关度排序（未显式指定 ordering 时生效，见 PostOrderingFilter）
+            return queryset.filter(id__in=ranked_ids).order_by(
+                Case(*[When(id=post_id, then=rank) for rank, post_id in enumerate(ranked_ids)],
+                     output_field=IntegerField())
+            )
+
+        # 按标签过滤（交集）：结果较少时按倒排表交集回表；较多时（需要按其他字段排序、热门列表等）
+        # 交集写入临时表，以子查询过滤，不把整个ID数组内联进 SQL，也不为每个标签 JOIN 一次关联表
+        if tag_ids:
+            post_ids = self.tagged_post_ids(tag_ids)
+            if len(post_ids) <= settings.FORUM_TAG_FILTER_MAX_INLINE_IDS:
+                queryset = queryset.filter(id__in=post_ids)
+            else:
+                queryset = filter_by_post_ids(queryset, post_ids)
+
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """
+        按标签过滤且未指定搜索词和排序时，直接在倒排表交集（ID 数组）上分页，只回表查询当前页的帖子
+        """
+        tag_ids = self.tag_filter_ids()
+        if not tag_ids or request.query_params.get('search') or request.query_params.get('ordering'):
+            return super().list(request, *args, **kwargs)
+
+        post_ids = self.tagged_post_ids(tag_ids)
+        post_ids.reverse()  # 新帖在前，与 PostOrderingFilter 的默认排序一致
+        page_ids = self.paginate_queryset(post_ids)
+        posts = {post.id: post for post in self.base_queryset().filter(id__in=page_ids)}
+        page = [posts[post_id] for post_id in page_ids if post_id in posts]
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def is_slim_view(self):
+        """列表页 ?view=slim 时返回精简表示"""
+        return self.action in ('list', 'hot') and self.request.query_params.get('view') == 'slim'
+
+    def get_serializer_class(self):
+        if self.is_slim_view():
+            return PostListSerializer
+        return PostSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('list', 'hot'):
+            context['omit_fields'] = ['replies']  # 列表页不返回回复树
+        return context
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def hot(self, request):
+        """
+        热门帖子，按预先计算的热度倒序，游标分页（见 forum.ranking）
+        支持与列表相同的 author / tags / view / fields 参数
+        """
+        paginator = HotPostCursorPagination()
+        page = paginator.paginate_queryset(self.get_queryset(), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        当前结果集（author / search / tags 等过滤条件与列表一致）中各标签的帖子数
+        """
+        post_ids = self.filter_queryset(self.get_queryset()).order_by().values_list('id', flat=True)
+        # 只加载结果集中出现过的标签的倒排表
+        tag_ids = Post.tags.through.objects.filter(post_id__in=post_ids).values_list('tag_id', flat=True).distinct()
+        counts = tag_facets(post_ids, tag_ids)
+        tags = Tag.objects.filter(id__in=counts.keys())
+        data = sorted(
+            ({'id': tag.id, 'name': tag.name, 'count': counts[tag.id]} for tag in tags),
+            key=lambda item: (-item['count'], item['id'])
+        )
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def thread(self, request, pk=None):
+        """
+        分页获取帖子的回复树（按顶级回复分页）
+        查询参数:
+        - depth: 展开深度，1 表示只返回顶级回复，默认不限制
+        - root: 只返回以该回复为根的子树（用于深度截断后"展开更多"）
+        - page / page_size: 顶级回复分页
+        """
+        post = self.get_object()
+
+        depth = request.query_params.get('depth')
+        max_depth = max(int(depth), 1) if depth and depth.isdigit() else None
+        root = request.query_params.get('root')
+        root_id = int(root) if root and root.isdigit() else None
+
+        roots = build_reply_tree(load_replies(post.id), max_depth=max_depth, root_id=root_id)
+
+        paginator = ReplyThreadPagination()
+        page = paginator.paginate_queryset(roots, request, view=self)
+        serializer = ReplyThreadSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
 class ImageViewSet(viewsets.ModelViewSet):
     queryset = Image.objects.all()
     serializer_class = ImageSerializer
@@ -81,9 +229,29 @@ class ReplyViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """按帖子查询时一次加载该帖全部回复并在内存中组装子回复"""
+        post_id = request.query_params.get('post', None)
+        if not post_id or not post_id.isdigit():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        matched_ids = set(queryset.values_list('id', flat=True))
+        replies = load_replies(int(post_id))
+        build_reply_tree(replies)
+
+        serializer = self.get_serializer([r for r in replies if r.id in matched_ids], many=True)
+        return Response(serializer.data)
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            reply = serializer.save(author=self.request.user)
+            record_reply_created(reply)
     
     def perform_destroy(self, instance):
-        # Django的CASCADE会自动删除子回复
-        instance.delete()
+        with transaction.atomic():
+            # Django的CASCADE会自动删除子回复，回复数要扣减整棵子树
+            count = subtree_size(instance)
+            post_id = instance.post_id
+            instance.delete()
+            record_replies_deleted(post_id, count)
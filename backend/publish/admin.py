@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 
-from .models import Artist, Album, Music, Video, Notice
+from .models import Artist, Album, Music, Video, Notice, ChunkedUpload
 
 # Register your models here.
 @admin.register(Artist)
@@ -48,4 +48,12 @@ class VideoAdmin(admin.ModelAdmin):
 class NoticeAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'is_active', 'created_at', 'updated_at']
     search_fields = ['title', 'author__username']
-    list_filter = ['is_active', 'author', 'created_at']
\ No newline at end of file
+    list_filter = ['is_active', 'author', 'created_at']
+
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'target', 'object_id', 'size', 'user', 'status', 'created_at', 'updated_at']
+    search_fields = ['filename', 'user__username']
+    list_filter = ['status', 'target']
+    readonly_fields = ['id', 'created_at', 'updated_at']
@@ -0,0 +1,175 @@
+"""
+音频分析（NumPy + ffmpeg，不依赖 Django）
+本模块中的函数会在子进程中执行，因此不能导入 Django 模型或配置，ffmpeg 路径等由调用方传入。
+
+- 时长、比特率、采样率：WAV 用标准库 wave 读取文件头，其他格式调用 ffprobe
+- 波形峰值：把音频解码为单声道 PCM 流式读取，每段取绝对值最大值，
+  归一化为 0-255 的 uint8 数组，以 bytes 保存（默认 800 段，约 800 字节）。
+  按块处理，内存占用与音频长度无关
+"""
+import json
+import logging
+import math
+import os
+import subprocess
+import threading
+import wave
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PEAK_BUCKETS = 800
+# 非 WAV 文件解码时的重采样率，只用于计算波形，8 kHz 足够且解码量小
+DECODE_SAMPLE_RATE = 8000
+READ_FRAMES = 32 * 1024
+# ffprobe / ffmpeg 的最长运行时间（秒），超时后结束进程，避免损坏的文件一直占用分析进程
+PROBE_TIMEOUT = 60
+DECODE_TIMEOUT = 300
+
+# 分析失败时的结果：采样率为 None，store_audio_metadata 据此把 Music.analysis_failed 记为 True
+FAILED_AUDIO_METADATA = {'duration': None, 'bitrate': None, 'sample_rate': None, 'peaks': b''}
+
+
+class PeakReducer:
+    """流式计算峰值：每 samples_per_bucket 个采样取一个最大值"""
+
+    def __init__(self, samples_per_bucket):
+        self.samples_per_bucket = max(1, samples_per_bucket)
+        self.carry = np.empty(0, dtype=np.float32)
+        self.peaks = []
+
+    def feed(self, samples):
+        samples = np.concatenate([self.carry, np.abs(samples, dtype=np.float32)])
+        full = len(samples) // self.samples_per_bucket * self.samples_per_bucket
+        if full:
+            self.peaks.append(samples[:full].reshape(-1, self.samples_per_bucket).max(axis=1))
+        self.carry = samples[full:]
+
+    def result(self):
+        """归一化到 0-255（以整首最大峰值为 255），返回 bytes"""
+        if len(self.carry):
+            self.peaks.append(np.array([self.carry.max()], dtype=np.float32))
+        if not self.peaks:
+            return b''
+        peaks = np.concatenate(self.peaks)
+        top = peaks.max()
+        if top > 0:
+            peaks = peaks / top
+        return np.round(peaks * 255).astype(np.uint8).tobytes()
+
+
+def _wav_samples(frames, sample_width, channels):
+    """PCM 数据转为 [-1, 1] 的浮点数组，多声道取各声道绝对值最大者"""
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values >= 1 << 23, values - (1 << 24), values)
+        samples = values.astype(np.float32) / (1 << 23)
+    elif sample_width == 4:
+        samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / (1 << 31)
+    else:
+        raise ValueError(f'不支持的采样位宽: {sample_width}')
+    if channels > 1:
+        samples = np.abs(samples.reshape(-1, channels)).max(axis=1)
+    return samples
+
+
+def _analyze_wav(path, buckets):
+    with wave.open(path, 'rb') as wav:
+        channels, sample_width, sample_rate, frame_count = (
+            wav.getnchannels(), wav.getsampwidth(), wav.getframerate(), wav.getnframes()
+        )
+        reducer = PeakReducer(math.ceil(frame_count / buckets))
+        while True:
+            frames = wav.readframes(READ_FRAMES)
+            if not frames:
+                break
+            reducer.feed(_wav_samples(frames, sample_width, channels))
+    return {
+        'duration': frame_count / sample_rate,
+        'bitrate': sample_rate * channels * sample_width * 8,
+        'sample_rate': sample_rate,
+        'peaks': reducer.result(),
+    }
+
+
+def probe(path, ffprobe='ffprobe'):
+    """调用 ffprobe 读取时长（秒）、比特率（bps）和采样率（Hz）"""
+    output = subprocess.run(
+        [ffprobe, '-v', 'error', '-select_streams', 'a:0',
+         '-show_entries', 'format=duration,bit_rate:stream=sample_rate,bit_rate',
+         '-of', 'json', path],
+        capture_output=True, check=True, timeout=PROBE_TIMEOUT,
+    ).stdout
+    info = json.loads(output)
+    stream = (info.get('streams') or [{}])[0]
+    fmt = info.get('format') or {}
+    if 'sample_rate' not in stream:
+        raise ValueError('没有音频流')
+    return {
+        'duration': float(fmt['duration']) if fmt.get('duration') else None,
+        'bitrate': int(stream.get('bit_rate') or fmt.get('bit_rate') or 0) or None,
+        'sample_rate': int(stream['sample_rate']),
+    }
+
+
+def decode_peaks(path, duration, buckets, ffmpeg='ffmpeg', timeout=DECODE_TIMEOUT):
+    """ffmpeg 解码为 8 kHz 单声道 16 位 PCM，从管道中流式计算峰值；超过 timeout 秒结束 ffmpeg"""
+    total = int((duration or 0) * DECODE_SAMPLE_RATE)
+    reducer = PeakReducer(math.ceil(total / buckets) if total else DECODE_SAMPLE_RATE // 10)
+    process = subprocess.Popen(
+        [ffmpeg, '-v', 'error', '-i', path, '-vn', '-ac', '1', '-ar', str(DECODE_SAMPLE_RATE),
+         '-f', 's16le', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    # 读取管道会阻塞，由定时器在超时后结束进程，读取随之结束
+    expired = threading.Event()
+
+    def kill():
+        expired.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        with process:
+            leftover = b''
+            while True:
+                data = process.stdout.read(READ_FRAMES * 2)
+                if not data:
+                    break
+                data = leftover + data
+                usable = len(data) // 2 * 2
+                leftover = data[usable:]
+                reducer.feed(np.frombuffer(data[:usable], dtype='<i2').astype(np.float32) / 32768)
+    finally:
+        timer.cancel()
+    if expired.is_set():
+        raise subprocess.TimeoutExpired(process.args, timeout)
+    if process.returncode:
+        raise RuntimeError(f'ffmpeg 解码失败（返回码 {process.returncode}）')
+    return reducer.result()
+
+
+def analyze_audio(path, buckets=PEAK_BUCKETS, ffmpeg='ffmpeg', ffprobe='ffprobe'):
+    """
+    返回 {'duration': 秒, 'bitrate': bps, 'sample_rate': Hz, 'peaks': bytes}
+    文件不存在、格式不支持或 ffmpeg 不可用时返回 FAILED_AUDIO_METADATA
+    """
+    try:
+        if os.path.splitext(path)[1].lower() == '.wav':
+            try:
+                return _analyze_wav(path, buckets)
+            except wave.Error:
+                pass  # 非 PCM 编码的 WAV（如 IEEE float），交给 ffmpeg
+        metadata = probe(path, ffprobe)
+        metadata['peaks'] = decode_peaks(path, metadata['duration'], buckets, ffmpeg)
+        return metadata
+    except Exception:
+        logger.warning('分析音频失败: %s', path, exc_info=True)
+        return FAILED_AUDIO_METADATA
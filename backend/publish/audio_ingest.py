@@ -0,0 +1,82 @@
+"""
+音乐文件上传后的分析
+在图片处理共用的进程池中读取时长、比特率、采样率并预计算波形峰值，结果写入 Music：
+    duration / bitrate / sample_rate / waveform（uint8 峰值数组的 bytes）
+sample_rate 为 NULL 表示尚未分析。分析失败时 sample_rate 保持 NULL 并把 analysis_failed 记为 True：
+保存记录时不再自动重试（直到重新上传文件），analyze_audio 命令默认会重试这些音乐。
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from shopping.image_variants import get_executor
+
+from .audio import analyze_audio
+from .models import Music
+
+logger = logging.getLogger(__name__)
+
+
+def analyze_args(music):
+    """传给子进程 analyze_audio 的参数（子进程不能读取 Django 配置）"""
+    return (music.file.path, settings.AUDIO_WAVEFORM_PEAKS, settings.FFMPEG_BINARY, settings.FFPROBE_BINARY)
+
+
+def clear_audio_metadata(music):
+    """音乐文件被替换时清空旧的分析结果"""
+    music.bitrate = None
+    music.sample_rate = None
+    music.waveform = None
+    music.analysis_failed = False
+
+
+def needs_analysis(music):
+    return bool(music.file) and music.sample_rate is None and not music.analysis_failed
+
+
+def store_audio_metadata(music_id, file_name, metadata):
+    """写入分析结果；文件在分析期间被替换时放弃（按文件名匹配）"""
+    fields = {
+        'bitrate': metadata['bitrate'],
+        'sample_rate': metadata['sample_rate'],
+        'waveform': metadata['peaks'] or None,
+        'analysis_failed': metadata['sample_rate'] is None,
+    }
+    # 以实际文件为准覆盖手工填写的时长
+    if metadata['duration']:
+        fields['duration'] = timedelta(seconds=round(metadata['duration'], 3))
+    # 用 update 避免触发 post_save 再次分析
+    Music.objects.filter(id=music_id, file=file_name).update(**fields)
+
+
+def _on_analyzed(music_id, file_name, future):
+    try:
+        store_audio_metadata(music_id, file_name, future.result())
+    except Exception:
+        logger.exception('保存音频分析结果失败: %s', music_id)
+    finally:
+        close_old_connections()
+
+
+def submit_analysis(music):
+    if not settings.IMAGE_PROCESS_WORKERS:
+        store_audio_metadata(music.id, music.file.name, analyze_audio(*analyze_args(music)))
+        return
+    future = get_executor().submit(analyze_audio, *analyze_args(music))
+    future.add_done_callback(
+        lambda f, music_id=music.id, name=music.file.name: _on_analyzed(music_id, name, f)
+    )
+
+
+def schedule_analysis(music):
+    """事务提交后再分析，确保文件和记录都已落盘"""
+    transaction.on_commit(lambda: submit_analysis(music))
+
+
+def waveform_peaks(music):
+    """波形峰值列表（0-255），尚未生成时返回 None"""
+    if not music.waveform:
+        return None
+    return list(bytes(music.waveform))
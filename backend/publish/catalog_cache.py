@@ -0,0 +1,51 @@
+"""
+发布目录（艺术家 / 专辑 / 音乐 / 视频 / 公告）列表的响应缓存
+列表数据很少变化，序列化结果按"目录版本号"缓存：
+    publish:catalog:<版本号>:<列表名>:<参数摘要>
+任一相关模型保存或删除后（事务提交时）版本号递增，旧版本的缓存不再命中，随 TTL 过期。
+版本号必须放在多进程共享的缓存中（见 backend/shared_cache.py），否则其他进程在 TTL 内返回旧数据。
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'publish:catalog:version'
+
+
+def catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # 以毫秒时间戳为初始值：缓存被清空后不会回到曾经用过的版本号
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), None)
+
+
+def invalidate_catalog():
+    """事务提交后使所有列表缓存失效"""
+    transaction.on_commit(_bump_version)
+
+
+def cached_catalog(request, name, build, params=None):
+    """
+    返回缓存的列表数据，未命中时调用 build() 生成
+    params 为影响结果的查询参数；序列化结果包含完整 URL，因此键中也包含协议和域名
+    """
+    raw = f'{request.scheme}://{request.get_host()}|{sorted((params or {}).items())}'
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    key = f'publish:catalog:{catalog_version()}:{name}:{digest}'
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.PUBLISH_CATALOG_CACHE_SECONDS)
+    return data
@@ -0,0 +1,151 @@
+"""
+大文件分片上传（可断点续传）
+1. 创建会话：POST /api/uploads/，返回上传 ID、分片大小和分片数
+2. 上传分片：PUT /api/uploads/<id>/parts/<序号>/，请求体为分片原始字节，
+   请求头 X-Chunk-SHA256 为该分片的 SHA-256；边接收边写入临时文件并计算摘要，
+   校验通过后原子重命名为 <序号>.part，重复上传同一分片会覆盖
+3. 查询进度：GET /api/uploads/<id>/ 返回已收到的分片序号，断线后只需补传缺失的分片
+4. 完成：POST /api/uploads/<id>/complete/，按顺序流式合并分片（校验整个文件的 SHA-256），
+   写入音乐或视频记录的 file 字段；会话先以条件更新从“上传中”改为“合并中”，
+   并发的完成请求只有一个能执行合并，合并失败时恢复为“上传中”以便补传后重试
+
+分片目录：CHUNKED_UPLOAD_DIR/<上传ID>/；超时未完成的会话由 sweep_chunked_uploads 命令清理。
+"""
+import hashlib
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .models import ChunkedUpload, Music, Video
+
+READ_SIZE = 64 * 1024
+
+# 目标类型 -> 模型（文件字段均为 file）
+UPLOAD_TARGETS = {
+    'music': Music,
+    'video': Video,
+}
+
+
+class ChunkError(Exception):
+    """分片无效（序号越界、大小不符、校验失败）"""
+
+
+class UploadConflict(Exception):
+    """会话已完成或正在被另一个请求合并"""
+
+
+def upload_dir(upload_id):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, str(upload_id))
+
+
+def part_path(upload_id, index):
+    return os.path.join(upload_dir(upload_id), f'{index}.part')
+
+
+def received_parts(upload):
+    """已校验通过的分片序号列表"""
+    try:
+        names = os.listdir(upload_dir(upload.id))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-5]) for name in names if name.endswith('.part'))
+
+
+def write_part(upload, index, stream, checksum):
+    """把请求体流式写入临时文件，大小和 SHA-256 都符合时才保存为分片"""
+    if not 0 <= index < upload.total_chunks:
+        raise ChunkError(f'分片序号超出范围（共 {upload.total_chunks} 片）')
+    expected = upload.chunk_length(index)
+
+    directory = upload_dir(upload.id)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f'{index}.{uuid.uuid4().hex}.tmp')
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            while written <= expected:
+                data = stream.read(READ_SIZE)
+                if not data:
+                    break
+                digest.update(data)
+                f.write(data)
+                written += len(data)
+        if written != expected:
+            raise ChunkError(f'分片大小应为 {expected} 字节，实际收到 {written} 字节')
+        if digest.hexdigest() != checksum.lower():
+            raise ChunkError('分片 SHA-256 校验失败')
+        os.replace(tmp_path, part_path(upload.id, index))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    # 刷新更新时间，清理命令据此判断会话是否已停滞
+    ChunkedUpload.objects.filter(id=upload.id).update(updated_at=timezone.now())
+
+
+class AssembledFile(File):
+    """合并后的文件已在磁盘上，存储后端可以直接移动而不必再复制一次"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def assemble(upload):
+    """按序号顺序流式合并分片，返回合并文件路径；缺片或整体校验失败时抛出 ChunkError"""
+    missing = sorted(set(range(upload.total_chunks)) - set(received_parts(upload)))
+    if missing:
+        raise ChunkError(f'缺少分片: {missing[:20]}')
+
+    output = os.path.join(upload_dir(upload.id), f'assembled.{uuid.uuid4().hex}.tmp')
+    digest = hashlib.sha256()
+    try:
+        with open(output, 'wb') as out:
+            for index in range(upload.total_chunks):
+                with open(part_path(upload.id, index), 'rb') as part:
+                    for data in iter(lambda: part.read(READ_SIZE), b''):
+                        digest.update(data)
+                        out.write(data)
+        if upload.sha256 and digest.hexdigest() != upload.sha256.lower():
+            raise ChunkError('文件 SHA-256 校验失败')
+    except BaseException:
+        os.remove(output)
+        raise
+    return output
+
+
+def complete(upload):
+    """认领会话后合并分片并写入目标记录的文件字段，返回目标记录；会话不在上传中时抛出 UploadConflict"""
+    claimed = ChunkedUpload.objects.filter(id=upload.id, status='uploading').update(
+        status='assembling', updated_at=timezone.now(),
+    )
+    if not claimed:
+        raise UploadConflict('上传已完成或正在合并')
+    try:
+        instance = UPLOAD_TARGETS[upload.target].objects.get(pk=upload.object_id)
+        path = assemble(upload)
+        try:
+            with open(path, 'rb') as f:
+                # save=True 会触发 post_save（音频分析、目录缓存失效等）
+                instance.file.save(upload.filename, AssembledFile(f), save=True)
+        finally:
+            # 存储后端移动了文件时已不存在
+            if os.path.exists(path):
+                os.remove(path)
+    except BaseException:
+        ChunkedUpload.objects.filter(id=upload.id, status='assembling').update(
+            status='uploading', updated_at=timezone.now(),
+        )
+        raise
+    upload.status = 'completed'
+    upload.save(update_fields=['status', 'updated_at'])
+    discard_parts(upload.id)
+    return instance
+
+
+def discard_parts(upload_id):
+    shutil.rmtree(upload_dir(upload_id), ignore_errors=True)
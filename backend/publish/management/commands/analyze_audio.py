@@ -0,0 +1,55 @@
+"""
+为已有音乐分析时长、比特率、采样率并生成波形峰值（多进程并行）
+用法:
+    python manage.py analyze_audio             # 处理尚未分析和之前分析失败的音乐
+    python manage.py analyze_audio --skip-failed  # 不重试之前分析失败的音乐
+    python manage.py analyze_audio --all       # 全部重新分析
+    python manage.py analyze_audio --workers 8
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from publish.audio import analyze_audio
+from publish.audio_ingest import store_audio_metadata
+from publish.models import Music
+
+
+class Command(BaseCommand):
+    help = '为已有音乐分析时长、比特率、采样率并生成波形峰值'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新分析全部音乐')
+        parser.add_argument('--skip-failed', action='store_true', help='跳过之前分析失败的音乐')
+        parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核数')
+
+    def handle(self, *args, **options):
+        queryset = Music.objects.exclude(file='')
+        if not options['all']:
+            # 分析失败的音乐采样率同样为 NULL，默认一并重试
+            queryset = queryset.filter(sample_rate__isnull=True)
+            if options['skip_failed']:
+                queryset = queryset.filter(analysis_failed=False)
+        rows = list(queryset.values_list('id', 'file'))
+        if not rows:
+            self.stdout.write('没有需要分析的音乐')
+            return
+
+        storage = Music._meta.get_field('file').storage
+        paths = [storage.path(name) for _, name in rows]
+        count = len(rows)
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            # map 保持输入顺序，结果与 rows 一一对应
+            results = executor.map(
+                analyze_audio, paths,
+                [settings.AUDIO_WAVEFORM_PEAKS] * count,
+                [settings.FFMPEG_BINARY] * count,
+                [settings.FFPROBE_BINARY] * count,
+            )
+            for (music_id, name), metadata in zip(rows, results):
+                failed += metadata['sample_rate'] is None
+                store_audio_metadata(music_id, name, metadata)
+
+        self.stdout.write(self.style.SUCCESS(f'音频分析完成：{count} 首，失败 {failed} 首'))
@@ -0,0 +1,83 @@
+"""
+清理停滞的分片上传
+删除超过有效期没有新分片的未完成会话及其分片目录，以及已完成会话的记录；
+分片目录中没有对应会话记录的目录（如会话被删除时清理失败）也一并删除。
+用法:
+    python manage.py sweep_chunked_uploads                # 使用 CHUNKED_UPLOAD_EXPIRE_SECONDS
+    python manage.py sweep_chunked_uploads --max-age 3600
+    python manage.py sweep_chunked_uploads --dry-run
+"""
+import os
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from publish.chunked_upload import discard_parts, upload_dir
+from publish.models import ChunkedUpload
+
+
+class Command(BaseCommand):
+    help = '清理停滞的分片上传会话和分片文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=None,
+                            help='未完成会话的有效期（秒），默认 CHUNKED_UPLOAD_EXPIRE_SECONDS')
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不删除')
+
+    def handle(self, *args, **options):
+        max_age = options['max_age'] if options['max_age'] is not None else settings.CHUNKED_UPLOAD_EXPIRE_SECONDS
+        cutoff = timezone.now() - timedelta(seconds=max_age)
+        dry_run = options['dry_run']
+
+        stale = ChunkedUpload.objects.filter(updated_at__lt=cutoff)
+        stale_ids = list(stale.values_list('id', flat=True))
+        freed = sum(_dir_size(upload_dir(upload_id)) for upload_id in stale_ids)
+        if not dry_run:
+            for upload_id in stale_ids:
+                discard_parts(upload_id)
+            ChunkedUpload.objects.filter(id__in=stale_ids).delete()
+
+        # 没有会话记录的分片目录，同样按修改时间判断，避开刚创建的目录
+        orphans = []
+        known = {str(upload_id) for upload_id in ChunkedUpload.objects.values_list('id', flat=True)}
+        try:
+            entries = list(os.scandir(settings.CHUNKED_UPLOAD_DIR))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if (entry.is_dir(follow_symlinks=False) and _is_uuid(entry.name) and entry.name not in known
+                    and entry.stat().st_mtime < time.time() - max_age):
+                orphans.append(entry.name)
+        freed += sum(_dir_size(upload_dir(name)) for name in orphans)
+        if not dry_run:
+            for name in orphans:
+                discard_parts(name)
+
+        prefix = '[dry-run] ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}清理会话 {len(stale_ids)} 个，无记录目录 {len(orphans)} 个，释放 {freed / 1024 / 1024:.1f} MB'
+        ))
+
+
+def _is_uuid(name):
+    try:
+        uuid.UUID(name)
+        return True
+    except ValueError:
+        return False
+
+
+def _dir_size(path):
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+    except FileNotFoundError:
+        pass
+    return total
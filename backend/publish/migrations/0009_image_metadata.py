@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publish', '0008_album_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='cover_blurhash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='封面占位图'),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='cover_dominant_color',
+            field=models.CharField(blank=True, max_length=7, verbose_name='封面主色'),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='cover_height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='封面高度'),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='cover_width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='封面宽度'),
+        ),
+    ]
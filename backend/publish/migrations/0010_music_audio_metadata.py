@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publish', '0009_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='music',
+            name='bitrate',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='比特率（bps）'),
+        ),
+        migrations.AddField(
+            model_name='music',
+            name='sample_rate',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='采样率（Hz）'),
+        ),
+        migrations.AddField(
+            model_name='music',
+            name='waveform',
+            field=models.BinaryField(blank=True, null=True, verbose_name='波形峰值'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:08
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publish', '0010_music_audio_metadata'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='上传ID')),
+                ('target', models.CharField(choices=[('music', '音乐'), ('video', '视频')], max_length=10, verbose_name='目标类型')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='目标记录ID')),
+                ('filename', models.CharField(max_length=255, verbose_name='文件名')),
+                ('size', models.PositiveBigIntegerField(verbose_name='文件大小')),
+                ('chunk_size', models.PositiveIntegerField(verbose_name='分片大小')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='文件SHA-256')),
+                ('status', models.CharField(choices=[('uploading', '上传中'), ('completed', '已完成')], default='uploading', max_length=10, verbose_name='状态')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='上传者')),
+            ],
+            options={
+                'verbose_name': '分片上传',
+                'verbose_name_plural': '分片上传',
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='publish_chu_status_d1ef28_idx')],
+            },
+        ),
+    ]
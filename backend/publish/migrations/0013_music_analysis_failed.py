@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:39
+
+from django.db import migrations, models
+
+
+def mark_failed_analysis(apps, schema_editor):
+    """之前分析失败的音乐采样率记为 0，改为 NULL + 失败标记，analyze_audio 默认会重试"""
+    Music = apps.get_model('publish', 'Music')
+    Music.objects.filter(sample_rate=0).update(sample_rate=None, analysis_failed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publish', '0012_image_metadata_failed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='music',
+            name='analysis_failed',
+            field=models.BooleanField(default=False, editable=False, verbose_name='音频分析失败'),
+        ),
+        migrations.RunPython(mark_failed_analysis, migrations.RunPython.noop),
+    ]
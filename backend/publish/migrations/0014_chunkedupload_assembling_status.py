@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publish', '0013_music_analysis_failed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chunkedupload',
+            name='status',
+            field=models.CharField(choices=[('uploading', '上传中'), ('assembling', '合并中'), ('completed', '已完成')], default='uploading', max_length=10, verbose_name='状态'),
+        ),
+    ]
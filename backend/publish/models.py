@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 
 # 动态图片上传路径函数
@@ -40,6 +42,12 @@ class Album(models.Model):
     name = models.CharField(max_length=200, verbose_name="专辑名")
     artist = models.ForeignKey(Artist, on_delete=models.CASCADE, verbose_name="艺术家")
     cover_image = models.ImageField(upload_to=album_upload_path, blank=True, verbose_name="封面图片")
+    # 图片元数据，上传后由 shopping.image_metadata 异步计算
+    cover_width = models.PositiveIntegerField(null=True, blank=True, verbose_name="封面宽度")
+    cover_height = models.PositiveIntegerField(null=True, blank=True, verbose_name="封面高度")
+    cover_dominant_color = models.CharField(max_length=7, blank=True, verbose_name="封面主色")
+    cover_blurhash = models.CharField(max_length=64, blank=True, verbose_name="封面占位图")
+    cover_metadata_failed = models.BooleanField(default=False, verbose_name="封面元数据计算失败")
     release_date = models.DateField(blank=True, null=True, verbose_name="发行日期")
     description = models.TextField(blank=True, verbose_name="描述")
     product = models.ForeignKey('shopping.ProductSPU', on_delete=models.SET_NULL, null=True, blank=True, related_name='albums', verbose_name="关联商品")
@@ -64,6 +72,11 @@ class Music(models.Model):
     track_number = models.PositiveIntegerField(blank=True, null=True, verbose_name="轨道号")
     duration = models.DurationField(blank=True, null=True, verbose_name="时长")
     file = models.FileField(upload_to=music_upload_path, blank=True, verbose_name="音乐文件")
+    # 音频分析结果，上传后由 publish.audio_ingest 异步写入
+    bitrate = models.PositiveIntegerField(blank=True, null=True, verbose_name="比特率（bps）")
+    sample_rate = models.PositiveIntegerField(blank=True, null=True, verbose_name="采样率（Hz）")
+    waveform = models.BinaryField(blank=True, null=True, editable=False, verbose_name="波形峰值")
+    analysis_failed = models.BooleanField(default=False, editable=False, verbose_name="音频分析失败")
     is_active = models.BooleanField(default=True, verbose_name="是否发布")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
 
@@ -126,4 +139,44 @@ class Notice(models.Model):
         ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+class ChunkedUpload(models.Model):
+    """
+    分片上传会话（大音乐 / 视频文件）
+    分片保存在 CHUNKED_UPLOAD_DIR/<id>/ 下，全部上传后合并并写入目标记录的文件字段（见 chunked_upload.py）
+    """
+    TARGET_CHOICES = [('music', '音乐'), ('video', '视频')]
+    STATUS_CHOICES = [('uploading', '上传中'), ('assembling', '合并中'), ('completed', '已完成')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, verbose_name="上传ID")
+    user = models.ForeignKey('user.User', on_delete=models.CASCADE, verbose_name="上传者")
+    target = models.CharField(max_length=10, choices=TARGET_CHOICES, verbose_name="目标类型")
+    object_id = models.PositiveBigIntegerField(verbose_name="目标记录ID")
+    filename = models.CharField(max_length=255, verbose_name="文件名")
+    size = models.PositiveBigIntegerField(verbose_name="文件大小")
+    chunk_size = models.PositiveIntegerField(verbose_name="分片大小")
+    sha256 = models.CharField(max_length=64, blank=True, verbose_name="文件SHA-256")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading', verbose_name="状态")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "分片上传"
+        verbose_name_plural = "分片上传"
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.get_status_display()})"
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_length(self, index):
+        """第 index 个分片应有的字节数（最后一片可能较短）"""
+        if index == self.total_chunks - 1:
+            return self.size - self.chunk_size * index
+        return self.chunk_size
@@ -0,0 +1,83 @@
+"""
+受保护媒体文件（已购音乐）的签名 URL 与下载
+1. 已登录用户请求授权接口，校验权益后签发短时有效的 URL：
+       /api/music/<id>/download/?u=<用户ID>&e=<过期时间戳>&s=<HMAC 签名>
+2. 下载接口只校验签名和过期时间，不查询权益，也不在 Django 中读取文件：
+   - PROTECTED_MEDIA_SERVER = 'nginx'    返回 X-Accel-Redirect，由 nginx 的 internal location 发送文件
+   - PROTECTED_MEDIA_SERVER = 'sendfile' 返回 X-Sendfile（Apache mod_xsendfile / lighttpd）
+   - 未配置时由 Django 流式返回（本地开发、测试），支持 Range
+3. 播放接口（/api/music/<id>/stream/）对需要购买的音乐同样要求签名（或会话用户已购买），
+   列表接口不返回这些音乐的文件地址和播放地址
+
+音乐文件和去重存储的 blob 目录不能经 /media/ 直接访问，否则可以绕过上述校验：
+开发环境由 serve_public_media 拒绝，生产环境需在 nginx 中拒绝（见 settings 受保护媒体配置）。
+"""
+import mimetypes
+import time
+import posixpath
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.views.static import serve
+
+from .streaming import stream_file
+
+_SALT = 'publish.protected_media'
+
+
+def _signature(kind, pk, user_id, expires):
+    message = f'{kind}:{pk}:{user_id}:{expires}'
+    return salted_hmac(_SALT, message, algorithm='sha256').hexdigest()
+
+
+def sign_media_url(url_name, kind, pk, user_id, request=None):
+    """签发下载 URL，返回 (url, 过期时间戳)"""
+    expires = int(time.time()) + settings.PROTECTED_MEDIA_URL_TTL
+    query = urlencode({'u': user_id, 'e': expires, 's': _signature(kind, pk, user_id, expires)})
+    url = f'{reverse(url_name, args=[pk])}?{query}'
+    return (request.build_absolute_uri(url) if request else url), expires
+
+
+def verify_media_signature(kind, pk, params):
+    """校验签名和过期时间，签名无效或已过期时返回 False"""
+    try:
+        user_id = int(params['u'])
+        expires = int(params['e'])
+        signature = params['s']
+    except (KeyError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return constant_time_compare(signature, _signature(kind, pk, user_id, expires))
+
+
+def non_public_media_prefixes():
+    """MEDIA_ROOT 下不能经 /media/ 直接访问的目录"""
+    return (f'{settings.DEDUP_BLOB_DIR}/', 'publish/music/')
+
+
+def serve_public_media(request, path):
+    """开发环境的 /media/：与生产环境 nginx 配置一致，不提供 blob 目录和音乐文件"""
+    normalized = posixpath.normpath(path.replace('\\', '/')).lstrip('/')
+    if normalized.startswith(non_public_media_prefixes()):
+        raise Http404
+    return serve(request, path, document_root=settings.MEDIA_ROOT)
+
+
+def serve_protected_file(request, field_file):
+    """按 PROTECTED_MEDIA_SERVER 配置把文件交给前端服务器发送，未配置时由 Django 返回"""
+    server = settings.PROTECTED_MEDIA_SERVER
+    if not server:
+        return stream_file(request, field_file)
+
+    response = HttpResponse(content_type=mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream')
+    if server == 'nginx':
+        response['X-Accel-Redirect'] = quote(settings.PROTECTED_MEDIA_INTERNAL_URL + field_file.name)
+    else:
+        response['X-Sendfile'] = field_file.path
+    # 由前端服务器处理 Range / 条件请求；签名 URL 只能由持有者私有缓存
+    response['Cache-Control'] = 'private, max-age=0'
+    return response
@@ -1,5 +1,12 @@
+import os
+
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Artist, Album, Music, Video, Notice
+from .models import Artist, Album, Music, Video, Notice, ChunkedUpload
+from .chunked_upload import UPLOAD_TARGETS, received_parts
+from shopping.image_metadata import image_meta
+from shopping.image_variants import variant_urls
 
 class ArtistSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,35 +23,108 @@ class AlbumSerializer(serializers.ModelSerializer):
     
     def get_product_info(self, obj):
         if obj.product:
-            # 获取主图
-            main_image = obj.product.images.filter(is_main=True).first()
-            if not main_image:
-                # 如果没有主图，获取第一张图片
-                main_image = obj.product.images.first()
-            
+            # 获取主图，没有主图时取第一张图片；images 已预加载时不再查询
+            images = sorted(obj.product.images.all(), key=lambda image: image.id)
+            main_image = next((image for image in images if image.is_main), images[0] if images else None)
+
             return {
                 'id': obj.product.id,
                 'name': obj.product.name,
                 'description': obj.product.description,
                 'image': main_image.image.url if main_image else None,
+                'image_variants': variant_urls(main_image, self.context.get('request')) if main_image else None,
+                'image_meta': image_meta(main_image) if main_image else None,
             }
         return None
 
+def stream_url(url_name, obj, request):
+    """支持 Range 的播放地址，没有文件时返回 None"""
+    if not obj.file:
+        return None
+    url = reverse(url_name, args=[obj.id])
+    return request.build_absolute_uri(url) if request else url
+
 class MusicSerializer(serializers.ModelSerializer):
+    """
+    /media/ 不提供音乐文件：免费音乐的 file 与 stream_url 都指向 music/<id>/stream/；
+    需要购买的音乐两者均为 None，购买后通过 music/<id>/access/ 获取签名地址。
+    输出与当前用户无关，可以放入目录缓存
+    """
     artist = ArtistSerializer(read_only=True)
     album = AlbumSerializer(read_only=True)
+    file = serializers.SerializerMethodField()
+    stream_url = serializers.SerializerMethodField()
+    requires_purchase = serializers.SerializerMethodField()
+
     class Meta:
         model = Music
-        fields = '__all__'
+        exclude = ['waveform']  # 峰值数据较大，通过 music/<id>/peaks/ 单独获取
+
+    def get_requires_purchase(self, obj):
+        return bool(obj.album and obj.album.product_id)
+
+    def get_stream_url(self, obj):
+        if self.get_requires_purchase(obj):
+            return None
+        return stream_url('music-stream', obj, self.context.get('request'))
+
+    def get_file(self, obj):
+        return self.get_stream_url(obj)
 
 class VideoSerializer(serializers.ModelSerializer):
+    stream_url = serializers.SerializerMethodField()
+
     class Meta:
         model = Video
         fields = '__all__'
 
+    def get_stream_url(self, obj):
+        return stream_url('video-stream', obj, self.context.get('request'))
+
 class NoticeSerializer(serializers.ModelSerializer):
     author = serializers.StringRelatedField()
 
     class Meta:
         model = Notice
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    total_chunks = serializers.IntegerField(read_only=True)
+    received = serializers.SerializerMethodField()
+    chunk_size = serializers.IntegerField(required=False)
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'target', 'object_id', 'filename', 'size', 'chunk_size', 'sha256',
+                  'status', 'total_chunks', 'received', 'created_at', 'updated_at']
+        read_only_fields = ['status', 'created_at', 'updated_at']
+
+    def get_received(self, obj):
+        return received_parts(obj) if obj.status == 'uploading' else []
+
+    def validate_filename(self, value):
+        return os.path.basename(value.replace('\\', '/'))
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('文件大小必须大于 0')
+        if value > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'文件不能超过 {settings.CHUNKED_UPLOAD_MAX_SIZE} 字节')
+        return value
+
+    def validate_chunk_size(self, value):
+        if not 64 * 1024 <= value <= settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            raise serializers.ValidationError(f'分片大小应在 64KB 到 {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} 字节之间')
+        return value
+
+    def validate_sha256(self, value):
+        if value and (len(value) != 64 or any(c not in '0123456789abcdefABCDEF' for c in value)):
+            raise serializers.ValidationError('SHA-256 应为 64 位十六进制字符串')
+        return value.lower()
+
+    def validate(self, attrs):
+        model = UPLOAD_TARGETS[attrs['target']]
+        if not model.objects.filter(pk=attrs['object_id']).exists():
+            raise serializers.ValidationError({'object_id': '目标记录不存在'})
+        attrs.setdefault('chunk_size', settings.CHUNKED_UPLOAD_CHUNK_SIZE)
+        return attrs
@@ -0,0 +1,49 @@
+"""
+发布信号处理
+- 音乐文件上传或替换后，异步分析时长、比特率、采样率并生成波形峰值
+- 目录相关数据变化后，使列表缓存失效
+"""
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from shopping.models import ProductImage, ProductSPU
+
+from .audio_ingest import clear_audio_metadata, needs_analysis, schedule_analysis
+from .catalog_cache import invalidate_catalog
+from .models import Album, Artist, Music, Notice, Video
+
+
+@receiver(post_init, sender=Music)
+def remember_audio_file(sender, instance, **kwargs):
+    # 读取 __dict__ 而不是属性，延迟加载（only/defer）的字段不会因此触发查询
+    if 'file' in instance.__dict__:
+        value = instance.__dict__['file']
+        instance._loaded_file_name = getattr(value, 'name', value)
+
+
+@receiver(pre_save, sender=Music)
+def reset_audio_metadata(sender, instance, **kwargs):
+    # 新上传（尚未提交到存储）或已通过 FieldFile.save 换成其他文件（如分片上传完成）时，旧的分析结果作废
+    file = instance.file
+    if file and (not file._committed or file.name != getattr(instance, '_loaded_file_name', file.name)):
+        clear_audio_metadata(instance)
+
+
+@receiver(post_save, sender=Music)
+def analyze_uploaded_audio(sender, instance, **kwargs):
+    instance._loaded_file_name = instance.file.name
+    if needs_analysis(instance):
+        schedule_analysis(instance)
+
+
+# 专辑列表中包含关联商品的名称、描述和主图，商品变化也需要失效
+CATALOG_MODELS = (Artist, Album, Music, Video, Notice, ProductSPU, ProductImage)
+
+
+def clear_catalog_cache(sender, **kwargs):
+    invalidate_catalog()
+
+
+for _model in CATALOG_MODELS:
+    post_save.connect(clear_catalog_cache, sender=_model, dispatch_uid=f'publish_catalog:{_model._meta.label}')
+    post_delete.connect(clear_catalog_cache, sender=_model, dispatch_uid=f'publish_catalog:{_model._meta.label}')
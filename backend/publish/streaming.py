@@ -0,0 +1,145 @@
+"""
+音视频文件流式传输（支持 HTTP Range）
+播放器拖动进度条时只请求需要的字节区间，不必重新下载整个文件。
+
+- Range: bytes=start-end / bytes=start- / bytes=-suffix，返回 206 和 Content-Range
+- If-Range 与当前 ETag（或 Last-Modified）不一致时忽略 Range，返回完整文件
+- ETag 由文件大小和修改时间生成，不读取文件内容
+- 按块读取，内存占用与文件大小无关；区间延伸到文件末尾（播放器最常见的请求）时直接
+  交给 FileResponse，WSGI 服务器提供 wsgi.file_wrapper 时可走 sendfile 零拷贝
+"""
+import mimetypes
+import os
+import re
+
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(stat):
+    """由文件大小和修改时间（纳秒）生成强 ETag"""
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    解析单个字节区间，返回 (start, end)（包含 end）
+    没有 Range 头、格式不支持（包括多区间）时返回 None，按完整文件处理；
+    区间无法满足时抛出 ValueError
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-500 表示最后 500 字节
+        length = int(end)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    """If-Range 可以是 ETag 或 HTTP 日期，不一致说明文件已变化，应返回完整文件"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+class RangeFile:
+    """
+    只读取 [start, start + length) 区间的文件包装
+    不暴露 fileno()，WSGI 服务器会按块调用 read()，不会越过区间末尾
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+        self.name = file.name
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def stream_file(request, field_file, content_type=None):
+    """返回 FieldFile 对应文件的响应，处理条件请求和 Range"""
+    if not field_file:
+        raise Http404('文件不存在')
+    path = field_file.path
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('文件不存在')
+
+    size = stat.st_size
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    def set_headers(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    # If-None-Match / If-Modified-Since 命中时返回 304
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return set_headers(conditional)
+
+    byte_range = None
+    if _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return set_headers(response)
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    else:
+        file = open(path, 'rb')
+        if end == size - 1:
+            # 区间延伸到文件末尾：直接传文件对象，可使用 sendfile
+            file.seek(start)
+            response = FileResponse(file, content_type=content_type)
+        else:
+            response = FileResponse(RangeFile(file, start, length), content_type=content_type)
+        response.block_size = CHUNK_SIZE
+
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return set_headers(response)
@@ -1,3 +1,541 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from shopping.models import Category, ProductSKU, ProductSPU
+from user.authentication import tokens_for_user
+from user.models import User, UserProduct
+
+from . import chunked_upload
+from .audio import FAILED_AUDIO_METADATA, PeakReducer, analyze_audio, decode_peaks
+from .chunked_upload import ChunkError, UploadConflict, received_parts, write_part
+from .models import Album, Artist, ChunkedUpload, Music, Notice, Video
+from .protected_media import serve_public_media, sign_media_url, verify_media_signature
+from .streaming import parse_range
+
+FILE_CONTENT = bytes(range(256)) * 4  # 1024 字节
+
+
+class MediaRootMixin:
+    """每个测试使用独立的临时 MEDIA_ROOT 和分片目录"""
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(
+            MEDIA_ROOT=os.path.join(root, 'media'), CHUNKED_UPLOAD_DIR=os.path.join(root, 'chunks'),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+# ==================== Range 解析 ====================
+
+class ParseRangeTests(SimpleTestCase):
+
+    def test_no_header(self):
+        self.assertIsNone(parse_range(None, 1024))
+        self.assertIsNone(parse_range('', 1024))
+
+    def test_closed_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1024), (0, 99))
+        self.assertEqual(parse_range(' bytes=100-199 ', 1024), (100, 199))
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_range('bytes=1000-', 1024), (1000, 1023))
+
+    def test_end_clamped_to_file_size(self):
+        self.assertEqual(parse_range('bytes=1000-5000', 1024), (1000, 1023))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range('bytes=-24', 1024), (1000, 1023))
+        self.assertEqual(parse_range('bytes=-5000', 1024), (0, 1023))
+
+    def test_unsupported_formats_ignored(self):
+        for header in ['bytes=0-1,5-6', 'items=0-1', 'bytes=-', 'bytes=a-b']:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1024))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ['bytes=1024-', 'bytes=2000-3000', 'bytes=10-5', 'bytes=-0']:
+            with self.subTest(header=header):
+                with self.assertRaises(ValueError):
+                    parse_range(header, 1024)
+
+
+# ==================== 流式播放 ====================
+
+class StreamVideoTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.video = Video(title='v')
+        self.video.file.save('v.mp4', ContentFile(FILE_CONTENT))
+        self.url = f'/api/videos/{self.video.id}/stream/'
+
+    def test_full_response(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Length'], '1024')
+        self.assertEqual(b''.join(response.streaming_content), FILE_CONTENT)
+
+    def test_partial_response(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1024')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(b''.join(response.streaming_content), FILE_CONTENT[100:200])
+
+    def test_range_to_end_of_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-24')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertEqual(b''.join(response.streaming_content), FILE_CONTENT[1000:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_if_range_mismatch_returns_full_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '1024')
+
+    def test_if_range_match(self):
+        etag = self.client.head(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), FILE_CONTENT[:10])
+
+    def test_if_none_match(self):
+        etag = self.client.head(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_head_has_no_body(self):
+        response = self.client.head(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response.content, b'')
+
+
+# ==================== 签名 URL ====================
+
+def signed_params(url):
+    return {key: values[0] for key, values in parse_qs(urlsplit(url).query).items()}
+
+
+class MediaSignatureTests(SimpleTestCase):
+
+    def setUp(self):
+        url, self.expires = sign_media_url('music-download', 'music', 7, 3)
+        self.params = signed_params(url)
+
+    def test_round_trip(self):
+        self.assertEqual(self.params['u'], '3')
+        self.assertTrue(verify_media_signature('music', 7, self.params))
+
+    def test_expired(self):
+        with mock.patch('publish.protected_media.time.time', return_value=self.expires + 1):
+            self.assertFalse(verify_media_signature('music', 7, self.params))
+
+    def test_tampered(self):
+        for key, value in [('u', '4'), ('e', str(self.expires + 3600)), ('s', '0' * 64)]:
+            with self.subTest(key=key):
+                self.assertFalse(verify_media_signature('music', 7, {**self.params, key: value}))
+
+    def test_other_resource(self):
+        self.assertFalse(verify_media_signature('music', 8, self.params))
+        self.assertFalse(verify_media_signature('video', 7, self.params))
+
+    def test_missing_or_malformed_params(self):
+        self.assertFalse(verify_media_signature('music', 7, {}))
+        self.assertFalse(verify_media_signature('music', 7, {**self.params, 'e': 'soon'}))
+
+
+# ==================== 已购音乐 ====================
+
+class ProtectedMusicTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # TestCase 中事务不提交，目录缓存和权益缓存不会随数据变化失效
+        cache.clear()
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pw123456')
+        self.other = User.objects.create_user('other', 'other@example.com', 'pw123456')
+        spu = ProductSPU.objects.create(name='专辑商品', category=Category.objects.create(name='音乐'))
+        sku = ProductSKU.objects.create(spu=spu, title='数字版', price=10)
+        UserProduct.objects.create(user=self.owner, sku=sku)
+
+        artist = Artist.objects.create(name='a')
+        album = Album.objects.create(name='付费专辑', artist=artist, product=spu)
+        self.music = Music(title='付费曲目', artist=artist, album=album)
+        self.music.file.save('paid.mp3', ContentFile(FILE_CONTENT))
+        self.free_music = Music(title='免费曲目', artist=artist)
+        self.free_music.file.save('free.mp3', ContentFile(FILE_CONTENT))
+        self.stream_path = f'/api/music/{self.music.id}/stream/'
+
+    def auth(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {tokens_for_user(user).access_token}'}
+
+    def test_stream_requires_purchase(self):
+        self.assertEqual(self.client.get(self.stream_path).status_code, 403)
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(self.stream_path).status_code, 403)
+
+    def test_owner_session_can_stream(self):
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(self.stream_path).status_code, 200)
+
+    def test_free_music_is_public(self):
+        self.assertEqual(self.client.get(f'/api/music/{self.free_music.id}/stream/').status_code, 200)
+
+    def test_access_issues_signed_urls(self):
+        response = self.client.get(f'/api/music/{self.music.id}/access/', **self.auth(self.owner))
+        self.assertEqual(response.status_code, 200)
+        stream = self.client.get(response.data['stream_url'], HTTP_RANGE='bytes=0-9')
+        self.assertEqual(stream.status_code, 206)
+        download = self.client.get(response.data['url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(b''.join(download.streaming_content), FILE_CONTENT)
+
+    def test_access_denied_without_purchase(self):
+        response = self.client.get(f'/api/music/{self.music.id}/access/', **self.auth(self.other))
+        self.assertEqual(response.status_code, 403)
+
+    def test_tampered_stream_url_rejected(self):
+        url, _ = sign_media_url('music-stream', 'music', self.music.id, self.owner.id)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        params = signed_params(url)
+        params['u'] = str(self.other.id)
+        self.assertEqual(self.client.get(self.stream_path, params).status_code, 403)
+
+    def test_list_hides_file_urls_of_paid_tracks(self):
+        response = self.client.get('/api/music/')
+        tracks = {track['id']: track for track in response.json()}
+        paid, free = tracks[self.music.id], tracks[self.free_music.id]
+        self.assertTrue(paid['requires_purchase'])
+        self.assertIsNone(paid['file'])
+        self.assertIsNone(paid['stream_url'])
+        self.assertFalse(free['requires_purchase'])
+        self.assertTrue(free['stream_url'].endswith(f'/api/music/{self.free_music.id}/stream/'))
+        self.assertEqual(free['file'], free['stream_url'])
+        self.assertEqual(self.client.get(free['file']).status_code, 200)
+
+    def test_media_route_refuses_music_and_blobs(self):
+        request = RequestFactory().get('/')
+        for path in [self.music.file.name, f'{settings.DEDUP_BLOB_DIR}/ab/cd.mp3', 'x/../publish/music/a.mp3']:
+            with self.subTest(path=path):
+                with self.assertRaises(Http404):
+                    serve_public_media(request, path)
+
+
+# ==================== 分片上传 ====================
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ChunkedUploadTests(MediaRootMixin, TestCase):
+    CONTENT = bytes(range(256)) * 10  # 2560 字节，分片 1000 字节时共 3 片
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('admin', 'admin@example.com', 'pw123456', is_staff=True)
+        self.music = Music.objects.create(title='t', artist=Artist.objects.create(name='a'))
+        self.upload = self.create_upload()
+
+    def create_upload(self, content=None, **kwargs):
+        content = self.CONTENT if content is None else content
+        fields = {'sha256': sha256(content), **kwargs}
+        return ChunkedUpload.objects.create(
+            user=self.user, target='music', object_id=self.music.id, filename='song.mp3',
+            size=len(content), chunk_size=1000, **fields,
+        )
+
+    def chunk(self, index):
+        return self.CONTENT[index * 1000:(index + 1) * 1000]
+
+    def put(self, index, data=None, checksum=None):
+        data = self.chunk(index) if data is None else data
+        write_part(self.upload, index, io.BytesIO(data), checksum or sha256(data))
+
+    def test_chunk_lengths(self):
+        self.assertEqual(self.upload.total_chunks, 3)
+        self.assertEqual([self.upload.chunk_length(i) for i in range(3)], [1000, 1000, 560])
+
+    def test_rejects_index_out_of_range(self):
+        with self.assertRaises(ChunkError):
+            self.put(3, data=b'x')
+
+    def test_rejects_wrong_size(self):
+        for data in [self.chunk(0)[:999], self.chunk(0) + b'x']:
+            with self.subTest(size=len(data)):
+                with self.assertRaises(ChunkError):
+                    self.put(0, data=data)
+        self.assertEqual(received_parts(self.upload), [])
+
+    def test_rejects_checksum_mismatch(self):
+        with self.assertRaises(ChunkError):
+            self.put(0, checksum=sha256(b'other'))
+        self.assertEqual(received_parts(self.upload), [])
+        self.assertEqual(os.listdir(chunked_upload.upload_dir(self.upload.id)), [])
+
+    def test_out_of_order_upload_assembles_in_order(self):
+        for index in (2, 0, 1):
+            self.put(index)
+        self.assertEqual(received_parts(self.upload), [0, 1, 2])
+
+        music = chunked_upload.complete(self.upload)
+        with music.file.open('rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.status, 'completed')
+        self.assertFalse(os.path.exists(chunked_upload.upload_dir(self.upload.id)))
+
+    def test_missing_parts(self):
+        self.put(0)
+        self.put(2)
+        with self.assertRaisesMessage(ChunkError, '[1]'):
+            chunked_upload.complete(self.upload)
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.status, 'uploading')
+
+    def test_file_checksum_mismatch_releases_claim(self):
+        self.upload = self.create_upload(sha256=sha256(b'other'))
+        for index in range(3):
+            self.put(index)
+        with self.assertRaises(ChunkError):
+            chunked_upload.complete(self.upload)
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.status, 'uploading')
+        # 合并的临时文件已删除，分片保留以便重试
+        self.assertEqual(sorted(os.listdir(chunked_upload.upload_dir(self.upload.id))),
+                         ['0.part', '1.part', '2.part'])
+
+    def test_complete_claims_session_once(self):
+        for index in range(3):
+            self.put(index)
+        # 另一个请求已认领
+        ChunkedUpload.objects.filter(id=self.upload.id).update(status='assembling')
+        with self.assertRaises(UploadConflict):
+            chunked_upload.complete(self.upload)
+        self.music.refresh_from_db()
+        self.assertFalse(self.music.file)
+
+    def test_api_upload_and_complete(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {tokens_for_user(self.user).access_token}'
+        content = bytes(range(256)) * 512  # 128KB，按最小分片 64KB 分为 2 片
+        response = self.client.post('/api/uploads/', {
+            'target': 'music', 'object_id': self.music.id, 'filename': 'song.mp3',
+            'size': len(content), 'chunk_size': 64 * 1024, 'sha256': sha256(content),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json()['id']
+
+        bad = self.client.put(f'/api/uploads/{upload_id}/parts/0/', content[:1024],
+                              content_type='application/octet-stream', HTTP_X_CHUNK_SHA256=sha256(content[:1024]))
+        self.assertEqual(bad.status_code, 400)
+        for index in (1, 0):
+            part = content[index * 64 * 1024:(index + 1) * 64 * 1024]
+            response = self.client.put(f'/api/uploads/{upload_id}/parts/{index}/', part,
+                                       content_type='application/octet-stream', HTTP_X_CHUNK_SHA256=sha256(part))
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['upload']['status'], 'completed')
+        self.assertEqual(self.client.post(f'/api/uploads/{upload_id}/complete/').status_code, 409)
+
+
+# ==================== 音频分析 ====================
+
+class DecodePeaksTests(SimpleTestCase):
+
+    def fake_ffmpeg(self, body):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        path = os.path.join(root, 'ffmpeg')
+        with open(path, 'w') as f:
+            f.write(f'#!{sys.executable}\nimport sys, time\n{body}\n')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def test_hung_ffmpeg_killed_after_timeout(self):
+        ffmpeg = self.fake_ffmpeg('time.sleep(30)')
+        started = time.monotonic()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            decode_peaks('in.mp3', 1, 10, ffmpeg=ffmpeg, timeout=0.5)
+        self.assertLess(time.monotonic() - started, 10)
+
+    def test_decoded_pcm_reduced_to_peaks(self):
+        # 1 秒 8 kHz 采样：前半段振幅 0.5，后半段满幅
+        ffmpeg = self.fake_ffmpeg(
+            "sys.stdout.buffer.write(b'\\x00\\x40' * 4000 + b'\\xff\\x7f' * 4000)"
+        )
+        self.assertEqual(list(decode_peaks('in.mp3', 1, 2, ffmpeg=ffmpeg)), [128, 255])
+
+
+class PeakReducerTests(SimpleTestCase):
+
+    def test_buckets_across_chunks(self):
+        reducer = PeakReducer(3)
+        reducer.feed([0.1, -0.2])
+        reducer.feed([0.05, 0.4, -0.8, 0.2, 0.1])
+        self.assertEqual(list(reducer.result()), [64, 255, 32])
+
+    def test_silence(self):
+        reducer = PeakReducer(2)
+        reducer.feed([0.0] * 4)
+        self.assertEqual(reducer.result(), bytes(2))
+        self.assertEqual(PeakReducer(2).result(), b'')
+
+
+def wav_bytes(seconds=1, rate=8000, channels=2):
+    """16 位 WAV：前半段静音，后半段满幅"""
+    frames = rate * seconds
+    quiet = b'\x00\x00' * channels * (frames // 2)
+    loud = b'\xff\x7f' * channels * (frames - frames // 2)
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(quiet + loud)
+    return output.getvalue()
+
+
+class AnalyzeAudioTests(MediaRootMixin, TestCase):
+
+    def write(self, name, content):
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_wav_analyzed_without_ffmpeg(self):
+        metadata = analyze_audio(self.write('a.wav', wav_bytes()), buckets=10, ffprobe='missing-ffprobe')
+        self.assertEqual(metadata['duration'], 1)
+        self.assertEqual((metadata['sample_rate'], metadata['bitrate']), (8000, 8000 * 2 * 16))
+        self.assertEqual(list(metadata['peaks']), [0] * 5 + [255] * 5)
+
+    def test_unreadable_file_fails(self):
+        path = self.write('a.mp3', b'not audio')
+        with self.assertLogs('publish.audio', 'WARNING'):
+            metadata = analyze_audio(path, ffmpeg='missing-ffmpeg', ffprobe='missing-ffprobe')
+        self.assertEqual(metadata, FAILED_AUDIO_METADATA)
+
+    def create_music(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            music = Music(title='t', artist=self.artist)
+            music.file.save(name, ContentFile(content))
+        music.refresh_from_db()
+        return music
+
+    @override_settings(IMAGE_PROCESS_WORKERS=0, AUDIO_WAVEFORM_PEAKS=10)
+    def test_upload_analyzed_and_peaks_served(self):
+        self.artist = Artist.objects.create(name='a')
+        music = self.create_music('a.wav', wav_bytes(seconds=2))
+        self.assertEqual((music.sample_rate, music.duration.total_seconds()), (8000, 2))
+        response = self.client.get(f'/api/music/{music.id}/peaks/')
+        self.assertEqual(response.json(), {'duration': 2.0, 'peaks': [0] * 5 + [255] * 5})
+
+        # 通过 FieldFile.save 替换文件（如分片上传完成）后重新分析
+        with self.captureOnCommitCallbacks(execute=True):
+            music.file.save('b.wav', ContentFile(wav_bytes(seconds=1, rate=4000, channels=1)))
+        music.refresh_from_db()
+        self.assertEqual((music.sample_rate, music.bitrate), (4000, 4000 * 16))
+
+    @override_settings(IMAGE_PROCESS_WORKERS=0, FFMPEG_BINARY='missing-ffmpeg', FFPROBE_BINARY='missing-ffprobe')
+    def test_failure_recorded_and_not_retried_on_save(self):
+        self.artist = Artist.objects.create(name='a')
+        with self.assertLogs('publish.audio', 'WARNING'):
+            music = self.create_music('a.mp3', b'not audio')
+        self.assertIsNone(music.sample_rate)
+        self.assertTrue(music.analysis_failed)
+        self.assertEqual(self.client.get(f'/api/music/{music.id}/peaks/').status_code, 404)
+        with mock.patch('publish.signals.schedule_analysis') as schedule:
+            music.title = 'renamed'
+            music.save()
+        schedule.assert_not_called()
+
+
+# ==================== 目录缓存 ====================
+
+class CatalogCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.artist = Artist.objects.create(name='a')
+        category = Category.objects.create(name='音乐')
+        self.albums = [
+            Album.objects.create(name=f'专辑{i}', artist=self.artist,
+                                 product=ProductSPU.objects.create(name=f'商品{i}', category=category))
+            for i in range(3)
+        ]
+
+    def names(self, path, params=None):
+        response = self.client.get(path, params or {})
+        self.assertEqual(response.status_code, 200)
+        return [item.get('name') or item.get('title') for item in response.json()]
+
+    def test_served_from_cache_until_commit(self):
+        self.assertEqual(len(self.names('/api/albums/')), 3)
+        with self.assertNumQueries(0):
+            self.names('/api/albums/')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Album.objects.create(name='新专辑', artist=self.artist)
+        # 提交前仍返回缓存
+        self.assertNotIn('新专辑', self.names('/api/albums/'))
+        for callback in callbacks:
+            callback()
+        self.assertIn('新专辑', self.names('/api/albums/'))
+
+    def test_related_product_change_invalidates(self):
+        self.names('/api/albums/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.albums[0].product.save()
+        with self.assertNumQueries(2):  # 专辑（含艺术家、商品）+ 商品图片
+            self.names('/api/albums/')
+
+    def test_query_params_cached_separately(self):
+        other = Artist.objects.create(name='b')
+        Album.objects.create(name='b 的专辑', artist=other)
+        self.assertEqual(self.names('/api/albums/', {'artist': other.id}), ['b 的专辑'])
+        self.assertEqual(len(self.names('/api/albums/')), 4)
+
+    def test_music_list_queries_do_not_grow(self):
+        for album in self.albums:
+            Music.objects.create(title=f'{album.name} 曲目', artist=self.artist, album=album)
+        with self.assertNumQueries(2):  # 音乐（含艺术家、专辑、商品）+ 商品图片
+            self.assertEqual(len(self.names('/api/music/')), 3)
+
+    def test_notice_changes_invalidate(self):
+        author = User.objects.create_user('u1', 'u1@example.com', 'pw123456')
+        with self.captureOnCommitCallbacks(execute=True):
+            notice = Notice.objects.create(title='公告', content='c', author=author)
+        self.assertEqual(self.names('/api/notices/'), ['公告'])
+        with self.captureOnCommitCallbacks(execute=True):
+            notice.is_active = False
+            notice.save()
+        self.assertEqual(self.names('/api/notices/'), [])
@@ -1,12 +1,25 @@
-from django.urls import path
+from django.urls import path, include
+from rest_framework.routers import SimpleRouter
 
-from .views import get_artist_list, get_album_list, get_music_list, get_video_list, get_notice_list
+from .views import (
+    get_artist_list, get_album_list, get_music_list, get_video_list, get_notice_list,
+    stream_music, stream_video, get_music_access, download_music, get_music_peaks,
+    ChunkedUploadViewSet,
+)
 
-urlpatterns = [
+router = SimpleRouter()  # user.urls 已在 api/ 下注册了 DefaultRouter 的根视图
+router.register(r'uploads', ChunkedUploadViewSet, basename='chunked-upload')
 
+urlpatterns = [
+    path('', include(router.urls)),
     path('artists/', get_artist_list, name='artist-list'),
     path('albums/', get_album_list, name='album-list'),
     path('music/', get_music_list, name='music-list'),
     path('videos/', get_video_list, name='video-list'),
+    path('music/<int:pk>/peaks/', get_music_peaks, name='music-peaks'),
+    path('music/<int:pk>/stream/', stream_music, name='music-stream'),
+    path('videos/<int:pk>/stream/', stream_video, name='video-stream'),
+    path('music/<int:pk>/access/', get_music_access, name='music-access'),
+    path('music/<int:pk>/download/', download_music, name='music-download'),
     path('notices/', get_notice_list, name='notice-list'),
 ]
\ No newline at end of file
@@ -1,66 +1,220 @@
-from django.shortcuts import render
+from django.db.models import Prefetch
+from django.http import HttpResponseForbidden
+from django.shortcuts import render, get_object_or_404
+from django.views.decorators.http import require_safe
 
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import mixins, status, viewsets
 
-from .models import Artist, Album, Music, Video, Notice
+from .models import Artist, Album, Music, Video, Notice, ChunkedUpload
 from .serializers import ArtistSerializer, AlbumSerializer, MusicSerializer, VideoSerializer, NoticeSerializer
+from .serializers import ChunkedUploadSerializer
+from .chunked_upload import ChunkError, UploadConflict, complete as complete_upload, discard_parts, write_part
+from .streaming import stream_file
+from .audio_ingest import waveform_peaks
+from .catalog_cache import cached_catalog
+from .protected_media import serve_protected_file, sign_media_url, verify_media_signature
+from shopping.models import ProductImage
+from user.entitlements import owns_product
 
 # Create your views here.
+# 列表接口：关联数据批量加载，序列化结果按目录版本号缓存（见 catalog_cache）
+
+def album_product_prefetch(lookup='product__images'):
+    """批量加载专辑关联商品的图片，按 id 排序，AlbumSerializer 从中取主图"""
+    return Prefetch(lookup, queryset=ProductImage.objects.order_by('id'))
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_artist_list(request):
-    
-    artist_queryset = Artist.objects.all()
-    
-    serializer = ArtistSerializer(artist_queryset, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def build():
+        artist_queryset = Artist.objects.all()
+        return ArtistSerializer(artist_queryset, many=True, context={'request': request}).data
+
+    return Response(cached_catalog(request, 'artists', build), status=status.HTTP_200_OK)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_album_list(request):
-    
-    album_queryset = Album.objects.filter(is_active=True)
-    
-    # 添加查询参数过滤
     artist_id = request.GET.get('artist')
-    if artist_id:
-        album_queryset = album_queryset.filter(artist_id=artist_id)
-    
-    serializer = AlbumSerializer(album_queryset, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def build():
+        album_queryset = Album.objects.filter(is_active=True).select_related(
+            'artist', 'product'
+        ).prefetch_related(album_product_prefetch())
+
+        # 添加查询参数过滤
+        if artist_id:
+            album_queryset = album_queryset.filter(artist_id=artist_id)
+
+        return AlbumSerializer(album_queryset, many=True, context={'request': request}).data
+
+    data = cached_catalog(request, 'albums', build, {'artist': artist_id})
+    return Response(data, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_music_list(request):
-    
-    music_queryset = Music.objects.filter(is_active=True)
-    
-    # 添加查询参数过滤
     album_id = request.GET.get('album')
-    if album_id:
-        music_queryset = music_queryset.filter(album_id=album_id)
-    
-    serializer = MusicSerializer(music_queryset, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def build():
+        music_queryset = Music.objects.filter(is_active=True).defer('waveform').select_related(
+            'artist', 'album__artist', 'album__product'
+        ).prefetch_related(album_product_prefetch('album__product__images'))
+
+        # 添加查询参数过滤
+        if album_id:
+            music_queryset = music_queryset.filter(album_id=album_id)
+
+        return MusicSerializer(music_queryset, many=True, context={'request': request}).data
+
+    data = cached_catalog(request, 'music', build, {'album': album_id})
+    return Response(data, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_video_list(request):
-    
-    video_queryset = Video.objects.filter(is_active=True)
-    
-    serializer = VideoSerializer(video_queryset, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def build():
+        video_queryset = Video.objects.filter(is_active=True)
+        return VideoSerializer(video_queryset, many=True, context={'request': request}).data
+
+    return Response(cached_catalog(request, 'videos', build), status=status.HTTP_200_OK)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_notice_list(request):
-   
-    notice_queryset = Notice.objects.filter(is_active=True)
-    
-    serializer = NoticeSerializer(notice_queryset, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+
+    def build():
+        notice_queryset = Notice.objects.filter(is_active=True).select_related('author')
+        return NoticeSerializer(notice_queryset, many=True, context={'request': request}).data
+
+    return Response(cached_catalog(request, 'notices', build), status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_music_peaks(request, pk):
+    """预计算的波形峰值（0-255），播放器不必下载并解码整首音乐"""
+    music = get_object_or_404(
+        Music.objects.only('id', 'duration', 'waveform'), pk=pk, is_active=True,
+    )
+    peaks = waveform_peaks(music)
+    if peaks is None:
+        return Response({'error': '波形尚未生成'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({
+        'duration': music.duration.total_seconds() if music.duration else None,
+        'peaks': peaks,
+    }, status=status.HTTP_200_OK)
+
+# ==================== 音视频流式播放 ====================
+# 普通 Django 视图：播放器的 Accept 头多为 audio/* 或 video/*，不经过 DRF 的内容协商
+
+@require_safe
+def stream_music(request, pk):
+    """关联了商品的音乐（需购买）凭签名 URL（见 get_music_access）播放，或会话用户已购买 / 为管理员"""
+    music = get_object_or_404(
+        Music.objects.select_related('album').only('id', 'file', 'album__product_id'),
+        pk=pk, is_active=True,
+    )
+    product_id = music.album.product_id if music.album else None
+    if product_id is not None and not can_stream_music(request, pk, product_id):
+        return HttpResponseForbidden('请先购买该专辑')
+    return stream_file(request, music.file)
+
+def can_stream_music(request, pk, product_id):
+    if verify_media_signature('music', pk, request.GET):
+        return True
+    user = request.user
+    return user.is_authenticated and (user.is_staff or owns_product(user.id, product_id))
+
+@require_safe
+def stream_video(request, pk):
+    video = get_object_or_404(Video.objects.only('id', 'file'), pk=pk, is_active=True)
+    return stream_file(request, video.file)
+
+# ==================== 已购音乐下载 ====================
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_music_access(request, pk):
+    """校验用户是否已购买音乐所属专辑的商品，签发短时有效的下载、播放 URL"""
+    music = get_object_or_404(
+        Music.objects.select_related('album').only('id', 'file', 'album__product_id'),
+        pk=pk, is_active=True,
+    )
+    product_id = music.album.product_id if music.album else None
+    if not music.file or product_id is None:
+        return Response({'error': '该音乐不提供下载'}, status=status.HTTP_404_NOT_FOUND)
+    if not owns_product(request.user.id, product_id):
+        return Response({'error': '请先购买该专辑'}, status=status.HTTP_403_FORBIDDEN)
+
+    url, expires = sign_media_url('music-download', 'music', music.id, request.user.id, request)
+    play_url, _ = sign_media_url('music-stream', 'music', music.id, request.user.id, request)
+    return Response({'url': url, 'stream_url': play_url, 'expires': expires}, status=status.HTTP_200_OK)
+
+@require_safe
+def download_music(request, pk):
+    """凭签名 URL 下载，不查询权益；文件由前端服务器发送"""
+    if not verify_media_signature('music', pk, request.GET):
+        return HttpResponseForbidden('链接无效或已过期')
+    music = get_object_or_404(Music.objects.only('id', 'file'), pk=pk)
+    return serve_protected_file(request, music.file)
+
+# ==================== 分片上传 ====================
+
+class ChunkedUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    大音乐 / 视频文件分片上传（仅管理员），流程见 chunked_upload.py
+    """
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        """放弃上传，删除已收到的分片"""
+        discard_parts(instance.id)
+        instance.delete()
+
+    @action(detail=True, methods=['put'], url_path=r'parts/(?P<index>\d+)')
+    def upload_part(self, request, pk=None, index=None):
+        """上传一个分片，请求体为原始字节，请求头 X-Chunk-SHA256 为分片摘要"""
+        upload = self.get_object()
+        if upload.status != 'uploading':
+            return Response({'error': '上传已完成或正在合并'}, status=status.HTTP_409_CONFLICT)
+        checksum = request.headers.get('X-Chunk-SHA256')
+        if not checksum:
+            return Response({'error': '缺少 X-Chunk-SHA256 请求头'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # 直接读取原始请求流，不经过 DRF 解析器，分片不会整体载入内存
+            write_part(upload, int(index), request._request, checksum)
+        except ChunkError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'index': int(index)}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """合并分片并写入目标记录"""
+        upload = self.get_object()
+        try:
+            instance = complete_upload(upload)
+        except UploadConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        except ChunkError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except (Music.DoesNotExist, Video.DoesNotExist):
+            return Response({'error': '目标记录不存在'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer_class = MusicSerializer if upload.target == 'music' else VideoSerializer
+        return Response({
+            'upload': self.get_serializer(upload).data,
+            upload.target: serializer_class(instance, context={'request': request}).data,
+        }, status=status.HTTP_200_OK)
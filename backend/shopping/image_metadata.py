@@ -0,0 +1,99 @@
+"""
+图片元数据（宽高、主色、blurhash）
+上传时在进程池中计算一次并写入模型字段，请求时直接读取，不再打开图片文件。
+
+字段命名为 <前缀>width / <前缀>height / <前缀>dominant_color / <前缀>blurhash，
+宽度为 NULL 表示尚未计算。计算失败时宽高保持 NULL 并把 <前缀>metadata_failed 记为 True：
+保存记录时不再自动重试（直到重新上传图片），backfill_image_metadata 默认会重试这些图片。
+"""
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .image_variants import get_executor
+from .imaging import compute_metadata
+
+logger = logging.getLogger(__name__)
+
+# (模型, 图片字段, 元数据字段前缀)
+IMAGE_METADATA_FIELDS = [
+    ('shopping.ProductImage', 'image', ''),
+    ('shopping.OrderItemReviewImage', 'image', ''),
+    ('forum.Image', 'file', ''),
+    ('publish.Album', 'cover_image', 'cover_'),
+    ('user.User', 'avatar', 'avatar_'),
+]
+
+
+def metadata_targets():
+    """返回 [(模型类, 图片字段, 前缀), ...]"""
+    return [(apps.get_model(label), field, prefix) for label, field, prefix in IMAGE_METADATA_FIELDS]
+
+
+def clear_metadata(instance, prefix):
+    """图片被替换时清空旧的元数据"""
+    setattr(instance, f'{prefix}width', None)
+    setattr(instance, f'{prefix}height', None)
+    setattr(instance, f'{prefix}dominant_color', '')
+    setattr(instance, f'{prefix}blurhash', '')
+    setattr(instance, f'{prefix}metadata_failed', False)
+
+
+def needs_metadata(instance, field, prefix):
+    """字段默认值（如默认头像）是所有记录共用的文件，不为每条新记录计算一次"""
+    file = getattr(instance, field)
+    return (
+        bool(file)
+        and file.name != instance._meta.get_field(field).get_default()
+        and getattr(instance, f'{prefix}width') is None
+        and not getattr(instance, f'{prefix}metadata_failed')
+    )
+
+
+def store_metadata(model, pk, field, file_name, prefix, metadata):
+    """写入元数据（宽度为 None 即计算失败）；图片在计算期间被替换时放弃（按文件名匹配）"""
+    fields = {f'{prefix}{key}': value for key, value in metadata.items()}
+    fields[f'{prefix}metadata_failed'] = metadata['width'] is None
+    model._default_manager.filter(pk=pk, **{field: file_name}).update(**fields)
+
+
+def _on_computed(model, pk, field, file_name, prefix, future):
+    try:
+        store_metadata(model, pk, field, file_name, prefix, future.result())
+    except Exception:
+        logger.exception('保存图片元数据失败: %s %s', model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def submit_metadata(instance, field, prefix):
+    model = type(instance)
+    file_name = getattr(instance, field).name
+    path = getattr(instance, field).path
+    if not settings.IMAGE_PROCESS_WORKERS:
+        store_metadata(model, instance.pk, field, file_name, prefix, compute_metadata(path))
+        return
+    future = get_executor().submit(compute_metadata, path)
+    future.add_done_callback(
+        lambda f: _on_computed(model, instance.pk, field, file_name, prefix, f)
+    )
+
+
+def schedule_metadata(instance, field, prefix):
+    """事务提交后再计算，确保文件和记录都已落盘"""
+    transaction.on_commit(lambda: submit_metadata(instance, field, prefix))
+
+
+def image_meta(instance, prefix=''):
+    """序列化用：{'width', 'height', 'dominant_color', 'blurhash'}，尚未计算时返回 None"""
+    width = getattr(instance, f'{prefix}width', None)
+    if not width:
+        return None
+    return {
+        'width': width,
+        'height': getattr(instance, f'{prefix}height'),
+        'dominant_color': getattr(instance, f'{prefix}dominant_color'),
+        'blurhash': getattr(instance, f'{prefix}blurhash'),
+    }
@@ -0,0 +1,141 @@
+"""
+商品图片多尺寸变体
+上传商品图片后，在进程池中用 Pillow 生成 thumb / card / detail 三种尺寸的 WebP 和 JPEG，
+变体文件保存在 variants/<原图路径（去掉扩展名）>/<尺寸>.<格式>，
+文件信息记录在 ProductImage.variants 中：
+    {'card': {'width': 480, 'height': 360, 'webp': 'variants/...', 'jpeg': 'variants/...'}, ...}
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from .imaging import VARIANT_WIDTHS, render_variants
+from .models import ProductImage
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """进程池懒加载；使用 spawn，避免在多线程服务进程中 fork"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def variant_name(image_name, variant, fmt):
+    stem = os.path.splitext(image_name)[0]
+    return f'variants/{stem}/{variant}.{fmt}'
+
+
+def variants_up_to_date(product_image):
+    """已记录的变体是否由当前图片生成（图片被替换后需要重新生成）"""
+    card = (product_image.variants or {}).get('card')
+    prefix = os.path.dirname(variant_name(product_image.image.name, 'card', 'webp')) + '/'
+    return bool(card) and card.get('webp', '').startswith(prefix)
+
+
+def store_variants(product_image, rendered):
+    """保存子进程生成的变体文件，并记录到 ProductImage.variants"""
+    variants = {}
+    for variant, data in rendered.items():
+        info = {'width': data['width'], 'height': data['height']}
+        for fmt in ('webp', 'jpeg'):
+            name = variant_name(product_image.image.name, variant, fmt)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            info[fmt] = default_storage.save(name, ContentFile(data[fmt]))
+        variants[variant] = info
+    # 用 update 避免触发 post_save 再次生成
+    ProductImage.objects.filter(id=product_image.id, image=product_image.image.name).update(variants=variants)
+    product_image.variants = variants
+    return variants
+
+
+def generate_variants(product_image):
+    """在当前进程中同步生成变体（回填命令、未启用进程池时使用）"""
+    rendered = render_variants(product_image.image.path, VARIANT_WIDTHS)
+    return store_variants(product_image, rendered)
+
+
+def _on_rendered(image_id, image_name, future):
+    try:
+        rendered = future.result()
+        product_image = ProductImage.objects.filter(id=image_id, image=image_name).first()
+        if product_image is not None:  # 图片已被删除或替换时放弃
+            store_variants(product_image, rendered)
+    except Exception:
+        logger.exception('生成商品图片变体失败: %s', image_id)
+    finally:
+        # 回调运行在进程池的管理线程中，需要自行释放数据库连接
+        close_old_connections()
+
+
+def submit_variants(product_image):
+    """提交到进程池异步生成变体"""
+    if not settings.IMAGE_PROCESS_WORKERS:
+        try:
+            generate_variants(product_image)
+        except Exception:
+            logger.exception('生成商品图片变体失败: %s', product_image.id)
+        return
+    future = get_executor().submit(render_variants, product_image.image.path, VARIANT_WIDTHS)
+    future.add_done_callback(
+        lambda f, image_id=product_image.id, name=product_image.image.name: _on_rendered(image_id, name, f)
+    )
+
+
+def schedule_variants(product_image):
+    """事务提交后再生成，确保原图和记录都已落盘"""
+    transaction.on_commit(lambda: submit_variants(product_image))
+
+
+def variant_urls(product_image, request=None):
+    """
+    返回 srcset 形式的变体信息，变体尚未生成时返回 None：
+        {
+            'webp': 'thumb.webp 160w, card.webp 480w, detail.webp 1080w',
+            'jpeg': '...',
+            'sizes': {'thumb': {'width': 160, 'height': 120, 'webp': url, 'jpeg': url}, ...}
+        }
+    """
+    variants = product_image.variants or {}
+    if not variants:
+        return None
+
+    def absolute(name):
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+
+    sizes = {}
+    for variant in VARIANT_WIDTHS:
+        info = variants.get(variant)
+        if info:
+            sizes[variant] = {
+                'width': info['width'],
+                'height': info['height'],
+                'webp': absolute(info['webp']),
+                'jpeg': absolute(info['jpeg']),
+            }
+    # 原图较小时多个变体宽度相同，srcset 中去重
+    srcset = {}
+    for fmt in ('webp', 'jpeg'):
+        seen = {}
+        for info in sizes.values():
+            seen.setdefault(info['width'], info[fmt])
+        srcset[fmt] = ', '.join(f'{url} {width}w' for width, url in sorted(seen.items()))
+    return {**srcset, 'sizes': sizes}
@@ -0,0 +1,194 @@
+"""
+图片处理（纯 Pillow，不依赖 Django）
+本模块中的函数会在子进程中执行，因此不能导入 Django 模型或配置。
+"""
+import logging
+import math
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# 变体名称 -> 最大宽度（像素），不放大原图
+VARIANT_WIDTHS = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 1080,
+}
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+def _to_rgb(image):
+    """JPEG 不支持透明通道，透明部分用白色填充"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(source_path, widths=None):
+    """
+    生成各尺寸的 WebP 和 JPEG 变体
+    返回 {变体名: {'width': w, 'height': h, 'webp': bytes, 'jpeg': bytes}}
+    """
+    widths = widths or VARIANT_WIDTHS
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)  # 按 EXIF 方向旋转
+        has_alpha = original.mode in ('RGBA', 'LA', 'P')
+        base = original.convert('RGBA' if has_alpha else 'RGB')
+
+    variants = {}
+    for name, max_width in widths.items():
+        image = base
+        if image.width > max_width:
+            height = max(1, round(image.height * max_width / image.width))
+            image = image.resize((max_width, height), Image.LANCZOS)
+
+        webp = BytesIO()
+        image.save(webp, format='WEBP', quality=WEBP_QUALITY, method=4)
+        jpeg = BytesIO()
+        _to_rgb(image).save(jpeg, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+        variants[name] = {
+            'width': image.width,
+            'height': image.height,
+            'webp': webp.getvalue(),
+            'jpeg': jpeg.getvalue(),
+        }
+    return variants
+
+
+
+def render_square_renditions(source_path, sizes):
+    """
+    居中裁剪为正方形并缩放到各尺寸（用于头像），输出 WebP
+    返回 {尺寸: bytes}
+    """
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ('RGBA', 'LA', 'P')
+        base = original.convert('RGBA' if has_alpha else 'RGB')
+
+    renditions = {}
+    for size in sizes:
+        image = ImageOps.fit(base, (size, size), Image.LANCZOS)
+        output = BytesIO()
+        image.save(output, format='WEBP', quality=WEBP_QUALITY, method=4)
+        renditions[size] = output.getvalue()
+    return renditions
+
+# ==================== 图片元数据（尺寸 / 主色 / blurhash） ====================
+
+_BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+BLURHASH_COMPONENTS = (4, 3)
+BLURHASH_SAMPLE_SIZE = 32  # 计算 blurhash 前先缩小到此尺寸，结果差别很小但快得多
+
+
+def _encode83(value, length):
+    return ''.join(_BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def _srgb_to_linear(value):
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exp):
+    return math.copysign(abs(value) ** exp, value)
+
+
+def blurhash(image, components=BLURHASH_COMPONENTS):
+    """计算 blurhash（https://blurha.sh），image 为 RGB 模式的 Pillow 图片"""
+    cx, cy = components
+    image = image.copy()
+    image.thumbnail((BLURHASH_SAMPLE_SIZE, BLURHASH_SAMPLE_SIZE))
+    width, height = image.size
+    linear = [tuple(_srgb_to_linear(c) for c in pixel) for pixel in image.getdata()]
+
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(cx)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(cy)]
+
+    factors = []
+    for j in range(cy):
+        for i in range(cx):
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[i][x] * cos_y[j][y]
+                    pr, pg, pb = linear[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = (1 if i == 0 and j == 0 else 2) / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((cx - 1) + (cy - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(c) for factor in ac for c in factor)
+        quantised_max = int(max(0, min(82, math.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _encode83(0, 1)
+
+    result += _encode83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        r, g, b = (
+            int(max(0, min(18, math.floor(_sign_pow(c / max_value, 0.5) * 9 + 9.5))))
+            for c in factor
+        )
+        result += _encode83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def dominant_color(image):
+    """主色：缩小后量化为 8 色，取像素最多的颜色，返回 #rrggbb"""
+    image = image.copy()
+    image.thumbnail((64, 64))
+    quantized = image.quantize(colors=8)
+    palette = quantized.getpalette()
+    _, index = max(quantized.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+
+def image_metadata(source_path):
+    """返回 {'width', 'height', 'dominant_color', 'blurhash'}（尺寸按 EXIF 方向校正后计算）"""
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        rgb = _to_rgb(original)
+    return {
+        'width': rgb.width,
+        'height': rgb.height,
+        'dominant_color': dominant_color(rgb),
+        'blurhash': blurhash(rgb),
+    }
+
+
+# 计算失败时的结果：宽高为 None，store_metadata 据此把 <前缀>metadata_failed 记为 True
+FAILED_METADATA = {'width': None, 'height': None, 'dominant_color': '', 'blurhash': ''}
+
+
+def compute_metadata(source_path):
+    """计算元数据，文件不存在或格式不支持时返回 FAILED_METADATA"""
+    try:
+        return image_metadata(source_path)
+    except Exception:
+        logger.warning('计算图片元数据失败: %s', source_path, exc_info=True)
+        return FAILED_METADATA
@@ -0,0 +1,54 @@
+"""
+为已有图片计算宽高、主色和 blurhash（多进程并行）
+用法:
+    python manage.py backfill_image_metadata           # 处理尚未计算和之前计算失败的图片
+    python manage.py backfill_image_metadata --skip-failed  # 不重试之前计算失败的图片
+    python manage.py backfill_image_metadata --all     # 全部重新计算
+    python manage.py backfill_image_metadata --workers 8
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from shopping.image_metadata import metadata_targets, store_metadata
+from shopping.imaging import compute_metadata
+
+
+class Command(BaseCommand):
+    help = '为已有图片计算宽高、主色和 blurhash'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新计算全部图片')
+        parser.add_argument('--skip-failed', action='store_true', help='跳过之前计算失败的图片')
+        parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核数')
+        parser.add_argument('--chunk-size', type=int, default=16, help='每次分派给子进程的图片数')
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            for model, field, prefix in metadata_targets():
+                queryset = model._default_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                default = model._meta.get_field(field).get_default()
+                if default:
+                    # 默认图片（如默认头像）为共用文件，不逐条计算
+                    queryset = queryset.exclude(**{field: default})
+                if not options['all']:
+                    # 计算失败的图片宽度同样为 NULL，默认一并重试
+                    queryset = queryset.filter(**{f'{prefix}width__isnull': True})
+                    if options['skip_failed']:
+                        queryset = queryset.filter(**{f'{prefix}metadata_failed': False})
+                rows = list(queryset.values_list('pk', field))
+                if not rows:
+                    continue
+
+                storage = model._meta.get_field(field).storage
+                paths = [storage.path(name) for _, name in rows]
+                failed = 0
+                # map 保持输入顺序，结果与 rows 一一对应
+                results = executor.map(compute_metadata, paths, chunksize=options['chunk_size'])
+                for (pk, name), metadata in zip(rows, results):
+                    failed += metadata['width'] is None
+                    store_metadata(model, pk, field, name, prefix, metadata)
+
+                self.stdout.write(f'{model._meta.label}.{field}: {len(rows)} 张，失败 {failed} 张')
+
+        self.stdout.write(self.style.SUCCESS('图片元数据计算完成'))
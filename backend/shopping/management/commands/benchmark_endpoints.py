@@ -0,0 +1,306 @@
+"""
+接口性能基准
+在独立的测试数据库中（与 manage.py test 相同的创建方式，SQLite / MySQL 均可）用 generate_dataset
+生成固定种子的数据，逐个请求关键接口，统计延迟分布（p50/p95/p99/max）和每次请求的查询数，
+与 JSON 基线比较：p95 延迟超过基线的 (1 + --latency-threshold) 倍（且差值超过 --min-delta-ms），
+或查询数超过基线 --query-threshold 条以上时判定为退化，命令以非零状态退出，可用于 CI。
+
+查询数与机器无关，可以直接比较；延迟基线应在同一台机器（或同规格的 CI 机器）上生成。
+generate_dataset 生成的图片写入临时的 MEDIA_ROOT（--keepdb 时为系统临时目录下固定的目录），不会写入项目的媒体目录。
+用法:
+    python manage.py benchmark_endpoints --update-baseline      # 生成 / 更新基线
+    python manage.py benchmark_endpoints                        # 与基线比较
+    python manage.py benchmark_endpoints --only spu-list --only checkout --iterations 100
+    python manage.py benchmark_endpoints --keepdb               # 复用上次的测试数据库和数据
+"""
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from forum.models import Post
+from publish.catalog_cache import invalidate_catalog
+from publish.models import Album, Artist, Music
+from shopping.models import Inventory, Order, ProductSKU, ProductSPU
+from user.authentication import tokens_for_user
+from user.models import Address, CartItem, User
+
+BENCH_USERNAME = 'benchmark'
+BENCH_PREFIX = 'bench'
+# --keepdb 时数据库保留，媒体文件也放在固定目录中保留
+KEEPDB_MEDIA_ROOT = os.path.join(tempfile.gettempdir(), 'benchmark_endpoints_media')
+
+
+class Scenario:
+    """一个被测接口：setup 在每次请求前执行（不计时），返回请求数据（None 表示没有请求体）"""
+
+    def __init__(self, name, method, path, auth=False, setup=None, status=200):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.auth = auth
+        self.setup = setup
+        self.status = status
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(len(ordered) * percent / 100) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, queries):
+    return {
+        'iterations': len(latencies),
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies), 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(max(latencies), 3),
+        },
+        'queries': {
+            'median': statistics.median(queries),
+            'max': max(queries),
+        },
+    }
+
+
+def compare(name, result, baseline, options):
+    """返回退化描述列表"""
+    regressions = []
+    base = baseline.get(name)
+    if base is None:
+        return regressions
+    current_p95, base_p95 = result['latency_ms']['p95'], base['latency_ms']['p95']
+    if (current_p95 > base_p95 * (1 + options['latency_threshold'])
+            and current_p95 - base_p95 > options['min_delta_ms']):
+        regressions.append(f'{name}: p95 延迟 {base_p95:.1f} -> {current_p95:.1f} ms')
+    current_queries, base_queries = result['queries']['max'], base['queries']['max']
+    if current_queries > base_queries + options['query_threshold']:
+        regressions.append(f'{name}: 查询数 {base_queries} -> {current_queries}')
+    return regressions
+
+
+class Command(BaseCommand):
+    help = '在测试数据库中测量关键接口的延迟和查询数，并与基线比较'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json'),
+                            help='基线文件路径')
+        parser.add_argument('--update-baseline', action='store_true', help='把本次结果写入基线')
+        parser.add_argument('--only', action='append', default=[], help='只测指定接口，可重复')
+        parser.add_argument('--iterations', type=int, default=50, help='每个接口的计时请求数')
+        parser.add_argument('--warmup', type=int, default=5, help='每个接口的预热请求数（不计入统计）')
+        parser.add_argument('--seed', type=int, default=1234, help='生成数据的随机种子')
+        parser.add_argument('--scale', type=float, default=1.0, help='数据规模倍数')
+        parser.add_argument('--latency-threshold', type=float, default=0.25, help='允许的 p95 延迟增幅（比例）')
+        parser.add_argument('--min-delta-ms', type=float, default=2.0, help='小于该差值（毫秒）的延迟变化视为噪声')
+        parser.add_argument('--query-threshold', type=int, default=0, help='允许增加的查询数')
+        parser.add_argument('--keepdb', action='store_true', help='保留测试数据库，下次直接复用')
+        parser.add_argument('--output', help='另存本次结果（JSON）')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # 基准只测接口本身：关闭限流和请求级 SQL 统计
+        settings.RATE_LIMIT_ENABLED = False
+        settings.QUERY_PROFILE_ENABLED = False
+        if options['keepdb']:
+            media_root = KEEPDB_MEDIA_ROOT
+            os.makedirs(media_root, exist_ok=True)
+        else:
+            media_root = tempfile.mkdtemp(prefix='benchmark_endpoints_media_')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                fixtures = self.seed(options)
+                results = self.run(self.scenarios(fixtures), options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+            if not options['keepdb']:
+                shutil.rmtree(media_root, ignore_errors=True)
+        self.report(results, options)
+
+    # ==================== 数据 ====================
+
+    def seed(self, options):
+        """生成数据（--keepdb 时已有数据则复用），返回各接口用到的对象"""
+        if not User.objects.filter(username=BENCH_USERNAME).exists():
+            scale = options['scale']
+            start = time.monotonic()
+            call_command(
+                'generate_dataset', seed=options['seed'], prefix=BENCH_PREFIX, stdout=io.StringIO(),
+                categories=int(40 * scale) or 1, spus=int(400 * scale) or 1, users=int(300 * scale) or 1,
+                orders=int(5000 * scale) or 1, posts=int(300 * scale) or 1,
+            )
+            self.create_fixtures()
+            self.stdout.write(f'生成测试数据 {time.monotonic() - start:.1f} 秒')
+
+        user = User.objects.get(username=BENCH_USERNAME)
+        spu = ProductSPU.objects.filter(is_active=True, skus__isnull=False).order_by('id').first()
+        return {
+            'user': user,
+            'token': str(tokens_for_user(user).access_token),
+            'address': Address.objects.filter(user=user).first(),
+            'spu': spu,
+            'sku': ProductSKU.objects.filter(spu=spu).order_by('sku_code').first(),
+            'post': Post.objects.order_by('-reply_count', 'id').first(),
+        }
+
+    def create_fixtures(self):
+        """基准用户（订单历史、购物车、地址）和音乐数据（generate_dataset 不生成）"""
+        user = User.objects.create_user(BENCH_USERNAME, f'{BENCH_USERNAME}@example.com', 'benchmark123')
+        Address.objects.create(
+            user=user, name='基准', phone='13800000000', province='北京市', city='北京市',
+            district='朝阳区', address='1号', is_default=True,
+        )
+        order_ids = list(Order.objects.order_by('id').values_list('id', flat=True)[:50])
+        Order.objects.filter(id__in=order_ids).update(user=user)
+        # 下单接口使用排在最前的 SKU，购物车放排在最后的几个，避免重复
+        for sku in ProductSKU.objects.filter(is_active=True).order_by('-sku_code')[:5]:
+            CartItem.objects.create(user=user, sku=sku, quantity=1)
+
+        artists = Artist.objects.bulk_create([Artist(name=f'{BENCH_PREFIX}艺术家{i}') for i in range(10)])
+        albums = Album.objects.bulk_create([
+            Album(name=f'专辑{i}', artist=artists[i % len(artists)], release_date=timezone.now().date())
+            for i in range(20)
+        ])
+        Music.objects.bulk_create([
+            Music(title=f'曲目{i}', artist=albums[i % len(albums)].artist, album=albums[i % len(albums)],
+                  track_number=i // len(albums) + 1)
+            for i in range(200)
+        ])
+
+    # ==================== 接口 ====================
+
+    def scenarios(self, fixtures):
+        spu, sku, post = fixtures['spu'], fixtures['sku'], fixtures['post']
+        user, address = fixtures['user'], fixtures['address']
+
+        def checkout():
+            # 每次下单前放入一件商品，库存保持充足
+            Inventory.objects.filter(sku=sku).update(quantity=10 ** 6)
+            item = CartItem.objects.create(user=user, sku=sku, quantity=1)
+            return {'address_id': address.id, 'cart_item_ids': [item.id], 'payment_method': 'mock'}
+
+        def uncached_catalog():
+            # 目录列表有响应缓存，每次请求前使其失效，测量的是生成列表的开销
+            invalidate_catalog()
+
+        return [
+            Scenario('spu-list', 'get', '/api/shopping/spu/'),
+            Scenario('spu-detail', 'get', f'/api/shopping/spu/{spu.id}/'),
+            Scenario('spu-skus', 'get', f'/api/shopping/spu/{spu.id}/skus/'),
+            Scenario('cart', 'get', '/api/cart/', auth=True),
+            Scenario('checkout', 'post', '/api/shopping/orders/', auth=True, setup=checkout, status=201),
+            Scenario('order-history', 'get', '/api/shopping/orders/', auth=True),
+            Scenario('post-list', 'get', '/api/forum/posts/'),
+            Scenario('post-detail', 'get', f'/api/forum/posts/{post.id}/'),
+            Scenario('music-list', 'get', '/api/music/', setup=uncached_catalog),
+        ]
+
+    def run(self, scenarios, options):
+        names = {scenario.name for scenario in scenarios}
+        unknown = set(options['only']) - names
+        if unknown:
+            raise CommandError(f'未知接口: {", ".join(sorted(unknown))}（可选: {", ".join(sorted(names))}）')
+
+        client = Client()
+        token = None
+        results = {}
+        for scenario in scenarios:
+            if options['only'] and scenario.name not in options['only']:
+                continue
+            if scenario.auth and token is None:
+                token = str(tokens_for_user(User.objects.get(username=BENCH_USERNAME)).access_token)
+            headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if scenario.auth else {}
+
+            latencies, queries = [], []
+            for i in range(options['warmup'] + options['iterations']):
+                kwargs = dict(headers)
+                data = scenario.setup() if scenario.setup else None
+                if data is not None:
+                    kwargs.update(data=data, content_type='application/json')
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = getattr(client, scenario.method)(scenario.path, **kwargs)
+                    elapsed = (time.perf_counter() - start) * 1000
+                if response.status_code != scenario.status:
+                    raise CommandError(
+                        f'{scenario.name}: 期望状态码 {scenario.status}，实际 {response.status_code}: '
+                        f'{response.content[:200]!r}'
+                    )
+                if i >= options['warmup']:
+                    latencies.append(elapsed)
+                    queries.append(len(captured))
+            results[scenario.name] = summarize(latencies, queries)
+            self.stdout.write(
+                f'{scenario.name:<14} p50 {results[scenario.name]["latency_ms"]["p50"]:>8.2f} ms  '
+                f'p95 {results[scenario.name]["latency_ms"]["p95"]:>8.2f} ms  '
+                f'查询 {results[scenario.name]["queries"]["max"]}'
+            )
+        return results
+
+    # ==================== 基线 ====================
+
+    def report(self, results, options):
+        document = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'seed': options['seed'],
+                'scale': options['scale'],
+                'iterations': options['iterations'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            self.write_json(options['output'], document)
+
+        path = options['baseline']
+        if options['update_baseline']:
+            if os.path.exists(path):
+                # 只跑部分接口时保留其他接口的基线
+                with open(path, encoding='utf-8') as f:
+                    document['results'] = {**json.load(f)['results'], **results}
+            self.write_json(path, document)
+            self.stdout.write(self.style.SUCCESS(f'基线已写入 {path}'))
+            return
+
+        if not os.path.exists(path):
+            raise CommandError(f'基线文件不存在: {path}，请先使用 --update-baseline 生成')
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('database') != connection.vendor:
+            self.stdout.write(self.style.WARNING(
+                f'基线生成于 {baseline["meta"].get("database")}，当前为 {connection.vendor}，延迟不可直接比较'
+            ))
+        regressions = []
+        for name, result in results.items():
+            regressions.extend(compare(name, result, baseline['results'], options))
+        if regressions:
+            raise CommandError('性能退化:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} 个接口均未超过基线阈值'))
+
+    def write_json(self, path, document):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
@@ -0,0 +1,548 @@
+"""
+生成大规模合成数据集，用于在本地复现生产规模下的性能问题
+- 商品：分类树、SPU 及属性、按属性值组合生成的 SKU 矩阵、库存、占位图片
+- 用户：收货地址、购物车、商品收藏
+- 订单：按时间分布在最近若干年，含订单商品、退款申请、商品评价、已购商品
+- 论坛：帖子（标签、关联商品）、多层嵌套的回复、帖子收藏
+
+全部使用 bulk_create 分块写入，主键预先分配（不依赖数据库回填 ID，MySQL 同样适用），
+生成的时间为历史时间（临时关闭 auto_now/auto_now_add）。bulk_create 不触发信号，
+结束后重建标签倒排表和帖子热度，搜索索引按需用 --search-index 重建。
+
+每个部分使用由 --seed 派生的独立随机数生成器：在同一个初始数据库上，相同参数生成相同的数据；
+某部分数量为 0 时跳过，后续部分使用数据库中已有的用户和商品。
+用法:
+    python manage.py generate_dataset                                  # 默认规模
+    python manage.py generate_dataset --users 100000 --spus 20000 --orders 1000000 --workers 8
+    python manage.py generate_dataset --spus 0 --users 0 --posts 0 --orders 200000 --seed 7
+"""
+import io
+import itertools
+import multiprocessing
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image as PILImage
+
+from forum.models import Post, Reply, Tag
+from publish.catalog_cache import invalidate_catalog
+from shopping.models import (
+    Attribute, AttributeValue, Category, Inventory, Order, OrderItem, OrderItemReview, ProductImage,
+    ProductReview, ProductSKU, ProductSKUAttributeValue, ProductSPU, ProductSPUAttribute, RefundRequest,
+)
+from user.models import Address, CartItem, PostFavorite, ProductFavorite, User, UserProduct
+
+CATEGORY_WORDS = ['数码', '家电', '服饰', '图书', '音乐', '运动', '美妆', '食品', '家居', '母婴', '乐器', '影视']
+BRANDS = ['星辰', '青木', '远山', '晨光', '海蓝', '北极', '南风', '云端', '极光', '木棉']
+NOUNS = ['耳机', '音箱', '专辑', '唱片', '外套', '跑鞋', '台灯', '背包', '键盘', '水杯', '书架', '相机']
+ATTRIBUTES = {
+    '颜色': ['黑色', '白色', '红色', '蓝色', '绿色', '灰色'],
+    '尺寸': ['S', 'M', 'L', 'XL', 'XXL'],
+    '版本': ['标准版', '豪华版', '典藏版'],
+    '容量': ['64GB', '128GB', '256GB', '512GB'],
+}
+SURNAMES = ['张', '王', '李', '赵', '刘', '陈', '杨', '黄', '周', '吴']
+GIVEN_NAMES = ['伟', '芳', '娜', '敏', '静', '磊', '洋', '勇', '艳', '杰', '涛', '明']
+REGIONS = [
+    ('北京市', '北京市', '朝阳区'), ('上海市', '上海市', '浦东新区'), ('广东省', '广州市', '天河区'),
+    ('广东省', '深圳市', '南山区'), ('浙江省', '杭州市', '西湖区'), ('四川省', '成都市', '武侯区'),
+    ('湖北省', '武汉市', '洪山区'), ('江苏省', '南京市', '鼓楼区'),
+]
+SENTENCES = [
+    '音质很好，低音下潜很深。', '包装完好，物流很快。', '和描述一致，性价比高。', '做工一般，有待改进。',
+    '第二次购买了，依旧满意。', '颜色比图片略深。', '尺码偏大，建议选小一号。', '送朋友的，很喜欢。',
+    '有没有人知道这个版本的区别？', '分享一下我的使用体验。', '求推荐同价位的替代品。', '更新固件后好了很多。',
+]
+PLACEHOLDER_COLORS = [
+    '#e57373', '#f06292', '#ba68c8', '#9575cd', '#7986cb', '#64b5f6', '#4fc3f7', '#4dd0e1',
+    '#4db6ac', '#81c784', '#aed581', '#dce775', '#fff176', '#ffd54f', '#ffb74d', '#a1887f',
+]
+PLACEHOLDER_SIZE = 600
+REFUND_REASONS = [choice for choice, _ in RefundRequest.REFUND_REASON_CHOICES]
+PAYMENT_METHODS = ['alipay', 'wechat', 'stripe']
+MAX_ORDER_ITEMS = 4
+
+# 并行生成订单时，fork 出的子进程通过它拿到命令实例（及已加载的用户、SKU 列表）
+_worker_state = {}
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """临时关闭 auto_now / auto_now_add，bulk_create 写入生成的历史时间（调用方必须为这些字段赋值）"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def next_id(model):
+    return (model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0) + 1
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def money(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def _generate_order_chunk(chunk_start):
+    return _worker_state['command'].generate_order_chunk(chunk_start)
+
+
+class Command(BaseCommand):
+    help = '批量生成合成数据（商品、用户、订单、论坛），用于性能测试'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='随机种子')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='每次 bulk_create 的行数')
+        parser.add_argument('--prefix', default='synth', help='生成的用户名、订单号、标签名前缀')
+        parser.add_argument('--categories', type=int, default=200, help='分类数')
+        parser.add_argument('--spus', type=int, default=2000, help='SPU 数')
+        parser.add_argument('--max-skus', type=int, default=12, help='每个 SPU 的最大 SKU 数')
+        parser.add_argument('--users', type=int, default=5000, help='用户数')
+        parser.add_argument('--orders', type=int, default=50000, help='订单数')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='并行生成订单的进程数（需要 MySQL 等支持并发写入的数据库，SQLite 请保持 1）')
+        parser.add_argument('--years', type=int, default=3, help='订单和帖子分布的年数')
+        parser.add_argument('--until', default='2025-06-30', help='数据的截止日期（YYYY-MM-DD），固定默认值保证可复现')
+        parser.add_argument('--refund-rate', type=float, default=0.03, help='退款订单比例')
+        parser.add_argument('--review-rate', type=float, default=0.3, help='已完成订单商品的评价比例')
+        parser.add_argument('--posts', type=int, default=5000, help='帖子数')
+        parser.add_argument('--replies', type=int, default=20, help='每个帖子的平均回复数')
+        parser.add_argument('--reply-depth', type=int, default=8, help='回复的最大嵌套层数')
+        parser.add_argument('--password', default='synthetic123', help='生成用户的密码')
+        parser.add_argument('--search-index', action='store_true', help='生成后重建论坛搜索索引（较慢）')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.seed = options['seed']
+        self.chunk_size = options['chunk_size']
+        self.prefix = options['prefix']
+        try:
+            until = datetime.strptime(options['until'], '%Y-%m-%d')
+        except ValueError:
+            raise CommandError('--until 格式应为 YYYY-MM-DD')
+        self.until = timezone.make_aware(until)
+        self.since = self.until - timedelta(days=365 * options['years'])
+
+        with historical_timestamps(ProductSPU, ProductSKU, ProductReview, Order, RefundRequest,
+                                   OrderItemReview, UserProduct, ProductFavorite, Post, Reply):
+            if options['spus']:
+                self.step('商品', self.generate_catalog)
+            if options['users']:
+                self.step('用户', self.generate_users)
+            if options['orders']:
+                self.step('订单', self.generate_orders)
+            if options['posts']:
+                self.step('论坛', self.generate_forum)
+
+        if options['spus']:
+            invalidate_catalog()
+        if options['posts']:
+            self.step('标签倒排表', lambda: call_command('rebuild_tag_postings', stdout=io.StringIO()))
+            self.step('帖子热度', lambda: call_command('update_hot_scores', stdout=io.StringIO()))
+            if options['search_index']:
+                self.step('搜索索引', lambda: call_command('rebuild_search_index', stdout=io.StringIO()))
+
+    def step(self, name, func):
+        start = time.monotonic()
+        summary = func()
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: {summary or "完成"}（{time.monotonic() - start:.1f} 秒）'
+        ))
+
+    def rng(self, part):
+        # 各部分独立的随机序列，调整某一部分的数量不影响其他部分
+        return random.Random(f'{self.seed}:{part}')
+
+    def bulk(self, model, rows, **kwargs):
+        for chunk in chunked(rows, self.chunk_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, batch_size=self.chunk_size, **kwargs)
+
+    def random_time(self, rng, since=None, until=None):
+        since = since or self.since
+        until = until or self.until
+        return since + timedelta(seconds=rng.uniform(0, (until - since).total_seconds()))
+
+    # ==================== 商品 ====================
+
+    def generate_catalog(self):
+        rng = self.rng('catalog')
+        leaf_ids = self.generate_categories(rng)
+        values = self.ensure_attributes()
+        images = self.placeholder_images()
+
+        spu_id = next_id(ProductSPU)
+        image_id = next_id(ProductImage)
+        sku_total = 0
+        for chunk_start in range(0, self.options['spus'], self.chunk_size):
+            spus, skus, spu_attrs, sku_values, inventories, product_images = [], [], [], [], [], []
+            for _ in range(min(self.chunk_size, self.options['spus'] - chunk_start)):
+                brand, noun = rng.choice(BRANDS), rng.choice(NOUNS)
+                created_at = self.random_time(rng)
+                spu = ProductSPU(
+                    id=spu_id, name=f'{brand}{noun} {spu_id}', description=''.join(rng.sample(SENTENCES, 3)),
+                    category_id=rng.choice(leaf_ids), brand=brand, series=f'{noun}{rng.randint(1, 9)}系列',
+                    is_active=rng.random() < 0.95, created_at=created_at, updated_at=created_at,
+                )
+                spus.append(spu)
+
+                # SKU 矩阵：选 1-2 个属性，取部分属性值做笛卡尔积，数量不超过 --max-skus
+                attributes = rng.sample(sorted(values), rng.randint(1, 2))
+                axes = []
+                for attribute in attributes:
+                    choices = values[attribute]
+                    axes.append(rng.sample(choices, rng.randint(1, min(len(choices), 4))))
+                    spu_attrs.append(ProductSPUAttribute(spu_id=spu_id, attribute_id=attribute))
+                base_price = rng.randrange(990, 99900)
+                combos = list(itertools.product(*axes))[:self.options['max_skus']]
+                for n, combo in enumerate(combos, start=1):
+                    sku_code = f'{spu_id}-{n}'
+                    skus.append(ProductSKU(
+                        sku_code=sku_code, spu_id=spu_id,
+                        title=f'{spu.name} {"/".join(value for _, value in combo)}',
+                        price=money(base_price + rng.randrange(0, 5000)), is_active=rng.random() < 0.97,
+                        created_at=created_at, updated_at=created_at,
+                    ))
+                    for attribute, (value_id, _) in zip(attributes, combo):
+                        sku_values.append(ProductSKUAttributeValue(
+                            sku_id=sku_code, attribute_id=attribute, attribute_value_id=value_id,
+                        ))
+                    inventories.append(Inventory(sku_id=sku_code, quantity=rng.randint(0, 500)))
+
+                for n in range(rng.randint(1, 3)):
+                    name, color = rng.choice(images)
+                    product_images.append(ProductImage(
+                        id=image_id, spu_id=spu_id, image=name, is_main=n == 0,
+                        width=PLACEHOLDER_SIZE, height=PLACEHOLDER_SIZE, dominant_color=color,
+                    ))
+                    image_id += 1
+                spu_id += 1
+
+            with transaction.atomic():
+                ProductSPU.objects.bulk_create(spus)
+                ProductSKU.objects.bulk_create(skus, batch_size=self.chunk_size)
+                ProductSPUAttribute.objects.bulk_create(spu_attrs, batch_size=self.chunk_size)
+                ProductSKUAttributeValue.objects.bulk_create(sku_values, batch_size=self.chunk_size)
+                Inventory.objects.bulk_create(inventories, batch_size=self.chunk_size)
+                ProductImage.objects.bulk_create(product_images, batch_size=self.chunk_size)
+            sku_total += len(skus)
+        return f'分类 {len(leaf_ids)} 个叶子，SPU {self.options["spus"]}，SKU {sku_total}'
+
+    def generate_categories(self, rng):
+        """三层分类树，返回叶子分类 ID（商品挂在叶子分类下）"""
+        count = self.options['categories']
+        if not count:
+            leaf_ids = list(Category.objects.filter(children=None).values_list('id', flat=True))
+            if not leaf_ids:
+                raise CommandError('数据库中没有分类，请指定 --categories')
+            return leaf_ids
+
+        category_id = next_id(Category)
+        roots = max(1, count // 25)
+        levels = {0: [], 1: [], 2: []}
+        categories = []
+        for i in range(count):
+            level = 0 if i < roots else (1 if i < roots * 6 or not levels[1] else rng.choice([1, 2, 2]))
+            parent_id = rng.choice(levels[level - 1]) if level else None
+            # MPTT 字段先填 0，插入后整体重建
+            categories.append(Category(
+                id=category_id, name=f'{rng.choice(CATEGORY_WORDS)}{category_id}', parent_id=parent_id,
+                lft=0, rght=0, tree_id=0, level=0,
+            ))
+            levels[level].append(category_id)
+            category_id += 1
+        self.bulk(Category, categories)
+        Category.objects.rebuild()
+
+        parent_ids = {category.parent_id for category in categories}
+        return [category.id for category in categories if category.id not in parent_ids]
+
+    def ensure_attributes(self):
+        """属性及属性值（已存在则复用），返回 {属性ID: [(属性值ID, 值), ...]}"""
+        values = {}
+        for name, options in ATTRIBUTES.items():
+            attribute, _ = Attribute.objects.get_or_create(name=name)
+            values[attribute.id] = [
+                (AttributeValue.objects.get_or_create(attribute=attribute, value=value)[0].id, value)
+                for value in options
+            ]
+        return values
+
+    def placeholder_images(self):
+        """纯色占位图，所有商品图片共用，返回 [(文件名, 主色), ...]"""
+        images = []
+        for i, color in enumerate(PLACEHOLDER_COLORS):
+            buffer = io.BytesIO()
+            PILImage.new('RGB', (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), color).save(buffer, 'PNG')
+            name = f'products/synthetic/{self.prefix}-{i}.png'
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            images.append((name, color))
+        return images
+
+    # ==================== 用户 ====================
+
+    def generate_users(self):
+        rng = self.rng('users')
+        # 密码哈希计算很慢，所有生成用户共用同一个哈希
+        password = make_password(self.options['password'])
+        skus = list(ProductSKU.objects.values_list('sku_code', flat=True))
+        spu_ids = list(ProductSPU.objects.values_list('id', flat=True))
+
+        user_id = next_id(User)
+        count = self.options['users']
+        for chunk_start in range(0, count, self.chunk_size):
+            users, addresses, carts, favorites = [], [], [], []
+            for _ in range(min(self.chunk_size, count - chunk_start)):
+                joined = self.random_time(rng)
+                users.append(User(
+                    id=user_id, username=f'{self.prefix}_{user_id}', email=f'{self.prefix}_{user_id}@example.com',
+                    password=password, gender=rng.choice('MFO'), date_joined=joined,
+                ))
+                for n in range(rng.randint(1, 3)):
+                    province, city, district = rng.choice(REGIONS)
+                    addresses.append(Address(
+                        user_id=user_id, name=rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES),
+                        phone=f'13{rng.randrange(10 ** 9):09d}', province=province, city=city, district=district,
+                        address=f'{rng.randint(1, 999)}号{rng.randint(1, 30)}栋{rng.randint(101, 2999)}',
+                        is_default=n == 0,
+                    ))
+                for sku in rng.sample(skus, min(len(skus), rng.randint(0, 5))):
+                    carts.append(CartItem(user_id=user_id, sku_id=sku, quantity=rng.randint(1, 3)))
+                for spu in rng.sample(spu_ids, min(len(spu_ids), rng.randint(0, 10))):
+                    favorites.append(ProductFavorite(
+                        user_id=user_id, product_id=spu, created_at=self.random_time(rng, since=joined),
+                    ))
+                user_id += 1
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                Address.objects.bulk_create(addresses, batch_size=self.chunk_size)
+                CartItem.objects.bulk_create(carts, batch_size=self.chunk_size)
+                ProductFavorite.objects.bulk_create(favorites, batch_size=self.chunk_size)
+        return f'{count} 个'
+
+    # ==================== 订单 ====================
+
+    def order_status(self, rng, created_at):
+        """较早的订单大多已完成；最近 30 天内的订单分布在各个进行中的状态"""
+        if rng.random() < self.options['refund_rate']:
+            return 'refunded'
+        if self.until - created_at > timedelta(days=30):
+            return 'completed' if rng.random() < 0.9 else 'cancelled'
+        return rng.choices(['pending', 'paid', 'shipped', 'completed', 'cancelled'], [10, 20, 30, 30, 10])[0]
+
+    def generate_orders(self):
+        self.user_ids = list(User.objects.filter(is_active=True).values_list('id', flat=True))
+        self.skus = list(ProductSKU.objects.values_list('sku_code', 'spu_id', 'title', 'price', 'spu__name'))
+        if not self.user_ids or not self.skus:
+            raise CommandError('没有可用的用户或商品，请先生成（--users / --spus）')
+        # 主键预先按订单序号分配：订单商品 ID = 起点 + 序号 * MAX_ORDER_ITEMS + n（允许空洞），
+        # 各块互不依赖，可以并行写入，结果与进程数无关
+        self.order_base = next_id(Order)
+        self.item_base = next_id(OrderItem)
+
+        count = self.options['orders']
+        chunks = range(0, count, self.chunk_size)
+        totals = Counter()
+        workers = self.options['workers']
+        if workers > 1 and connections['default'].vendor == 'sqlite':
+            raise CommandError('SQLite 不支持并发写入，请使用 --workers 1')
+        if workers > 1:
+            _worker_state['command'] = self
+            # fork 的子进程继承用户和 SKU 列表；数据库连接不能跨进程共享，先关闭
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                results = executor.map(_generate_order_chunk, chunks)
+                for done, result in enumerate(results, start=1):
+                    totals.update(result)
+                    self.report_progress(done, len(chunks))
+        else:
+            for done, chunk_start in enumerate(chunks, start=1):
+                totals.update(self.generate_order_chunk(chunk_start))
+                self.report_progress(done, len(chunks))
+        return f'{count} 个，订单商品 {totals["items"]}，退款 {totals["refunds"]}，评价 {totals["reviews"]}'
+
+    def report_progress(self, done, total):
+        if done % 20 == 0 and done < total:
+            self.stdout.write(f'  已完成 {done} / {total} 块')
+
+    def generate_order_chunk(self, chunk_start):
+        """生成并写入一块订单；随机数按块的起点派生，返回 {'items', 'refunds', 'reviews'} 数量"""
+        rng = self.rng(f'orders:{chunk_start}')
+        count = self.options['orders']
+        review_rate = self.options['review_rate']
+        span = (self.until - self.since).total_seconds()
+        orders, items, refunds, reviews, product_reviews, owned = [], [], [], [], [], set()
+        for i in range(chunk_start, min(chunk_start + self.chunk_size, count)):
+            order_id = self.order_base + i
+            # 订单时间随 ID 递增（加少量抖动），与真实数据的分布一致
+            created_at = self.since + timedelta(seconds=span * (i + rng.random()) / count)
+            user_id = rng.choice(self.user_ids)
+            status = self.order_status(rng, created_at)
+            province, city, district = rng.choice(REGIONS)
+            order = Order(
+                id=order_id, order_number=f'{self.prefix.upper()}{order_id:012d}', user_id=user_id,
+                receiver_name=rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES),
+                receiver_phone=f'13{rng.randrange(10 ** 9):09d}', receiver_province=province,
+                receiver_city=city, receiver_district=district, receiver_address=f'{rng.randint(1, 999)}号',
+                status=status, created_at=created_at, total_amount=0,
+            )
+            if status not in ('pending', 'cancelled'):
+                order.payment_method = rng.choice(PAYMENT_METHODS)
+                order.paid_at = created_at + timedelta(minutes=rng.randint(1, 120))
+            if status in ('shipped', 'completed', 'refunded'):
+                order.shipped_at = order.paid_at + timedelta(hours=rng.randint(4, 72))
+                order.shipping_company = '顺丰速运'
+                order.tracking_number = f'SF{order_id:012d}'
+            if status == 'completed':
+                order.completed_at = order.shipped_at + timedelta(days=rng.randint(1, 10))
+
+            total = 0
+            for n, (sku_code, spu_id, title, price, spu_name) in enumerate(
+                    rng.sample(self.skus, min(len(self.skus), rng.randint(1, MAX_ORDER_ITEMS)))):
+                item_id = self.item_base + i * MAX_ORDER_ITEMS + n
+                quantity = rng.randint(1, 3)
+                reviewed = status == 'completed' and rng.random() < review_rate
+                items.append(OrderItem(
+                    id=item_id, order_id=order_id, sku_id=sku_code, sku_title=title, spu_name=spu_name,
+                    price=price, quantity=quantity, subtotal=price * quantity, is_reviewed=reviewed,
+                ))
+                total += price * quantity
+                if order.paid_at and status != 'refunded':
+                    owned.add((user_id, sku_code, order.paid_at))
+                if reviewed:
+                    reviewed_at = order.completed_at + timedelta(days=rng.randint(0, 14))
+                    rating = rng.choices([1, 2, 3, 4, 5], [3, 4, 10, 30, 53])[0]
+                    content = ''.join(rng.sample(SENTENCES, 2))
+                    reviews.append(OrderItemReview(
+                        order_item_id=item_id, user_id=user_id, spu_id=spu_id, content=content,
+                        rating=rating, created_at=reviewed_at, updated_at=reviewed_at,
+                    ))
+                    if rng.random() < 0.3:
+                        product_reviews.append(ProductReview(
+                            spu_id=spu_id, user_id=user_id, content=content, rating=rating,
+                            created_at=reviewed_at, updated_at=reviewed_at,
+                        ))
+            order.total_amount = total
+
+            if status == 'refunded':
+                refunds.append(RefundRequest(
+                    order_id=order_id, reason=rng.choice(REFUND_REASONS), description=rng.choice(SENTENCES),
+                    refund_amount=total, status='completed', created_at=order.shipped_at + timedelta(days=1),
+                    processed_at=order.shipped_at + timedelta(days=rng.randint(2, 5)),
+                ))
+            elif status in ('paid', 'shipped') and rng.random() < self.options['refund_rate']:
+                refunds.append(RefundRequest(
+                    order_id=order_id, reason=rng.choice(REFUND_REASONS), description=rng.choice(SENTENCES),
+                    refund_amount=total, status='pending', created_at=order.paid_at + timedelta(hours=1),
+                ))
+            orders.append(order)
+
+        with transaction.atomic():
+            Order.objects.bulk_create(orders)
+            OrderItem.objects.bulk_create(items, batch_size=self.chunk_size)
+            RefundRequest.objects.bulk_create(refunds, batch_size=self.chunk_size)
+            OrderItemReview.objects.bulk_create(reviews, batch_size=self.chunk_size)
+            ProductReview.objects.bulk_create(product_reviews, batch_size=self.chunk_size)
+            # 同一用户多次购买同一 SKU 只保留一条，已存在的由数据库忽略
+            UserProduct.objects.bulk_create(
+                [UserProduct(user_id=user_id, sku_id=sku, purchased_at=paid_at) for user_id, sku, paid_at in owned],
+                batch_size=self.chunk_size, ignore_conflicts=True,
+            )
+        return {'items': len(items), 'refunds': len(refunds), 'reviews': len(reviews)}
+
+    # ==================== 论坛 ====================
+
+    def generate_forum(self):
+        rng = self.rng('forum')
+        user_ids = list(User.objects.filter(is_active=True).values_list('id', flat=True))
+        spu_ids = list(ProductSPU.objects.values_list('id', flat=True))
+        if not user_ids:
+            raise CommandError('没有可用的用户，请先生成（--users）')
+        Tag.objects.bulk_create(
+            [Tag(name=f'{self.prefix}{word}') for word in CATEGORY_WORDS + NOUNS], ignore_conflicts=True,
+        )
+        tag_ids = list(Tag.objects.filter(name__startswith=self.prefix).values_list('id', flat=True))
+
+        count = self.options['posts']
+        max_depth = self.options['reply_depth']
+        post_id = next_id(Post)
+        reply_id = next_id(Reply)
+        reply_total = 0
+        post_tags = Post.tags.through
+        post_products = Post.products.through
+        for chunk_start in range(0, count, self.chunk_size):
+            posts, replies, tags, products, favorites = [], [], [], [], []
+            for _ in range(min(self.chunk_size, count - chunk_start)):
+                created_at = self.random_time(rng)
+                post = Post(
+                    id=post_id, title=f'{rng.choice(BRANDS)}{rng.choice(NOUNS)}：{rng.choice(SENTENCES)}',
+                    content='\n'.join(rng.choices(SENTENCES, k=rng.randint(3, 12))),
+                    author_id=rng.choice(user_ids), created_at=created_at, updated_at=created_at,
+                    last_activity_at=created_at,
+                )
+                for tag_id in rng.sample(tag_ids, rng.randint(0, 3)):
+                    tags.append(post_tags(post_id=post_id, tag_id=tag_id))
+                for spu_id in rng.sample(spu_ids, min(len(spu_ids), rng.randint(0, 2))):
+                    products.append(post_products(post_id=post_id, productspu_id=spu_id))
+                for user_id in rng.sample(user_ids, min(len(user_ids), rng.randint(0, 5))):
+                    favorites.append(PostFavorite(user_id=user_id, post_id=post_id))
+
+                # 回复数近似指数分布；多数回复接在上一条之后，形成较深的讨论串
+                thread = []  # (回复ID, 层数)
+                replied_at = created_at
+                for _ in range(int(rng.expovariate(1 / self.options['replies'])) if self.options['replies'] else 0):
+                    replied_at += timedelta(minutes=rng.expovariate(1 / 240))
+                    parent = None
+                    if thread and rng.random() < 0.7:
+                        parent = thread[-1] if rng.random() < 0.6 else rng.choice(thread)
+                        if parent[1] >= max_depth:
+                            parent = None
+                    depth = parent[1] + 1 if parent else 1
+                    replies.append(Reply(
+                        id=reply_id, post_id=post_id, author_id=rng.choice(user_ids), content=rng.choice(SENTENCES),
+                        parent_id=parent[0] if parent else None, created_at=replied_at,
+                    ))
+                    thread.append((reply_id, depth))
+                    reply_id += 1
+                post.reply_count = len(thread)
+                post.last_activity_at = replied_at
+                posts.append(post)
+                post_id += 1
+
+            with transaction.atomic():
+                Post.objects.bulk_create(posts)
+                post_tags.objects.bulk_create(tags, batch_size=self.chunk_size)
+                post_products.objects.bulk_create(products, batch_size=self.chunk_size)
+                Reply.objects.bulk_create(replies, batch_size=self.chunk_size)
+                PostFavorite.objects.bulk_create(favorites, batch_size=self.chunk_size, ignore_conflicts=True)
+            reply_total += len(replies)
+        return f'帖子 {count}，回复 {reply_total}'
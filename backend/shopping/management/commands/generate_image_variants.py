@@ -0,0 +1,49 @@
+"""
+为商品图片生成（或重新生成）多尺寸 WebP/JPEG 变体
+用法:
+    python manage.py generate_image_variants              # 只处理还没有变体的图片
+    python manage.py generate_image_variants --all        # 全部重新生成
+    python manage.py generate_image_variants --workers 8
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from shopping.image_variants import store_variants, variants_up_to_date
+from shopping.imaging import VARIANT_WIDTHS, render_variants
+from shopping.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = '为商品图片生成多尺寸 WebP/JPEG 变体'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新生成全部图片的变体')
+        parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核数')
+
+    def handle(self, *args, **options):
+        images = [
+            image for image in ProductImage.objects.exclude(image='').iterator(chunk_size=2000)
+            if options['all'] or not variants_up_to_date(image)
+        ]
+        total = len(images)
+        done = failed = 0
+
+        # 子进程只负责图片编码，文件保存和数据库更新在主进程中完成
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {
+                executor.submit(render_variants, image.image.path, VARIANT_WIDTHS): image
+                for image in images
+            }
+            for future in as_completed(futures):
+                image = futures[future]
+                try:
+                    store_variants(image, future.result())
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'图片 {image.id}（{image.image.name}）处理失败: {e}')
+                if (done + failed) % 100 == 0:
+                    self.stdout.write(f'已处理 {done + failed}/{total}')
+
+        self.stdout.write(self.style.SUCCESS(f'变体生成完成，成功 {done} 张，失败 {failed} 张'))
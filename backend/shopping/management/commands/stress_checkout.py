@@ -0,0 +1,427 @@
+"""
+下单并发压测
+在独立的测试数据库中准备少量 SKU（库存有限）、若干用户和一个管理员，用多个线程（--processes 大于 1 时
+每个进程各起 --threads 个线程）通过接口并发地下单、支付、取消订单、申请退款和批准退款，结束后校验：
+
+- 库存不为负
+- 库存守恒：初始库存 = 当前库存 + 未取消订单中的商品数量（取消订单、批准退款都会恢复库存），
+  不相等说明有扣减或恢复被覆盖（丢失更新）或被执行了两次，当前库存偏多即超卖
+- 同一用户同一 SKU 的拥有记录（UserProduct）不重复
+
+并输出每类操作的吞吐量、状态码分布、延迟分布和库存语句耗时分布。库存语句耗时是请求中读写
+shopping_inventory 的语句耗时之和：InnoDB 下 UPDATE（或 SELECT ... FOR UPDATE）要等持有行锁的事务提交，
+这部分时间基本就是锁等待。
+
+多个线程（进程）共享用户（默认每两个线程一个用户），同一订单、同一退款申请会被并发操作，
+用于暴露“检查后再修改”的竞争。SQLite 写操作串行执行，只能验证流程，需要在 MySQL 上才能得到有意义的结果；
+SQLite 下测试数据库使用临时文件（内存数据库不能跨线程写入）。
+
+违反任一不变量时命令以非零状态退出。
+用法:
+    python manage.py stress_checkout
+    python manage.py stress_checkout --threads 16 --operations 200 --skus 2 --stock 30
+    python manage.py stress_checkout --processes 4 --threads 8 --mix checkout=4,cancel=2,pay=2,refund=1,approve=1
+    python manage.py stress_checkout --output stress.json
+"""
+import json
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.db.models import Count, Sum
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from shopping.models import Category, Inventory, Order, OrderItem, ProductSKU, ProductSPU, RefundRequest
+from user.authentication import tokens_for_user
+from user.models import Address, CartItem, User, UserProduct
+
+STRESS_PREFIX = 'stress'
+OPERATIONS = ('checkout', 'pay', 'cancel', 'refund', 'approve')
+DEFAULT_MIX = 'checkout=5,pay=3,cancel=2,refund=2,approve=2'
+# 取消、支付、退款时从最近的几个订单中随机选一个，提高多个线程选中同一订单的概率
+CANDIDATES = 3
+
+# --processes 大于 1 时，fork 出的子进程通过它拿到命令实例和测试数据
+_worker_state = {}
+
+
+def _run_process(process_index):
+    return _worker_state['command'].run_threads(process_index, _worker_state['fixtures'], _worker_state['options'])
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(len(ordered) * percent / 100) - 1))
+    return ordered[index]
+
+
+def distribution(values):
+    if not values:
+        return None
+    return {
+        'p50': round(percentile(values, 50), 3),
+        'p95': round(percentile(values, 95), 3),
+        'p99': round(percentile(values, 99), 3),
+        'max': round(max(values), 3),
+    }
+
+
+def merge_results(results):
+    merged = {'latency': defaultdict(list), 'lock_wait': defaultdict(list), 'status': defaultdict(Counter),
+              'errors': []}
+    for result in results:
+        for key in ('latency', 'lock_wait'):
+            for name, values in result[key].items():
+                merged[key][name].extend(values)
+        for name, counts in result['status'].items():
+            merged['status'][name].update(counts)
+        merged['errors'].extend(result['errors'])
+    return {
+        'latency': dict(merged['latency']),
+        'lock_wait': dict(merged['lock_wait']),
+        'status': {name: dict(counter) for name, counter in merged['status'].items()},
+        'errors': merged['errors'][:10],
+    }
+
+
+def parse_mix(value):
+    """'checkout=5,pay=3' -> {'checkout': 5, 'pay': 3, ...}（未列出的操作权重为 0）"""
+    weights = dict.fromkeys(OPERATIONS, 0)
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in weights:
+            raise CommandError(f'未知操作: {name}（可选: {", ".join(OPERATIONS)}）')
+        try:
+            weights[name] = int(weight)
+        except ValueError:
+            raise CommandError(f'权重必须是整数: {part}')
+    if not any(weights.values()):
+        raise CommandError('至少需要一个权重大于 0 的操作')
+    return weights
+
+
+class InventoryTimer:
+    """execute_wrapper：累计当前请求中读写库存表的语句耗时"""
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if Inventory._meta.db_table not in sql:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+
+class Worker:
+    """一个压测线程：按权重随机选择操作，准备数据（不计时）后请求接口"""
+
+    def __init__(self, index, fixtures, options):
+        self.rng = random.Random(f'{options["seed"]}:{index}')
+        self.user_id, token, self.address_id = fixtures['users'][index % len(fixtures['users'])]
+        self.skus = fixtures['skus']
+        self.staff_id = fixtures['staff_id']
+        self.client = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.staff_client = Client(raise_request_exception=False)
+        self.operations = list(OPERATIONS)
+        self.weights = [options['mix'][name] for name in OPERATIONS]
+        self.max_quantity = options['max_quantity']
+        self.latency = defaultdict(list)
+        self.lock_wait = defaultdict(list)
+        self.status = defaultdict(Counter)
+        self.errors = []
+
+    def run(self, count):
+        self.staff_client.force_login(User.objects.get(id=self.staff_id))
+        timer = InventoryTimer()
+        try:
+            with connection.execute_wrapper(timer):
+                for _ in range(count):
+                    name = self.rng.choices(self.operations, self.weights)[0]
+                    try:
+                        request = getattr(self, f'prepare_{name}')()
+                    except DatabaseError:
+                        # 准备数据时与其他线程冲突（如 SQLite 锁超时），跳过本次操作
+                        self.status[name]['prepare_error'] += 1
+                        continue
+                    if request is None:
+                        # 没有可操作的订单（如还没有待支付订单），不计入统计
+                        self.status[name]['skipped'] += 1
+                        continue
+                    client, path, kwargs = request
+                    timer.elapsed = 0.0
+                    start = time.perf_counter()
+                    response = client.post(path, **kwargs)
+                    self.latency[name].append((time.perf_counter() - start) * 1000)
+                    self.lock_wait[name].append(timer.elapsed * 1000)
+                    self.status[name][str(response.status_code)] += 1
+                    if response.status_code >= 500 and len(self.errors) < 5:
+                        self.errors.append(f'{name} {path}: {response.content[:200]!r}')
+        finally:
+            connection.close()
+        return {
+            'latency': dict(self.latency),
+            'lock_wait': dict(self.lock_wait),
+            'status': {name: dict(counter) for name, counter in self.status.items()},
+            'errors': self.errors,
+        }
+
+    def pick_order(self, **filters):
+        ids = list(
+            Order.objects.filter(user_id=self.user_id, **filters)
+            .order_by('-id').values_list('id', flat=True)[:CANDIDATES]
+        )
+        return self.rng.choice(ids) if ids else None
+
+    # ==================== 操作 ====================
+
+    def prepare_checkout(self):
+        item, _ = CartItem.objects.update_or_create(
+            user_id=self.user_id, sku_id=self.rng.choice(self.skus),
+            defaults={'quantity': self.rng.randint(1, self.max_quantity)},
+        )
+        data = {'address_id': self.address_id, 'cart_item_ids': [item.id], 'payment_method': 'mock'}
+        return self.client, '/api/shopping/orders/', {'data': data, 'content_type': 'application/json'}
+
+    def prepare_pay(self):
+        order_id = self.pick_order(status='pending')
+        return order_id and (self.client, f'/api/shopping/orders/{order_id}/pay/', {})
+
+    def prepare_cancel(self):
+        order_id = self.pick_order(status='pending')
+        return order_id and (self.client, f'/api/shopping/orders/{order_id}/cancel/', {})
+
+    def prepare_refund(self):
+        order_id = self.pick_order(status='paid', refund_request__isnull=True)
+        data = {'reason': 'other', 'description': '并发压测'}
+        return order_id and (
+            self.client, f'/api/shopping/orders/{order_id}/request_refund/',
+            {'data': data, 'content_type': 'application/json'},
+        )
+
+    def prepare_approve(self):
+        # 退款申请由管理员处理，所有线程共享
+        ids = list(
+            RefundRequest.objects.filter(status='pending', order__user__username__startswith=STRESS_PREFIX)
+            .order_by('-id').values_list('id', flat=True)[:CANDIDATES]
+        )
+        if not ids:
+            return None
+        path = f'/manage/shopping/refunds/{self.rng.choice(ids)}/approve/'
+        return self.staff_client, path, {'data': {'admin_note': '并发压测'}}
+
+
+class Command(BaseCommand):
+    help = '在测试数据库中并发下单、取消、退款，校验库存不变量并统计吞吐量和锁等待'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='每个进程的线程数')
+        parser.add_argument('--processes', type=int, default=1, help='进程数（fork，SQLite 不支持）')
+        parser.add_argument('--operations', type=int, default=100, help='每个线程的操作数')
+        parser.add_argument('--skus', type=int, default=3, help='参与压测的 SKU 数')
+        parser.add_argument('--stock', type=int, default=50, help='每个 SKU 的初始库存')
+        parser.add_argument('--users', type=int, help='用户数，默认为线程总数的一半（两个线程共用一个用户）')
+        parser.add_argument('--max-quantity', type=int, default=3, help='每次下单的最大件数')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'操作权重，默认 {DEFAULT_MIX}')
+        parser.add_argument('--seed', type=int, default=1234, help='随机种子')
+        parser.add_argument('--output', help='另存结果（JSON）')
+
+    def handle(self, *args, **options):
+        options['mix'] = parse_mix(options['mix'])
+        if options['threads'] < 1 or options['processes'] < 1 or options['skus'] < 1:
+            raise CommandError('--threads、--processes、--skus 必须大于 0')
+        if options['processes'] > 1 and connection.vendor == 'sqlite':
+            raise CommandError('SQLite 不支持多个进程并发写入，请使用 MySQL 或去掉 --processes')
+        total_threads = options['threads'] * options['processes']
+        options['users'] = options['users'] or max(1, total_threads // 2)
+
+        setup_test_environment()
+        # 压测只关心下单流程本身：关闭限流和请求级 SQL 统计；
+        # 4xx/5xx 由报告汇总，不逐条打印请求日志
+        settings.RATE_LIMIT_ENABLED = False
+        settings.QUERY_PROFILE_ENABLED = False
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # 内存数据库不能在多个线程间并发写入，改用临时文件；事务开始时即获取写锁并等待，
+            # 避免延迟事务升级写锁时直接报 database is locked
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'stress_checkout.sqlite3')
+            connection.settings_dict['OPTIONS'].update(transaction_mode='IMMEDIATE', timeout=30)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            fixtures = self.seed(options)
+            start = time.perf_counter()
+            results = self.run(fixtures, options)
+            elapsed = time.perf_counter() - start
+            inventory, violations = self.check_invariants(fixtures)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        self.report(results, elapsed, inventory, violations, options)
+
+    # ==================== 数据 ====================
+
+    def seed(self, options):
+        category = Category.objects.create(name=f'{STRESS_PREFIX}分类')
+        spu = ProductSPU.objects.create(name=f'{STRESS_PREFIX}商品', category=category)
+        skus = []
+        for i in range(options['skus']):
+            sku = ProductSKU.objects.create(spu=spu, title=f'{STRESS_PREFIX}规格{i + 1}', price='9.90')
+            Inventory.objects.create(sku=sku, quantity=options['stock'])
+            skus.append(sku.sku_code)
+
+        users = []
+        for i in range(options['users']):
+            user = User.objects.create_user(f'{STRESS_PREFIX}{i}', f'{STRESS_PREFIX}{i}@example.com', 'stress123')
+            address = Address.objects.create(
+                user=user, name='压测', phone='13800000000', province='北京市', city='北京市',
+                district='朝阳区', address=f'{i}号', is_default=True,
+            )
+            users.append((user.id, str(tokens_for_user(user).access_token), address.id))
+        staff = User.objects.create_user(f'{STRESS_PREFIX}admin', f'{STRESS_PREFIX}admin@example.com', 'stress123',
+                                         is_staff=True)
+        return {
+            'skus': skus,
+            'initial_stock': dict.fromkeys(skus, options['stock']),
+            'users': users,
+            'staff_id': staff.id,
+        }
+
+    # ==================== 压测 ====================
+
+    def run(self, fixtures, options):
+        if options['processes'] == 1:
+            return [self.run_threads(0, fixtures, options)]
+        _worker_state.update(command=self, fixtures=fixtures, options=options)
+        # 数据库连接不能跨进程共享，fork 前先关闭
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        try:
+            with ProcessPoolExecutor(max_workers=options['processes'], mp_context=context) as executor:
+                return list(executor.map(_run_process, range(options['processes'])))
+        finally:
+            _worker_state.clear()
+
+    def run_threads(self, process_index, fixtures, options):
+        """在当前进程中启动 --threads 个线程，返回合并后的结果"""
+        workers = [
+            Worker(process_index * options['threads'] + i, fixtures, options)
+            for i in range(options['threads'])
+        ]
+        results = [None] * len(workers)
+        barrier = threading.Barrier(len(workers))
+
+        def target(i):
+            # 所有线程就绪后同时开始，尽量制造并发
+            barrier.wait()
+            results[i] = workers[i].run(options['operations'])
+
+        threads = [threading.Thread(target=target, args=(i,)) for i in range(len(workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return merge_results(result for result in results if result is not None)
+
+    # ==================== 不变量 ====================
+
+    def check_invariants(self, fixtures):
+        """返回 (每个 SKU 的库存情况, 违反不变量的描述列表)"""
+        stock = dict(Inventory.objects.filter(sku_id__in=fixtures['skus']).values_list('sku_id', 'quantity'))
+        sold = dict(
+            OrderItem.objects.filter(sku_id__in=fixtures['skus']).exclude(order__status='cancelled')
+            .values('sku_id').annotate(total=Sum('quantity')).values_list('sku_id', 'total')
+        )
+        inventory = {}
+        violations = []
+        for sku_code, initial in fixtures['initial_stock'].items():
+            current, units = stock[sku_code], sold.get(sku_code, 0)
+            inventory[sku_code] = {'initial': initial, 'stock': current, 'sold': units}
+            if current < 0:
+                violations.append(f'{sku_code}: 库存为负 ({current})')
+            if current + units > initial:
+                violations.append(
+                    f'{sku_code}: 超卖 {current + units - initial} 件（初始 {initial}，库存 {current}，已售 {units}）'
+                )
+            elif current + units < initial:
+                violations.append(
+                    f'{sku_code}: 丢失库存 {initial - current - units} 件（初始 {initial}，库存 {current}，已售 {units}）'
+                )
+
+        duplicates = (
+            UserProduct.objects.values('user_id', 'sku_id').annotate(count=Count('id')).filter(count__gt=1)
+        )
+        for row in duplicates:
+            violations.append(f'用户 {row["user_id"]} 的 SKU {row["sku_id"]} 拥有记录重复 {row["count"]} 条')
+        return inventory, violations
+
+    # ==================== 报告 ====================
+
+    def report(self, results, elapsed, inventory, violations, options):
+        merged = merge_results(results)
+        operations = {}
+        completed = 0
+        for name in OPERATIONS:
+            latency = merged['latency'].get(name, [])
+            completed += len(latency)
+            operations[name] = {
+                'requests': len(latency),
+                'throughput': round(len(latency) / elapsed, 1),
+                'status': merged['status'].get(name, {}),
+                'latency_ms': distribution(latency),
+                'inventory_ms': distribution(merged['lock_wait'].get(name, [])),
+            }
+            if not latency:
+                continue
+            statuses = ' '.join(f'{code}:{count}' for code, count in sorted(operations[name]['status'].items()))
+            self.stdout.write(
+                f'{name:<9} {len(latency):>6} 次 {operations[name]["throughput"]:>8.1f}/s  '
+                f'p50 {operations[name]["latency_ms"]["p50"]:>8.2f} ms  '
+                f'p95 {operations[name]["latency_ms"]["p95"]:>8.2f} ms  '
+                f'库存语句 p95 {operations[name]["inventory_ms"]["p95"]:>7.2f} ms '
+                f'max {operations[name]["inventory_ms"]["max"]:>7.2f} ms  [{statuses}]'
+            )
+        self.stdout.write(
+            f'合计 {completed} 次请求，{elapsed:.1f} 秒，{completed / elapsed:.1f} 次/秒'
+            f'（{options["processes"]} 进程 × {options["threads"]} 线程，{connection.vendor}）'
+        )
+        for sku_code, row in inventory.items():
+            self.stdout.write(f'{sku_code}: 初始 {row["initial"]}，库存 {row["stock"]}，已售 {row["sold"]}')
+        for error in merged['errors']:
+            self.stdout.write(self.style.WARNING(f'服务器错误: {error}'))
+
+        if options['output']:
+            document = {
+                'database': connection.vendor,
+                'processes': options['processes'],
+                'threads': options['threads'],
+                'elapsed': round(elapsed, 3),
+                'operations': operations,
+                'inventory': inventory,
+                'violations': violations,
+                'errors': merged['errors'],
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(options['output'])), exist_ok=True)
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(document, f, ensure_ascii=False, indent=2)
+                f.write('\n')
+
+        if violations:
+            raise CommandError('违反不变量:\n  ' + '\n  '.join(violations))
+        self.stdout.write(self.style.SUCCESS('库存不为负、库存守恒、拥有记录不重复'))
+
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0009_alter_order_payment_method'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='尺寸变体'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0010_productimage_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitemreviewimage',
+            name='blurhash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='占位图'),
+        ),
+        migrations.AddField(
+            model_name='orderitemreviewimage',
+            name='dominant_color',
+            field=models.CharField(blank=True, max_length=7, verbose_name='主色'),
+        ),
+        migrations.AddField(
+            model_name='orderitemreviewimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='高度'),
+        ),
+        migrations.AddField(
+            model_name='orderitemreviewimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='宽度'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='blurhash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='占位图'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='dominant_color',
+            field=models.CharField(blank=True, max_length=7, verbose_name='主色'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='高度'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='宽度'),
+        ),
+    ]
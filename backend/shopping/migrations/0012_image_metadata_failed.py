@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:39
+
+from django.db import migrations, models
+
+
+# 之前计算失败的图片宽高记为 0
+FAILED_TARGETS = [
+    ('shopping', 'ProductImage', ''),
+    ('shopping', 'OrderItemReviewImage', ''),
+]
+
+
+def mark_failed_metadata(apps, schema_editor):
+    """宽度为 0 的记录改为宽高 NULL + 失败标记，backfill_image_metadata 默认会重试"""
+    for app_label, model_name, prefix in FAILED_TARGETS:
+        apps.get_model(app_label, model_name).objects.filter(**{f'{prefix}width': 0}).update(**{
+            f'{prefix}width': None, f'{prefix}height': None, f'{prefix}metadata_failed': True,
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0011_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitemreviewimage',
+            name='metadata_failed',
+            field=models.BooleanField(default=False, verbose_name='元数据计算失败'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='metadata_failed',
+            field=models.BooleanField(default=False, verbose_name='元数据计算失败'),
+        ),
+        migrations.RunPython(mark_failed_metadata, migrations.RunPython.noop),
+    ]
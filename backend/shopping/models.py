@@ -178,6 +178,14 @@ class ProductImage(models.Model):
     sku = models.ForeignKey(ProductSKU, on_delete=models.CASCADE, related_name='images', verbose_name="SKU", null=True, blank=True)
     image = models.ImageField(upload_to=product_image_upload_path, verbose_name="图片")
     is_main = models.BooleanField(default=False, verbose_name="是否主图")
+    # 多尺寸 WebP/JPEG 变体，由 shopping.image_variants 在上传后生成
+    variants = models.JSONField(default=dict, blank=True, verbose_name="尺寸变体")
+    # 图片元数据，上传后由 shopping.image_metadata 异步计算
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name="宽度")
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name="高度")
+    dominant_color = models.CharField(max_length=7, blank=True, verbose_name="主色")
+    blurhash = models.CharField(max_length=64, blank=True, verbose_name="占位图")
+    metadata_failed = models.BooleanField(default=False, verbose_name="元数据计算失败")
 
     class Meta:
         verbose_name = "商品图片"
@@ -190,6 +198,14 @@ class ProductImage(models.Model):
     def __str__(self):
         return f"{self.spu.name if self.spu else self.sku.title} - {self.image.name}"
 
+    @classmethod
+    def media_file_names(cls):
+        """变体文件不在 FileField 中，供孤儿文件回收（collect_orphan_media）识别"""
+        for variants in cls.objects.exclude(variants={}).values_list('variants', flat=True).iterator(chunk_size=2000):
+            for info in variants.values():
+                yield info['webp']
+                yield info['jpeg']
+
 # 商品评论表
 class ProductReview(models.Model):
     spu = models.ForeignKey(ProductSPU, on_delete=models.CASCADE, related_name='reviews', verbose_name="所属SPU")
@@ -396,6 +412,12 @@ class OrderItemReviewImage(models.Model):
     """评价图片"""
     review = models.ForeignKey(OrderItemReview, on_delete=models.CASCADE, related_name='review_images', verbose_name="关联评价")
     image = models.ImageField(upload_to=review_image_upload_path, verbose_name="图片")
+    # 图片元数据，上传后由 shopping.image_metadata 异步计算
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name="宽度")
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name="高度")
+    dominant_color = models.CharField(max_length=7, blank=True, verbose_name="主色")
+    blurhash = models.CharField(max_length=64, blank=True, verbose_name="占位图")
+    metadata_failed = models.BooleanField(default=False, verbose_name="元数据计算失败")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="上传时间")
     
     class Meta:
@@ -1,8 +1,25 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import (
     ProductSPU, ProductSKU, ProductReview, Category, Order, OrderItem,
-    RefundRequest, OrderItemReview, OrderItemReviewImage
+    RefundRequest, OrderItemReview, OrderItemReviewImage, ProductImage
 )
+from .image_metadata import image_meta
+from .image_variants import variant_urls
+from user.avatars import avatar_url
+
+
+def main_image_prefetch(lookup='images'):
+    """
+    批量预加载 SPU 主图，结果存放在 SPU 的 main_images 属性上。
+    lookup 为指向 ProductSPU.images 的关联路径，如 'post__products__images'。
+    """
+    return Prefetch(
+        lookup,
+        queryset=ProductImage.objects.filter(is_main=True),
+        to_attr='main_images'
+    )
+
 
 class CategorySerializer(serializers.ModelSerializer):
     """分类序列化器，支持层级显示"""
@@ -25,18 +42,26 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class ProductSPUSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()  # 从ProductImage获取主图
+    image_variants = serializers.SerializerMethodField()  # 主图多尺寸变体（srcset）
+    image_meta = serializers.SerializerMethodField()  # 主图宽高、主色、blurhash
     is_favorited = serializers.SerializerMethodField()  # 是否已收藏
     review_count = serializers.SerializerMethodField()  # 评论数
 
     class Meta:
         model = ProductSPU
         fields = ['id', 'name', 'description', 'category', 'brand', 'series', 'is_active', 
-                  'created_at', 'updated_at', 'image', 'is_favorited', 'review_count']
+                  'created_at', 'updated_at', 'image', 'image_variants', 'image_meta', 'is_favorited', 'review_count']
+
+    def _main_image(self, obj):
+        """主图只查询一次，供 image 和 image_variants 共用"""
+        if not hasattr(obj, '_main_image'):
+            obj._main_image = obj.images.filter(is_main=True).first()
+        return obj._main_image
 
     def get_image(self, obj):
         """返回主图完整 URL"""
         request = self.context.get('request')
-        image = obj.images.filter(is_main=True).first()
+        image = self._main_image(obj)
         if image:
             if request:
                 try:
@@ -45,6 +70,14 @@ class ProductSPUSerializer(serializers.ModelSerializer):
                     return image.image.url
             return image.image.url
         return None
+
+    def get_image_variants(self, obj):
+        image = self._main_image(obj)
+        return variant_urls(image, self.context.get('request')) if image else None
+
+    def get_image_meta(self, obj):
+        image = self._main_image(obj)
+        return image_meta(image) if image else None
     
     def get_is_favorited(self, obj):
         """检查当前用户是否已收藏"""
@@ -59,6 +92,50 @@ class ProductSPUSerializer(serializers.ModelSerializer):
         return obj.reviews.count()
 
 
+class ProductCardSerializer(serializers.ModelSerializer):
+    """
+    商品卡片序列化器（精简投影），用于收藏列表、帖子关联商品等场景。
+    主图优先读取预加载的 main_images 属性（Prefetch to_attr），
+    其次读取预加载的 images，避免每个商品单独查询。
+    """
+    image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+    image_meta = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductSPU
+        fields = ['id', 'name', 'description', 'brand', 'series', 'is_active', 'image', 'image_variants', 'image_meta']
+
+    def _main_image(self, obj):
+        main_images = getattr(obj, 'main_images', None)
+        if main_images is None:
+            main_images = [image for image in obj.images.all() if image.is_main]
+        return main_images[0] if main_images else None
+
+    def get_image(self, obj):
+        """返回主图完整 URL"""
+        image = self._main_image(obj)
+        if image is None:
+            return None
+
+        request = self.context.get('request')
+        url = image.image.url
+        if request:
+            try:
+                return request.build_absolute_uri(url)
+            except Exception:
+                return url
+        return url
+
+    def get_image_variants(self, obj):
+        image = self._main_image(obj)
+        return variant_urls(image, self.context.get('request')) if image else None
+
+    def get_image_meta(self, obj):
+        image = self._main_image(obj)
+        return image_meta(image) if image else None
+
+
 class ProductSKUSerializer(serializers.ModelSerializer):
     spu_name = serializers.CharField(source='spu.name', read_only=True)
     image = serializers.SerializerMethodField()
@@ -105,16 +182,8 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at', 'updated_at']
     
     def get_user_avatar(self, obj):
-        """获取用户头像URL"""
-        request = self.context.get('request')
-        if obj.user.avatar:
-            if request:
-                try:
-                    return request.build_absolute_uri(obj.user.avatar.url)
-                except Exception:
-                    return obj.user.avatar.url
-            return obj.user.avatar.url
-        return None
+        """获取用户头像URL（小尺寸规格图）"""
+        return avatar_url(obj.user, request=self.context.get('request'))
 
 
 # ==================== 退款申请序列化器 ====================
@@ -144,8 +213,8 @@ class OrderItemReviewImageSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = OrderItemReviewImage
-        fields = ['id', 'image', 'url', 'created_at']
-        read_only_fields = ['created_at']
+        fields = ['id', 'image', 'url', 'width', 'height', 'dominant_color', 'blurhash', 'created_at']
+        read_only_fields = ['width', 'height', 'dominant_color', 'blurhash', 'created_at']
     
     def get_url(self, obj):
         """获取图片完整URL"""
@@ -182,16 +251,8 @@ class OrderItemReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ['order_item', 'user', 'spu', 'created_at', 'updated_at', 'username', 'user_avatar', 'spu_name']
     
     def get_user_avatar(self, obj):
-        """获取用户头像URL"""
-        request = self.context.get('request')
-        if obj.user.avatar:
-            if request:
-                try:
-                    return request.build_absolute_uri(obj.user.avatar.url)
-                except Exception:
-                    return obj.user.avatar.url
-            return obj.user.avatar.url
-        return None
+        """获取用户头像URL（小尺寸规格图）"""
+        return avatar_url(obj.user, request=self.context.get('request'))
     
     def get_images(self, obj):
         """获取评价图片列表"""
@@ -233,38 +294,44 @@ class OrderItemReviewSerializer(serializers.ModelSerializer):
 class OrderItemSerializer(serializers.ModelSerializer):
     """订单商品序列化器"""
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()  # 商品图片多尺寸变体（srcset）
+    image_meta = serializers.SerializerMethodField()  # 商品图片宽高、主色、blurhash
     can_review = serializers.SerializerMethodField()  # 是否可以评价
     review = serializers.SerializerMethodField()  # 评价信息
     
     class Meta:
         model = OrderItem
-        fields = ['id', 'sku', 'sku_title', 'spu_name', 'price', 'quantity', 'subtotal', 'image', 'is_reviewed', 'can_review', 'review']
+        fields = ['id', 'sku', 'sku_title', 'spu_name', 'price', 'quantity', 'subtotal', 'image', 'image_variants', 'image_meta', 'is_reviewed', 'can_review', 'review']
         read_only_fields = ['sku_title', 'spu_name', 'price', 'subtotal', 'image', 'is_reviewed']
+
+    def _item_image(self, obj):
+        """SKU 图片优先，其次 SPU 主图；只查询一次"""
+        if not hasattr(obj, '_item_image'):
+            obj._item_image = obj.sku.images.first() or obj.sku.spu.images.filter(is_main=True).first()
+        return obj._item_image
     
     def get_image(self, obj):
         """获取商品图片"""
         request = self.context.get('request')
-        # 尝试获取SKU图片
-        sku_image = obj.sku.images.first()
-        if sku_image:
-            if request:
-                try:
-                    return request.build_absolute_uri(sku_image.image.url)
-                except Exception:
-                    return sku_image.image.url
-            return sku_image.image.url
-        
-        # 否则获取SPU主图
-        spu_main_image = obj.sku.spu.images.filter(is_main=True).first()
-        if spu_main_image:
+        # SKU图片优先，否则使用SPU主图
+        image = self._item_image(obj)
+        if image:
             if request:
                 try:
-                    return request.build_absolute_uri(spu_main_image.image.url)
+                    return request.build_absolute_uri(image.image.url)
                 except Exception:
-                    return spu_main_image.image.url
-            return spu_main_image.image.url
+                    return image.image.url
+            return image.image.url
         
         return None
+
+    def get_image_variants(self, obj):
+        image = self._item_image(obj)
+        return variant_urls(image, self.context.get('request')) if image else None
+
+    def get_image_meta(self, obj):
+        image = self._item_image(obj)
+        return image_meta(image) if image else None
     
     def get_can_review(self, obj):
         """判断是否可以评价（订单已完成且未评价）"""
@@ -0,0 +1,47 @@
+"""
+商城信号处理
+- 商品图片上传或替换后，异步生成多尺寸变体
+- 各模型图片上传或替换后，异步计算宽高、主色和 blurhash（见 image_metadata.IMAGE_METADATA_FIELDS）
+"""
+from django.db.models.signals import post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .image_metadata import clear_metadata, metadata_targets, needs_metadata, schedule_metadata
+from .image_variants import schedule_variants, variants_up_to_date
+from .models import ProductImage
+
+
+@receiver(post_save, sender=ProductImage)
+def generate_image_variants(sender, instance, **kwargs):
+    if instance.image and not variants_up_to_date(instance):
+        schedule_variants(instance)
+
+
+def _connect_metadata_handlers(model, field, prefix):
+    loaded_key = f'_metadata_loaded_{field}'
+
+    def remember_loaded_name(sender, instance, **kwargs):
+        # 读取 __dict__ 而不是属性，延迟加载（only/defer）的字段不会因此触发查询
+        if field in instance.__dict__:
+            value = instance.__dict__[field]
+            instance.__dict__[loaded_key] = getattr(value, 'name', value)
+
+    def reset_on_upload(sender, instance, **kwargs):
+        # 新上传（尚未提交到存储）或已通过 FieldFile.save 换成其他文件时，旧的元数据作废
+        file = getattr(instance, field)
+        if file and (not file._committed or file.name != instance.__dict__.get(loaded_key, file.name)):
+            clear_metadata(instance, prefix)
+
+    def compute_after_save(sender, instance, **kwargs):
+        instance.__dict__[loaded_key] = getattr(instance, field).name
+        if needs_metadata(instance, field, prefix):
+            schedule_metadata(instance, field, prefix)
+
+    uid = f'image_metadata:{model._meta.label}.{field}'
+    post_init.connect(remember_loaded_name, sender=model, weak=False, dispatch_uid=uid)
+    pre_save.connect(reset_on_upload, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(compute_after_save, sender=model, weak=False, dispatch_uid=uid)
+
+
+for _model, _field, _prefix in metadata_targets():
+    _connect_metadata_handlers(_model, _field, _prefix)
@@ -1,3 +1,182 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from user.models import User
+
+from .image_variants import variant_urls, variants_up_to_date
+from .imaging import FAILED_METADATA, compute_metadata, render_variants
+from .models import Category, ProductImage, ProductSPU
+
+
+def image_bytes(size=(2000, 1000), color=(255, 0, 0), mode='RGB', fmt='PNG'):
+    output = io.BytesIO()
+    Image.new(mode, size, color).save(output, format=fmt)
+    return output.getvalue()
+
+
+class MediaRootMixin:
+    """每个测试使用独立的临时 MEDIA_ROOT，图片同步处理（不启动进程池）"""
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=root, IMAGE_PROCESS_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write_image(self, name, **kwargs):
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(image_bytes(**kwargs))
+        return path
+
+
+# ==================== 图片变体 ====================
+
+class RenderVariantsTests(MediaRootMixin, SimpleTestCase):
+
+    def test_sizes_and_formats(self):
+        path = self.write_image('a.png', mode='RGBA', color=(0, 0, 255, 128))
+        variants = render_variants(path)
+        self.assertEqual(
+            {name: (info['width'], info['height']) for name, info in variants.items()},
+            {'thumb': (160, 80), 'card': (480, 240), 'detail': (1080, 540)},
+        )
+        with Image.open(io.BytesIO(variants['card']['webp'])) as webp:
+            self.assertEqual((webp.format, webp.size), ('WEBP', (480, 240)))
+        with Image.open(io.BytesIO(variants['card']['jpeg'])) as jpeg:
+            self.assertEqual((jpeg.format, jpeg.mode), ('JPEG', 'RGB'))
+
+    def test_small_image_not_upscaled(self):
+        variants = render_variants(self.write_image('small.png', size=(300, 200)))
+        self.assertEqual([info['width'] for info in variants.values()], [160, 300, 300])
+
+
+class ProductImageVariantTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name='guitar')
+        self.spu = ProductSPU.objects.create(name='g1', category=category, brand='b', series='s')
+
+    def create_image(self, size=(2000, 1000)):
+        with self.captureOnCommitCallbacks(execute=True):
+            product_image = ProductImage(spu=self.spu)
+            product_image.image.save('photo.png', ContentFile(image_bytes(size=size)), save=False)
+            product_image.save()
+        product_image.refresh_from_db()
+        return product_image
+
+    def test_variants_generated_after_commit(self):
+        product_image = self.create_image()
+        self.assertTrue(variants_up_to_date(product_image))
+        card = product_image.variants['card']
+        self.assertEqual((card['width'], card['height']), (480, 240))
+        stem = os.path.splitext(product_image.image.name)[0]
+        self.assertEqual(card['webp'], f'variants/{stem}/card.webp')
+        self.assertTrue(default_storage.exists(card['jpeg']))
+        names = set(ProductImage.media_file_names())
+        self.assertEqual(len(names), 6)
+        self.assertIn(card['webp'], names)
+
+    def test_srcset_dedups_equal_widths(self):
+        urls = variant_urls(self.create_image(size=(300, 200)))
+        self.assertEqual(urls['webp'].count('w,') + 1, 2)  # 160w 与 300w
+        self.assertEqual(set(urls['sizes']), {'thumb', 'card', 'detail'})
+
+    def test_replaced_image_regenerated(self):
+        product_image = self.create_image()
+        old = product_image.variants['card']['webp']
+        with self.captureOnCommitCallbacks(execute=True):
+            product_image.image.save('new.png', ContentFile(image_bytes(size=(600, 600))))
+        product_image.refresh_from_db()
+        self.assertNotEqual(product_image.variants['card']['webp'], old)
+        self.assertEqual(product_image.variants['card']['height'], 480)
+
+    def test_command_backfills_missing_variants(self):
+        product_image = self.create_image()
+        ProductImage.objects.filter(id=product_image.id).update(variants={})
+        call_command('generate_image_variants', workers=1, stdout=io.StringIO())
+        product_image.refresh_from_db()
+        self.assertTrue(variants_up_to_date(product_image))
+
+
+# ==================== 图片元数据 ====================
+
+class ImageMetadataSignalTests(TestCase):
+
+    def test_default_avatar_not_scheduled(self):
+        with mock.patch('shopping.signals.schedule_metadata') as schedule:
+            user = User.objects.create_user('u1', 'u1@example.com', 'pw123456')
+            user.bio = 'changed'
+            user.save()
+        self.assertEqual(user.avatar.name, 'avatars/default.png')
+        schedule.assert_not_called()
+
+    def test_uploaded_avatar_scheduled(self):
+        user = User.objects.create_user('u1', 'u1@example.com', 'pw123456')
+        with mock.patch('shopping.signals.schedule_metadata') as schedule:
+            user.avatar.name = 'avatars/2026/10/19/me.png'
+            user.save()
+        schedule.assert_called_once_with(user, 'avatar', 'avatar_')
+
+
+class ImageMetadataTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name='guitar')
+        self.spu = ProductSPU.objects.create(name='g1', category=category)
+
+    def test_compute_metadata(self):
+        metadata = compute_metadata(self.write_image('red.png', size=(40, 30)))
+        self.assertEqual((metadata['width'], metadata['height']), (40, 30))
+        self.assertEqual(metadata['dominant_color'], '#ff0000')
+        self.assertEqual(len(metadata['blurhash']), 28)  # 4x3 分量
+        self.assertEqual(compute_metadata(os.path.join(settings.MEDIA_ROOT, 'missing.png')), FAILED_METADATA)
+
+    def create_image(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            product_image = ProductImage(spu=self.spu)
+            product_image.image.save('photo.png', ContentFile(content), save=False)
+            product_image.save()
+        product_image.refresh_from_db()
+        return product_image
+
+    def test_stored_after_upload_and_reset_on_replace(self):
+        product_image = self.create_image(image_bytes(size=(40, 30)))
+        self.assertEqual((product_image.width, product_image.height), (40, 30))
+        self.assertFalse(product_image.metadata_failed)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product_image.image.save('blue.png', ContentFile(image_bytes(size=(10, 20), color=(0, 0, 255))))
+        product_image.refresh_from_db()
+        self.assertEqual((product_image.width, product_image.dominant_color), (10, '#0000ff'))
+
+    def test_failure_recorded_and_retried_by_backfill(self):
+        product_image = self.create_image(b'not an image')
+        self.assertIsNone(product_image.width)
+        self.assertTrue(product_image.metadata_failed)
+
+        with open(product_image.image.path, 'wb') as f:
+            f.write(image_bytes(size=(40, 30)))
+        call_command('backfill_image_metadata', '--skip-failed', workers=1, stdout=io.StringIO())
+        product_image.refresh_from_db()
+        self.assertIsNone(product_image.width)
+
+        call_command('backfill_image_metadata', workers=1, stdout=io.StringIO())
+        product_image.refresh_from_db()
+        self.assertEqual(product_image.width, 40)
+        self.assertFalse(product_image.metadata_failed)
@@ -0,0 +1,241 @@
+"""
+后台分批注销账户
+注销接口只停用账户（is_active=False，令牌版本递增使已签发的令牌全部失效）并创建 AccountDeletion 任务，
+事务提交后由后台线程执行删除，请求不必等待：
+
+- 按依赖顺序逐表删除属于该用户的记录（先删收藏、评价等叶子记录，再删订单、帖子，最后删用户本身），
+  每批最多 ACCOUNT_DELETION_BATCH_SIZE 条、各自一个短事务，避免一次级联删除长时间锁表
+- 逐条删除会触发信号，搜索索引、标签倒排表、帖子热度照常维护；删除回复后重算所在帖子的回复数
+- 删除记录引用的媒体文件（评价图片、仅被该用户帖子使用的论坛图片、头像及规格图）
+- 每批完成后记录当前步骤和已删除数量；进程中断时，resume_account_deletions 命令从记录的步骤继续
+  （每一步都只查询剩余记录，重复执行是安全的）
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F, FileField, Q
+from django.utils import timezone
+
+from forum.counters import recount_replies
+from publish.chunked_upload import discard_parts
+
+from .avatars import AVATAR_SIZES, rendition_name
+from .models import AccountDeletion, User
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+# ==================== 删除步骤 ====================
+
+def _reply_post_ids(ids):
+    return set(apps.get_model('forum.Reply').objects.filter(id__in=ids).values_list('post_id', flat=True))
+
+
+def _recount_posts(post_ids):
+    # 回复数由视图维护而非信号，批量删除后按回复表重算
+    recount_replies(post_ids)
+    return []
+
+
+def _post_image_ids(ids):
+    return set(apps.get_model('forum.Image').objects.filter(posts__in=ids).values_list('id', flat=True))
+
+
+def _delete_unattached_images(image_ids):
+    """删除帖子后不再被任何帖子使用的论坛图片，返回其文件名"""
+    images = apps.get_model('forum.Image').objects.filter(id__in=image_ids, posts=None)
+    names = list(images.values_list('file', flat=True))
+    images.delete()
+    return names
+
+
+def _discard_upload_parts(upload_ids):
+    for upload_id in upload_ids:
+        discard_parts(upload_id)
+    return []
+
+
+class DeletionStep:
+    """
+    删除某张表中属于用户的记录
+    prepare(ids) 在删除前收集信息，finish(context) 在删除后处理并返回需要清理的文件名
+    """
+
+    def __init__(self, name, model, lookup, prepare=None, finish=None):
+        self.name = name
+        self.model = model
+        self.lookup = lookup
+        self.prepare = prepare
+        self.finish = finish
+
+    def delete_batch(self, account_id, batch_size):
+        """删除一批记录，返回删除数量（不含级联删除的记录）"""
+        model = apps.get_model(self.model)
+        ids = list(
+            model.objects.filter(**{self.lookup: account_id})
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        context = self.prepare(ids) if self.prepare else None
+        files = _file_names(model, ids)
+        with transaction.atomic():
+            model.objects.filter(pk__in=ids).delete()
+        if self.finish:
+            files.extend(self.finish(context))
+        delete_media_files(files)
+        return len(ids)
+
+
+# 按依赖顺序排列：先删叶子记录，使删除订单、帖子时级联的记录尽量少
+DELETION_STEPS = [
+    DeletionStep('post_favorites', 'user.PostFavorite', 'user_id'),
+    DeletionStep('product_favorites', 'user.ProductFavorite', 'user_id'),
+    DeletionStep('cart_items', 'user.CartItem', 'user_id'),
+    DeletionStep('addresses', 'user.Address', 'user_id'),
+    DeletionStep('owned_products', 'user.UserProduct', 'user_id'),
+    DeletionStep('product_reviews', 'shopping.ProductReview', 'user_id'),
+    DeletionStep('order_review_images', 'shopping.OrderItemReviewImage', 'review__user_id'),
+    DeletionStep('order_reviews', 'shopping.OrderItemReview', 'user_id'),
+    DeletionStep('orders', 'shopping.Order', 'user_id'),
+    DeletionStep('replies', 'forum.Reply', 'author_id', prepare=_reply_post_ids, finish=_recount_posts),
+    DeletionStep('posts', 'forum.Post', 'author_id', prepare=_post_image_ids, finish=_delete_unattached_images),
+    DeletionStep('notices', 'publish.Notice', 'author_id'),
+    DeletionStep('chunked_uploads', 'publish.ChunkedUpload', 'user_id', prepare=list, finish=_discard_upload_parts),
+    DeletionStep('revoked_tokens', 'user.RevokedToken', 'user_id'),
+]
+
+ACCOUNT_STEP = 'account'
+
+
+# ==================== 媒体文件 ====================
+
+def _file_names(model, ids):
+    """记录中文件字段引用的文件（字段默认值如默认头像为共用文件，不删除）"""
+    fields = [field for field in model._meta.concrete_fields if isinstance(field, FileField)]
+    if not fields:
+        return []
+    defaults = {field.get_default() for field in fields}
+    names = []
+    for row in model.objects.filter(pk__in=ids).values_list(*[field.attname for field in fields]):
+        names.extend(name for name in row if name and name not in defaults)
+    return names
+
+
+def delete_media_files(names):
+    """删除失败只记录日志，遗留的文件由 collect_orphan_media 回收"""
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except Exception:
+            logger.warning('删除媒体文件失败: %s', name, exc_info=True)
+
+
+def _delete_user(account_id):
+    """最后一步：删除头像、规格图和用户本身"""
+    user = User.objects.filter(id=account_id).first()
+    if user is None:
+        return 0
+    files = _file_names(User, [user.id])
+    if user.avatar_rendered_version:
+        files.extend(rendition_name(user.id, size) for size in AVATAR_SIZES)
+    with transaction.atomic():
+        user.delete()
+    delete_media_files(files)
+    return 1
+
+
+# ==================== 任务 ====================
+
+def request_account_deletion(user):
+    """立即停用账户并创建注销任务，事务提交后在后台执行；返回任务"""
+    with transaction.atomic():
+        job, created = AccountDeletion.objects.get_or_create(
+            account_id=user.id, defaults={'username': user.username},
+        )
+        user.is_active = False
+        # 令牌版本递增，已签发的令牌全部失效（保存时清除认证缓存）
+        user._previous_token_version = user.token_version
+        user.token_version += 1
+        user.save(update_fields=['is_active', 'token_version'])
+        transaction.on_commit(lambda: start_deletion(job.id))
+    return job
+
+
+def start_deletion(job_id):
+    """提交到后台线程执行；ACCOUNT_DELETION_BACKGROUND 关闭时在当前线程执行"""
+    global _executor
+    if not settings.ACCOUNT_DELETION_BACKGROUND:
+        run_deletion(job_id)
+        return
+    if _executor is None:
+        # 单线程：注销任务依次执行，不与请求争用过多数据库连接
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='account-deletion')
+    _executor.submit(_run_in_background, job_id)
+
+
+def _run_in_background(job_id):
+    try:
+        run_deletion(job_id)
+    except Exception:
+        logger.exception('账户注销任务失败: %s', job_id)
+    finally:
+        close_old_connections()
+
+
+def resumable_jobs(retry_failed=False):
+    """等待中、执行中但已停滞（进程中断）的任务；retry_failed 时包括失败的任务"""
+    stale = timezone.now() - timedelta(seconds=settings.ACCOUNT_DELETION_STALE_SECONDS)
+    condition = Q(status='pending') | Q(status='running', updated_at__lt=stale)
+    if retry_failed:
+        condition |= Q(status='failed')
+    return AccountDeletion.objects.filter(condition)
+
+
+def _claim(job_id, retry_failed):
+    """条件更新抢占任务，同一任务不会被两个进程同时执行"""
+    return resumable_jobs(retry_failed).filter(id=job_id).update(
+        status='running', attempts=F('attempts') + 1, error='', updated_at=timezone.now(),
+    )
+
+
+def _save_progress(job, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.save(update_fields=['step', 'deleted_counts', 'updated_at', *fields])
+
+
+def run_deletion(job_id, retry_failed=False):
+    """执行（或继续执行）注销任务，返回任务；任务已被其他进程执行或已完成时返回 None"""
+    if not _claim(job_id, retry_failed):
+        return None
+    job = AccountDeletion.objects.get(id=job_id)
+    names = [step.name for step in DELETION_STEPS]
+    start = names.index(job.step) if job.step in names else 0
+    if job.step == ACCOUNT_STEP:
+        start = len(DELETION_STEPS)
+
+    try:
+        for step in DELETION_STEPS[start:]:
+            _save_progress(job, step=step.name)
+            while True:
+                deleted = step.delete_batch(job.account_id, settings.ACCOUNT_DELETION_BATCH_SIZE)
+                if not deleted:
+                    break
+                job.deleted_counts[step.name] = job.deleted_counts.get(step.name, 0) + deleted
+                _save_progress(job)
+
+        _save_progress(job, step=ACCOUNT_STEP)
+        job.deleted_counts[ACCOUNT_STEP] = _delete_user(job.account_id)
+        _save_progress(job, status='completed', step='', finished_at=timezone.now())
+    except Exception as e:
+        _save_progress(job, status='failed', error=str(e))
+        raise
+    return job
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
 
-from .models import User, UserProduct, Address, CartItem, ProductFavorite, PostFavorite
+from .models import User, UserProduct, Address, CartItem, ProductFavorite, PostFavorite, AccountDeletion
 
 # Django 框架中的一个装饰器，用于注册模型（Model）
 @admin.register(User)
@@ -134,4 +134,13 @@ class ProductFavoriteAdmin(admin.ModelAdmin):
 @admin.register(PostFavorite)
 class PostFavoriteAdmin(admin.ModelAdmin):
     list_display = ['user', 'post']
-    search_fields = ['user__username', 'post__title']
\ No newline at end of file
+    search_fields = ['user__username', 'post__title']
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    list_display = ['username', 'account_id', 'status', 'step', 'attempts', 'created_at', 'updated_at', 'finished_at']
+    search_fields = ['username']
+    list_filter = ['status']
+    readonly_fields = ['account_id', 'username', 'step', 'deleted_counts', 'attempts', 'error',
+                       'created_at', 'updated_at', 'finished_at']
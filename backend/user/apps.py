@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        from . import signals  # noqa: F401  注册信号处理函数
+        from backend.shared_cache import log_unshared_cache  # 同时注册部署检查
+        log_unshared_cache()
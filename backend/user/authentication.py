@@ -0,0 +1,91 @@
+"""
+JWT 认证（带用户缓存）
+simplejwt 的 JWTAuthentication 每个请求都会查询一次用户表。这里把用户对象按
+(用户ID, 令牌版本) 缓存一小段时间，命中时省掉这次查询。
+
+- 令牌中的 ver 声明为签发时的 User.token_version；修改密码时版本号递增，旧令牌全部失效
+- 用户保存或删除时（修改简介、上传头像、注销账户等）在事务提交后清除缓存，见 signals.py；
+  事务回滚时缓存保留，提交前并发请求写回缓存的旧对象也会在提交时清除
+- queryset.update() 不触发信号：头像规格图版本的更新调用 invalidate_principal_ids 清除缓存；
+  头像元数据（shopping.image_metadata 异步写入）只影响展示，不清除，最多旧 AUTH_PRINCIPAL_CACHE_SECONDS 秒。
+  密码、令牌版本、是否启用等字段必须通过 save() 修改
+- 只在默认缓存为共享缓存（Redis 等）时缓存：进程内缓存的失效操作到不了其他 worker，
+  会返回过期的用户对象，视图再完整保存时可能写回旧的密码或令牌版本
+- 已吊销的令牌（退出登录、刷新令牌轮换）被拒绝，见 revocation.py
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend.shared_cache import is_shared_cache
+
+from .models import User
+from .revocation import is_revoked
+
+TOKEN_VERSION_CLAIM = 'ver'
+
+
+def principal_cache_key(user_id, token_version):
+    return f'auth:principal:{user_id}:{token_version}'
+
+
+def invalidate_principal(user):
+    """事务提交后清除用户的认证缓存；修改密码后版本号已递增，旧版本的缓存一并清除"""
+    versions = {user.token_version, getattr(user, '_previous_token_version', user.token_version)}
+    keys = [principal_cache_key(user.id, version) for version in versions]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_principal_ids(user_ids):
+    """用 queryset.update() 修改用户后调用，按当前令牌版本清除缓存"""
+    rows = User.objects.filter(id__in=user_ids).values_list('id', 'token_version')
+    keys = [principal_cache_key(user_id, version) for user_id, version in rows]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def tokens_for_user(user):
+    """签发带令牌版本的刷新令牌，access 令牌从中派生并继承 ver 声明"""
+    refresh = RefreshToken.for_user(user)
+    refresh[TOKEN_VERSION_CLAIM] = user.token_version
+    return refresh
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if jti and is_revoked(jti):
+            raise InvalidToken({'detail': '令牌已吊销，请重新登录', 'code': 'token_revoked'})
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        # 本功能上线前签发的令牌没有 ver 声明，按版本 0 处理
+        token_version = validated_token.get(TOKEN_VERSION_CLAIM, 0)
+
+        key = principal_cache_key(user_id, token_version)
+        use_cache = settings.AUTH_PRINCIPAL_CACHE_SECONDS > 0 and is_shared_cache()
+        user = cache.get(key) if use_cache else None
+        if user is None:
+            try:
+                user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            if user.token_version != token_version:
+                raise AuthenticationFailed('令牌已失效，请重新登录', code='token_version_mismatch')
+            if use_cache:
+                cache.set(key, user, settings.AUTH_PRINCIPAL_CACHE_SECONDS)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
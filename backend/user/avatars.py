@@ -0,0 +1,94 @@
+"""
+头像规格化
+上传头像后在图片进程池中居中裁剪并生成 48 / 96 / 256 像素的 WebP，
+保存在固定路径 avatars/r/<用户ID>/<尺寸>.webp，URL 附带 ?v=<版本号>：
+路径对每个用户固定、每次上传头像版本号递增，浏览器和 CDN 可以长期缓存。
+
+avatar_version 在上传时递增，avatar_rendered_version 记录规格图对应的版本；
+两者不一致（规格图尚未生成，或使用默认头像）时回退到原图。
+"""
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from shopping.image_variants import get_executor
+from shopping.imaging import render_square_renditions
+
+from .authentication import invalidate_principal_ids
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+AVATAR_SIZES = (48, 96, 256)
+SMALL_AVATAR_SIZE = 48  # 评论、帖子等作者信息中使用
+
+
+def rendition_name(user_id, size):
+    return f'avatars/r/{user_id}/{size}.webp'
+
+
+def store_renditions(user_id, version, renditions):
+    """保存规格图并标记为已生成；头像在处理期间被再次替换时放弃"""
+    if not User.objects.filter(id=user_id, avatar_version=version).exists():
+        return False
+    for size, data in renditions.items():
+        name = rendition_name(user_id, size)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(data))
+    User.objects.filter(id=user_id, avatar_version=version).update(avatar_rendered_version=version)
+    # update() 不触发 post_save，缓存的用户对象中仍是旧的规格图版本
+    invalidate_principal_ids([user_id])
+    return True
+
+
+def generate_renditions(user):
+    """在当前进程中同步生成（回填命令、未启用进程池时使用）"""
+    renditions = render_square_renditions(user.avatar.path, AVATAR_SIZES)
+    return store_renditions(user.id, user.avatar_version, renditions)
+
+
+def _on_rendered(user_id, version, future):
+    try:
+        store_renditions(user_id, version, future.result())
+    except Exception:
+        logger.exception('生成头像规格图失败: %s', user_id)
+    finally:
+        close_old_connections()
+
+
+def submit_renditions(user):
+    if not settings.IMAGE_PROCESS_WORKERS:
+        try:
+            generate_renditions(user)
+        except Exception:
+            logger.exception('生成头像规格图失败: %s', user.id)
+        return
+    future = get_executor().submit(render_square_renditions, user.avatar.path, AVATAR_SIZES)
+    future.add_done_callback(
+        lambda f, user_id=user.id, version=user.avatar_version: _on_rendered(user_id, version, f)
+    )
+
+
+def schedule_renditions(user):
+    """事务提交后在后台生成，上传接口不等待图片处理"""
+    transaction.on_commit(lambda: submit_renditions(user))
+
+
+def avatar_url(user, size=SMALL_AVATAR_SIZE, request=None):
+    """指定尺寸的头像 URL；没有规格图时返回原图 URL，没有头像时返回 None"""
+    if user.avatar_version and user.avatar_rendered_version == user.avatar_version:
+        url = f'{default_storage.url(rendition_name(user.id, size))}?v={user.avatar_version}'
+    elif user.avatar:
+        url = user.avatar.url
+    else:
+        return None
+    return request.build_absolute_uri(url) if request else url
+
+
+def avatar_urls(user, request=None):
+    """全部尺寸的头像 URL：{'48': url, '96': url, '256': url}"""
+    return {str(size): avatar_url(user, size, request) for size in AVATAR_SIZES}
@@ -0,0 +1,40 @@
+"""
+用户权益（已购商品）缓存
+受保护资源（如已购音乐）的鉴权只需要知道"用户拥有哪些 SPU"，
+按用户缓存 SPU ID 集合，UserProduct 变化时在事务提交后清除。
+缓存不是多进程共享的（LocMem）时不缓存：其他进程中的清除到不了，退款后仍可能判定为已购买。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from backend.shared_cache import is_shared_cache
+
+from .models import UserProduct
+
+
+def _cache_key(user_id):
+    return f'entitlements:{user_id}'
+
+
+def owned_spu_ids(user_id):
+    """用户已购买的 SPU ID 集合（缓存）"""
+    use_cache = is_shared_cache()
+    key = _cache_key(user_id)
+    spu_ids = cache.get(key) if use_cache else None
+    if spu_ids is None:
+        spu_ids = list(
+            UserProduct.objects.filter(user_id=user_id).values_list('sku__spu_id', flat=True).distinct()
+        )
+        if use_cache:
+            cache.set(key, spu_ids, settings.ENTITLEMENT_CACHE_SECONDS)
+    return frozenset(spu_ids)
+
+
+def owns_product(user_id, spu_id):
+    return spu_id is not None and spu_id in owned_spu_ids(user_id)
+
+
+def invalidate_entitlements(user_id):
+    """事务提交后清除缓存，避免并发请求在提交前把旧数据写回缓存"""
+    transaction.on_commit(lambda: cache.delete(_cache_key(user_id)))
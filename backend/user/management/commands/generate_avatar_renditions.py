@@ -0,0 +1,49 @@
+"""
+为已有头像生成 48/96/256 像素规格图（多进程并行）
+用法:
+    python manage.py generate_avatar_renditions          # 只处理还没有规格图的用户
+    python manage.py generate_avatar_renditions --all    # 全部重新生成
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db.models import F
+from django.core.management.base import BaseCommand
+
+from shopping.imaging import render_square_renditions
+from user.avatars import AVATAR_SIZES, store_renditions
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = '为已有头像生成固定尺寸规格图'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新生成全部用户的规格图')
+        parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核数')
+
+    def handle(self, *args, **options):
+        queryset = User.objects.exclude(avatar='').exclude(avatar__isnull=True).exclude(
+            avatar=User._meta.get_field('avatar').default
+        )
+        if not options['all']:
+            queryset = queryset.exclude(avatar_version__gt=0, avatar_rendered_version=F('avatar_version'))
+
+        # 从未上传过新头像的用户版本号为 0，先分配版本号
+        queryset.filter(avatar_version=0).update(avatar_version=1)
+        users = list(queryset.only('id', 'avatar', 'avatar_version'))
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [
+                (user, executor.submit(render_square_renditions, user.avatar.path, AVATAR_SIZES))
+                for user in users
+            ]
+            for user, future in futures:
+                try:
+                    store_renditions(user.id, user.avatar_version, future.result())
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'用户 {user.id}（{user.avatar.name}）处理失败: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'头像规格图生成完成，成功 {done} 个，失败 {failed} 个'))
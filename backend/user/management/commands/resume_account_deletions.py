@@ -0,0 +1,34 @@
+"""
+继续执行未完成的账户注销任务
+进程重启等原因中断的任务（等待中，或执行中但超过 ACCOUNT_DELETION_STALE_SECONDS 没有进展）
+从记录的步骤继续执行。可由定时任务周期性运行。
+用法:
+    python manage.py resume_account_deletions
+    python manage.py resume_account_deletions --retry-failed   # 同时重试失败的任务
+"""
+from django.core.management.base import BaseCommand
+
+from user.account_deletion import resumable_jobs, run_deletion
+
+
+class Command(BaseCommand):
+    help = '继续执行中断的账户注销任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='同时重试失败的任务')
+
+    def handle(self, *args, **options):
+        retry_failed = options['retry_failed']
+        job_ids = list(resumable_jobs(retry_failed).order_by('created_at').values_list('id', flat=True))
+        completed = failed = 0
+        for job_id in job_ids:
+            try:
+                job = run_deletion(job_id, retry_failed=retry_failed)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'任务 {job_id} 失败: {e}')
+                continue
+            if job is not None:
+                completed += 1
+                self.stdout.write(f'{job.username}: {job.deleted_counts}')
+        self.stdout.write(self.style.SUCCESS(f'完成 {completed} 个任务，失败 {failed} 个'))
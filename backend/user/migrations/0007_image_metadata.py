@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_alter_productfavorite_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_blurhash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='头像占位图'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_dominant_color',
+            field=models.CharField(blank=True, max_length=7, verbose_name='头像主色'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='头像高度'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='头像宽度'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0007_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_rendered_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='头像规格图版本'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='头像版本'),
+        ),
+    ]
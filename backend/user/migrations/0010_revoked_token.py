@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0009_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=255, unique=True, verbose_name='令牌ID')),
+                ('expires_at', models.DateTimeField(verbose_name='令牌过期时间')),
+                ('revoked_at', models.DateTimeField(auto_now_add=True, verbose_name='吊销时间')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='revoked_tokens', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '已吊销令牌',
+                'verbose_name_plural': '已吊销令牌',
+                'indexes': [models.Index(fields=['expires_at'], name='user_revoke_expires_3ed6ae_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0010_revoked_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_id', models.PositiveBigIntegerField(unique=True, verbose_name='用户ID')),
+                ('username', models.CharField(max_length=150, verbose_name='用户名')),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '执行中'), ('completed', '已完成'), ('failed', '失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('step', models.CharField(blank=True, max_length=30, verbose_name='当前步骤')),
+                ('deleted_counts', models.JSONField(blank=True, default=dict, verbose_name='已删除数量')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='执行次数')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='提交时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+            ],
+            options={
+                'verbose_name': '账户注销任务',
+                'verbose_name_plural': '账户注销任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='user_accoun_status_9b0934_idx')],
+            },
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.conf import settings
 
 from django.db import models
 
+from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import AbstractUser
 
 # Create your models here.
@@ -35,12 +36,26 @@ class User(AbstractUser):
         verbose_name='头像'
     )
 
+    # 头像元数据，上传后由 shopping.image_metadata 异步计算
+    avatar_width = models.PositiveIntegerField(null=True, blank=True, verbose_name='头像宽度')
+    avatar_height = models.PositiveIntegerField(null=True, blank=True, verbose_name='头像高度')
+    avatar_dominant_color = models.CharField(max_length=7, blank=True, verbose_name='头像主色')
+    avatar_blurhash = models.CharField(max_length=64, blank=True, verbose_name='头像占位图')
+    avatar_metadata_failed = models.BooleanField(default=False, verbose_name='头像元数据计算失败')
+
+    # 头像规格图（48/96/256px）版本，见 user.avatars
+    avatar_version = models.PositiveIntegerField(default=0, verbose_name='头像版本')
+    avatar_rendered_version = models.PositiveIntegerField(default=0, verbose_name='头像规格图版本')
+
     bio = models.TextField(
         max_length=500,
         blank=True,
         verbose_name='个人简介'
     )
 
+    # 令牌版本，签发 JWT 时写入 ver 声明；修改密码时递增，使已签发的令牌失效（见 user.authentication）
+    token_version = models.PositiveIntegerField(default=0, verbose_name='令牌版本')
+
 
     # 重写继承字段，避免与 auth.User 冲突（user_set）
     groups = models.ManyToManyField(
@@ -71,6 +86,22 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
     
+    def set_password(self, raw_password):
+        # 修改密码时令牌版本递增，旧令牌全部失效。check_password 在哈希算法升级（如迭代次数变化）时
+        # 会以同一密码调用本方法并只保存 password 字段，此时密码没有变化，不能递增版本
+        changed = self.pk is not None and not check_password(raw_password, self.password)
+        super().set_password(raw_password)
+        if changed:
+            self._previous_token_version = self.token_version
+            self.token_version += 1
+
+    def save(self, *args, **kwargs):
+        # 修改密码后只保存 password 字段时，一并保存递增后的令牌版本
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'password' in update_fields and hasattr(self, '_previous_token_version'):
+            kwargs['update_fields'] = {*update_fields, 'token_version'}
+        super().save(*args, **kwargs)
+
     # 获取头像完整 URL
     def get_avatar_url(self):
         """获取头像 URL"""
@@ -78,6 +109,31 @@ class User(AbstractUser):
             return self.avatar.url
         return f"{settings.MEDIA_URL}avatars/default.png"
 
+    @classmethod
+    def media_file_names(cls):
+        """头像规格图不在 FileField 中，供孤儿文件回收（collect_orphan_media）识别"""
+        from .avatars import AVATAR_SIZES, rendition_name
+        for user_id in cls.objects.filter(avatar_rendered_version__gt=0).values_list('id', flat=True).iterator(chunk_size=5000):
+            for size in AVATAR_SIZES:
+                yield rendition_name(user_id, size)
+
+class RevokedToken(models.Model):
+    """已吊销的 JWT（按 jti 记录），过期后由 user.revocation 自动清理"""
+    jti = models.CharField(max_length=255, unique=True, verbose_name='令牌ID')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='revoked_tokens', verbose_name='用户')
+    expires_at = models.DateTimeField(verbose_name='令牌过期时间')
+    revoked_at = models.DateTimeField(auto_now_add=True, verbose_name='吊销时间')
+
+    class Meta:
+        verbose_name = '已吊销令牌'
+        verbose_name_plural = '已吊销令牌'
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return self.jti
+
 class UserProduct(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_products', verbose_name='用户')
     sku = models.ForeignKey('shopping.ProductSKU', on_delete=models.CASCADE, verbose_name='SKU')
@@ -157,4 +213,40 @@ class PostFavorite(models.Model):
         unique_together = ('user', 'post')  # 防止重复收藏
 
     def __str__(self):
-        return f"{self.user} 收藏了 {self.post}"
\ No newline at end of file
+        return f"{self.user} 收藏了 {self.post}"
+
+class AccountDeletion(models.Model):
+    """
+    账户注销任务
+    提交注销后账户立即停用，关联数据由后台任务按表分批删除（见 account_deletion.py）；
+    step 记录当前步骤，任务中断后从该步骤继续
+    """
+    STATUS_CHOICES = [
+        ('pending', '等待中'),
+        ('running', '执行中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    # 不使用外键：任务最后一步删除用户本身，记录需要保留
+    account_id = models.PositiveBigIntegerField(unique=True, verbose_name='用户ID')
+    username = models.CharField(max_length=150, verbose_name='用户名')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
+    step = models.CharField(max_length=30, blank=True, verbose_name='当前步骤')
+    deleted_counts = models.JSONField(default=dict, blank=True, verbose_name='已删除数量')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='执行次数')
+    error = models.TextField(blank=True, verbose_name='错误信息')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='提交时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+
+    class Meta:
+        verbose_name = '账户注销任务'
+        verbose_name_plural = '账户注销任务'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.username} ({self.get_status_display()})"
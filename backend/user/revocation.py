@@ -0,0 +1,169 @@
+"""
+JWT 吊销
+已吊销令牌的 jti 保存在 RevokedToken 表中（刷新令牌轮换、退出登录时写入）。
+每个请求都查表代价太高，因此每个进程维护一个布隆过滤器：
+
+- 过滤器判定"不在集合中"时一定未吊销，直接放行（绝大多数请求），不访问数据库
+- 判定"可能在集合中"时再查表确认，排除误判
+- 增量刷新：每次吊销提交后递增缓存中的序号，进程每隔 TOKEN_REVOCATION_REFRESH_SECONDS 比较一次，
+  序号变化时只加载 ID 大于已加载最大 ID 的记录（向前重叠一段，兼容事务乱序提交）
+- 自动压缩：写入吊销记录时，每隔 TOKEN_REVOCATION_COMPACT_SECONDS（跨进程只由一个进程执行）
+  删除已过期的记录，并递增代数，各进程发现代数变化后重建过滤器（布隆过滤器无法删除元素）
+- 缓存不是多进程共享的（LocMem）时看不到其他进程递增的序号，每个同步周期都做一次增量加载
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from backend.shared_cache import is_shared_cache
+
+from .models import RevokedToken
+
+SEQUENCE_KEY = 'auth:revocation:sequence'
+GENERATION_KEY = 'auth:revocation:generation'
+COMPACT_LOCK_KEY = 'auth:revocation:compact_lock'
+
+BLOOM_FALSE_POSITIVE_RATE = 0.001
+# 增量加载时向前重叠的 ID 数：ID 较小的事务可能晚于 ID 较大的事务提交
+RELOAD_OVERLAP = 100
+
+
+class BloomFilter:
+    """按容量和误判率确定位数组大小和哈希次数；用 blake2b 摘要做双重哈希"""
+
+    def __init__(self, capacity, error_rate=BLOOM_FALSE_POSITIVE_RATE):
+        self.capacity = capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class _RevocationIndex:
+    """进程内的布隆过滤器及其同步状态"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.last_id = 0
+        self.generation = None
+        self.sequence = None
+        self.checked_at = 0.0
+
+    def _rebuild(self, generation):
+        rows = RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list('id', 'jti')
+        count = rows.count()
+        self.bloom = BloomFilter(max(settings.TOKEN_REVOCATION_BLOOM_CAPACITY, count * 2))
+        self.last_id = 0
+        for row_id, jti in rows.iterator(chunk_size=5000):
+            self.bloom.add(jti)
+            self.last_id = max(self.last_id, row_id)
+        self.generation = generation
+
+    def _load_new(self):
+        rows = RevokedToken.objects.filter(id__gt=self.last_id - RELOAD_OVERLAP).values_list('id', 'jti')
+        for row_id, jti in rows:
+            if jti not in self.bloom:
+                self.bloom.add(jti)
+            self.last_id = max(self.last_id, row_id)
+        # 超过容量后误判率上升，按更大的容量重建
+        if self.bloom.count > self.bloom.capacity:
+            self._rebuild(self.generation)
+
+    def sync(self):
+        now = time.monotonic()
+        if self.bloom is not None and now - self.checked_at < settings.TOKEN_REVOCATION_REFRESH_SECONDS:
+            return
+        with self.lock:
+            if self.bloom is not None and now - self.checked_at < settings.TOKEN_REVOCATION_REFRESH_SECONDS:
+                return
+            state = cache.get_many([GENERATION_KEY, SEQUENCE_KEY])
+            generation = state.get(GENERATION_KEY, 0)
+            sequence = state.get(SEQUENCE_KEY)
+            if self.bloom is None or generation != self.generation:
+                self._rebuild(generation)
+            elif sequence is None or sequence != self.sequence or not is_shared_cache():
+                # 缓存被清空时无法判断，保守地做一次增量加载
+                self._load_new()
+            self.sequence = sequence
+            self.checked_at = now
+
+    def add_local(self, jti):
+        if self.bloom is not None:
+            with self.lock:
+                self.bloom.add(jti)
+
+
+_index = _RevocationIndex()
+
+
+def is_revoked(jti):
+    """布隆过滤器判定未吊销时直接返回 False，可能吊销时查表确认"""
+    _index.sync()
+    if jti not in _index.bloom:
+        return False
+    return RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+
+
+def revoke_token(token, user=None):
+    """
+    吊销令牌（simplejwt Token 对象），返回本次是否新吊销；已吊销时返回 False。
+    jti 有唯一约束，并发吊销同一令牌时只有一个调用返回 True
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    _, created = RevokedToken.objects.get_or_create(
+        jti=jti, defaults={'expires_at': expires_at, 'user': user},
+    )
+    if created:
+        _index.add_local(jti)
+        transaction.on_commit(_bump_sequence)
+        maybe_compact()
+    return created
+
+
+def _bump_sequence():
+    """通知其他进程有新的吊销记录"""
+    try:
+        cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        cache.set(SEQUENCE_KEY, int(time.time()), None)
+
+
+def compact():
+    """删除已过期的吊销记录并通知各进程重建过滤器，返回删除数量"""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    if deleted:
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, int(time.time()), None)
+    return deleted
+
+
+def maybe_compact():
+    """每个压缩周期内只有一个进程（抢到缓存锁的）执行压缩"""
+    if cache.add(COMPACT_LOCK_KEY, 1, settings.TOKEN_REVOCATION_COMPACT_SECONDS):
+        transaction.on_commit(compact)
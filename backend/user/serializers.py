@@ -4,7 +4,11 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth import authenticate
 
 from .models import PostFavorite, ProductFavorite, CartItem, Address
-from forum.serializers import PostSerializer
+from forum.serializers import PostSerializer, PostCardSerializer
+from shopping.serializers import ProductCardSerializer
+from shopping.image_metadata import image_meta
+from shopping.image_variants import variant_urls
+from .avatars import avatar_urls
 
 User = get_user_model()  # 获取自定义的 User 模型
 
@@ -73,10 +77,12 @@ class LoginSerializer(serializers.Serializer):
 # 用户信息序列化器（用于返回完整用户信息）
 class UserSerializer(serializers.ModelSerializer):
     avatar = serializers.SerializerMethodField()
+    avatar_meta = serializers.SerializerMethodField()  # 头像宽高、主色、blurhash
+    avatar_renditions = serializers.SerializerMethodField()  # 48/96/256px 规格图
     
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'bio', 'gender', 'avatar', 'date_joined', 'is_superuser', 'is_staff']
+        fields = ['id', 'username', 'email', 'bio', 'gender', 'avatar', 'avatar_meta', 'avatar_renditions', 'date_joined', 'is_superuser', 'is_staff']
         read_only_fields = ['id', 'date_joined']
     
     def get_avatar(self, obj):
@@ -87,6 +93,12 @@ class UserSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.avatar.url)
             return obj.avatar.url
         return None
+
+    def get_avatar_meta(self, obj):
+        return image_meta(obj, prefix='avatar_')
+
+    def get_avatar_renditions(self, obj):
+        return avatar_urls(obj, self.context.get('request'))
     
 class PostFavoriteSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
@@ -119,6 +131,28 @@ class ProductFavoriteSerializer(serializers.ModelSerializer):
         return ProductSPUSerializer(obj.product, context={'request': request}).data
 
 
+class PostFavoriteCardSerializer(serializers.ModelSerializer):
+    """帖子收藏卡片序列化器（?view=card），不展开回复树"""
+    user = serializers.StringRelatedField(read_only=True)
+    post = PostCardSerializer(read_only=True)
+
+    class Meta:
+        model = PostFavorite
+        fields = ['id', 'user', 'post']
+        read_only_fields = ['user']
+
+
+class ProductFavoriteCardSerializer(serializers.ModelSerializer):
+    """商品收藏卡片序列化器（?view=card），不再重复查询收藏状态和评论数"""
+    user = serializers.StringRelatedField(read_only=True)
+    product = ProductCardSerializer(read_only=True)
+
+    class Meta:
+        model = ProductFavorite
+        fields = ['id', 'user', 'product', 'created_at']
+        read_only_fields = ['user', 'created_at']
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     sku = serializers.SerializerMethodField()
@@ -144,6 +178,7 @@ class CartItemSerializer(serializers.ModelSerializer):
             image_url = request.build_absolute_uri(spu_main_image.image.url) if request else spu_main_image.image.url
         else:
             image_url = None
+        image = sku_image or spu_main_image
         
         # 获取库存信息
         inventory = getattr(sku, 'inventory', None)
@@ -159,6 +194,8 @@ class CartItemSerializer(serializers.ModelSerializer):
             'stock': stock,
             'is_active': is_active,
             'image': image_url,
+            'image_variants': variant_urls(image, request) if image else None,
+            'image_meta': image_meta(image) if image else None,
             'spu_name': sku.spu.name,
             'spu_id': sku.spu.id
         }
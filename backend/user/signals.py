@@ -0,0 +1,40 @@
+"""
+用户信号处理
+- 上传新头像后，在后台生成固定尺寸的规格图
+- 已购商品变化后，清除用户权益缓存
+- 用户保存或删除后，清除 JWT 认证的用户缓存
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_principal
+from .avatars import schedule_renditions
+from .entitlements import invalidate_entitlements
+from .models import User, UserProduct
+
+
+@receiver(pre_save, sender=User)
+def bump_avatar_version(sender, instance, **kwargs):
+    # 新上传（尚未提交到存储）的头像，版本号递增，旧规格图随之失效
+    if instance.avatar and not instance.avatar._committed:
+        instance.avatar_version += 1
+        instance._avatar_uploaded = True
+
+
+@receiver(post_save, sender=User)
+def generate_avatar_renditions(sender, instance, **kwargs):
+    if getattr(instance, '_avatar_uploaded', False):
+        instance._avatar_uploaded = False
+        schedule_renditions(instance)
+
+
+@receiver(post_save, sender=UserProduct)
+@receiver(post_delete, sender=UserProduct)
+def clear_entitlement_cache(sender, instance, **kwargs):
+    invalidate_entitlements(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def clear_principal_cache(sender, instance, **kwargs):
+    invalidate_principal(instance)
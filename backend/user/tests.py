@@ -1,3 +1,446 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from forum.models import Image as ForumImage, Post, Reply
+
+from .account_deletion import DELETION_STEPS, resumable_jobs, run_deletion
+from .avatars import AVATAR_SIZES, avatar_url, rendition_name, store_renditions
+from .authentication import TOKEN_VERSION_CLAIM, invalidate_principal_ids, principal_cache_key, tokens_for_user
+from .models import AccountDeletion, PostFavorite, RevokedToken, User
+from .revocation import BloomFilter, compact, is_revoked, revoke_token
+
+
+# ==================== 布隆过滤器 ====================
+
+class BloomFilterTests(SimpleTestCase):
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        values = [f'jti-{i}' for i in range(1000)]
+        for value in values:
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in values))
+        self.assertEqual(bloom.count, 1000)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(1000)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        # 设计误判率 0.1%，留出余量
+        self.assertLess(false_positives, 50)
+
+    def test_empty_filter(self):
+        self.assertNotIn('jti', BloomFilter(10))
+
+
+# ==================== 令牌吊销 ====================
+
+@override_settings(TOKEN_REVOCATION_REFRESH_SECONDS=0)
+class RevocationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('u1', 'u1@example.com', 'pw123456')
+
+    def test_round_trip(self):
+        refresh = tokens_for_user(self.user)
+        jti = refresh['jti']
+        self.assertFalse(is_revoked(jti))
+        self.assertTrue(revoke_token(refresh, self.user))
+        self.assertTrue(is_revoked(jti))
+        self.assertFalse(is_revoked(tokens_for_user(self.user)['jti']))
+
+    def test_revoke_twice(self):
+        refresh = tokens_for_user(self.user)
+        self.assertTrue(revoke_token(refresh, self.user))
+        self.assertFalse(revoke_token(refresh, self.user))
+        self.assertEqual(RevokedToken.objects.filter(jti=refresh['jti']).count(), 1)
+
+    def test_sees_revocations_from_other_processes(self):
+        # 其他进程写入的吊销记录（不经过本进程的过滤器）
+        is_revoked('warm-up')
+        RevokedToken.objects.create(jti='remote', expires_at=timezone.now() + timedelta(hours=1))
+        self.assertTrue(is_revoked('remote'))
+
+    def test_expired_records_compacted(self):
+        RevokedToken.objects.create(jti='expired', expires_at=timezone.now() - timedelta(seconds=1))
+        RevokedToken.objects.create(jti='active', expires_at=timezone.now() + timedelta(hours=1))
+        self.assertFalse(is_revoked('expired'))
+        self.assertEqual(compact(), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['active'])
+        self.assertTrue(is_revoked('active'))
+
+
+# ==================== 令牌刷新与失效 ====================
+
+class TokenLifecycleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('u1', 'u1@example.com', 'pw123456')
+        self.refresh = tokens_for_user(self.user)
+
+    def get_cart(self, access):
+        return self.client.get('/api/cart/', HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def refresh_token(self, refresh):
+        return self.client.post('/api/token/refresh/', {'refresh': str(refresh)}, content_type='application/json')
+
+    def test_refresh_rotation_is_single_use(self):
+        response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(RefreshToken(response.data['refresh'])[TOKEN_VERSION_CLAIM], self.user.token_version)
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+    def test_concurrent_refresh_only_one_wins(self):
+        # 两个请求都通过了吊销检查，吊销记录的插入决定哪个成功
+        with mock.patch('user.views.is_revoked', return_value=False):
+            self.assertEqual(self.refresh_token(self.refresh).status_code, 200)
+            self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+    def test_logout_revokes_tokens(self):
+        access = self.refresh.access_token
+        response = self.client.post('/api/logout/', {'refresh': str(self.refresh)},
+                                    content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_cart(access).status_code, 401)
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+    def assert_password_change_invalidates_tokens(self):
+        access = self.refresh.access_token
+        self.assertEqual(self.get_cart(access).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('new-password')
+            self.user.save()
+        self.assertEqual(self.get_cart(access).status_code, 401)
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+        self.assertEqual(self.get_cart(tokens_for_user(self.user).access_token).status_code, 200)
+
+    def test_set_password_invalidates_tokens(self):
+        self.assert_password_change_invalidates_tokens()
+
+    def test_set_password_invalidates_cached_principal(self):
+        with mock.patch('user.authentication.is_shared_cache', return_value=True):
+            self.assert_password_change_invalidates_tokens()
+
+    def test_principal_cache_cleared_on_commit(self):
+        with mock.patch('user.authentication.is_shared_cache', return_value=True):
+            self.assertEqual(self.get_cart(self.refresh.access_token).status_code, 200)
+        key = principal_cache_key(self.user.id, 0)
+        self.assertIsNotNone(cache.get(key))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.bio = 'changed'
+            self.user.save(update_fields=['bio'])
+        # 提交前不清除（回滚时缓存仍然有效）
+        self.assertIsNotNone(cache.get(key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(key))
+
+    def test_principal_not_cached_in_process_local_cache(self):
+        access = self.refresh.access_token
+        self.assertEqual(self.get_cart(access).status_code, 200)
+        # 不触发信号的更新（如其他进程中的修改）也能立即生效
+        User.objects.filter(id=self.user.id).update(token_version=self.user.token_version + 1)
+        self.assertEqual(self.get_cart(access).status_code, 401)
+
+    def test_password_saved_with_update_fields_bumps_version(self):
+        access = self.refresh.access_token
+        self.user.set_password('new-password')
+        self.user.save(update_fields=['password'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.token_version, 1)
+        self.assertEqual(self.get_cart(access).status_code, 401)
+
+    def test_setting_same_password_keeps_tokens(self):
+        self.user.set_password('pw123456')
+        self.user.save()
+        self.assertEqual(self.user.token_version, 0)
+        self.assertEqual(self.get_cart(self.refresh.access_token).status_code, 200)
+
+
+# ==================== 认证用户缓存 ====================
+
+@mock.patch('user.authentication.is_shared_cache', return_value=True)
+class PrincipalCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('u1', 'u1@example.com', 'pw123456')
+        self.access = tokens_for_user(self.user).access_token
+
+    def get_cart(self, access=None):
+        return self.client.get('/api/cart/', HTTP_AUTHORIZATION=f'Bearer {access or self.access}')
+
+    def user_queries(self):
+        """请求中查询用户表的次数"""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_cart().status_code, 200)
+        table = f'FROM {connection.ops.quote_name(User._meta.db_table)}'
+        return sum(table in query['sql'] for query in queries)
+
+    def test_cached_principal_skips_user_query(self, _):
+        self.assertEqual(self.user_queries(), 1)
+        self.assertEqual(self.user_queries(), 0)
+
+    def test_deactivated_user_rejected_after_commit(self, _):
+        self.get_cart()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get_cart().status_code, 401)
+
+    def test_deleted_user_rejected(self, _):
+        self.get_cart()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertEqual(self.get_cart().status_code, 401)
+
+    def test_queryset_update_invalidated_explicitly(self, _):
+        self.get_cart()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(id=self.user.id).update(bio='changed')
+            invalidate_principal_ids([self.user.id])
+        self.assertEqual(self.user_queries(), 1)
+
+    def test_token_without_version_claim(self, _):
+        access = RefreshToken.for_user(self.user).access_token
+        self.assertNotIn(TOKEN_VERSION_CLAIM, access)
+        self.assertEqual(self.get_cart(access).status_code, 200)
+        User.objects.filter(id=self.user.id).update(token_version=1)
+        cache.clear()
+        self.assertEqual(self.get_cart(access).status_code, 401)
+
+
+# ==================== 密码哈希升级 ====================
+
+class LegacyPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = 1000
+
+
+class UpgradedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = 2000
+
+
+@override_settings(PASSWORD_HASHERS=['user.tests.LegacyPBKDF2PasswordHasher'])
+class PasswordHashUpgradeTests(TestCase):
+
+    def test_hash_upgrade_on_login_keeps_token_version(self):
+        cache.clear()
+        user = User.objects.create_user('u1', 'u1@example.com', 'pw123456')
+        with override_settings(PASSWORD_HASHERS=['user.tests.UpgradedPBKDF2PasswordHasher']):
+            response = self.client.post('/api/login/', {'username': 'u1', 'password': 'pw123456'},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            user.refresh_from_db()
+            self.assertIn('$2000$', user.password)
+            self.assertEqual(user.token_version, 0)
+            self.assertEqual(RefreshToken(response.data['refresh'])[TOKEN_VERSION_CLAIM], 0)
+            cart = self.client.get('/api/cart/', HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+            self.assertEqual(cart.status_code, 200)
+
+
+# ==================== 头像规格图 ====================
+
+def image_upload(name='me.png', size=(300, 200)):
+    output = io.BytesIO()
+    Image.new('RGB', size, (0, 128, 0)).save(output, format='PNG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/png')
+
+
+@override_settings(IMAGE_PROCESS_WORKERS=0)
+class AvatarRenditionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user('u1', 'u1@example.com', 'pw123456')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {tokens_for_user(self.user).access_token}'}
+
+    def upload(self, name='me.png'):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/upload-avatar/', {'avatar': image_upload(name)}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        return response
+
+    def test_default_avatar_uses_original(self):
+        self.assertEqual(avatar_url(self.user), f'{settings.MEDIA_URL}avatars/default.png')
+        self.assertEqual(list(User.media_file_names()), [])
+
+    def test_upload_generates_square_renditions(self):
+        self.upload()
+        self.assertEqual((self.user.avatar_version, self.user.avatar_rendered_version), (1, 1))
+        for size in AVATAR_SIZES:
+            with default_storage.open(rendition_name(self.user.id, size)) as f, Image.open(f) as image:
+                self.assertEqual((image.format, image.size), ('WEBP', (size, size)))
+        self.assertEqual(avatar_url(self.user, 96), f'{settings.MEDIA_URL}avatars/r/{self.user.id}/96.webp?v=1')
+        self.assertEqual(len(list(User.media_file_names())), len(AVATAR_SIZES))
+
+    def test_reupload_bumps_version_and_removes_old_original(self):
+        self.upload()
+        first = self.user.avatar.name
+        response = self.upload('new.png')
+        self.assertEqual((self.user.avatar_version, self.user.avatar_rendered_version), (2, 2))
+        self.assertFalse(default_storage.exists(first))
+        self.assertTrue(avatar_url(self.user).endswith('/48.webp?v=2'))
+        # 响应在规格图生成之前返回，此时回退到新的原图
+        self.assertTrue(response.json()['user']['avatar_renditions']['48'].endswith(self.user.avatar.url))
+
+    def test_stale_renditions_discarded(self):
+        self.upload()
+        self.assertFalse(store_renditions(self.user.id, 0, {48: b'stale'}))
+        self.assertEqual(self.user.avatar_rendered_version, 1)
+
+    def test_renditions_pending_fall_back_to_original(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post('/api/upload-avatar/', {'avatar': image_upload()}, **self.auth)
+        self.user.refresh_from_db()
+        self.assertEqual(avatar_url(self.user), self.user.avatar.url)
+
+    def test_command_renders_legacy_avatars(self):
+        name = default_storage.save('avatars/legacy.png', ContentFile(image_upload().read()))
+        User.objects.filter(id=self.user.id).update(avatar=name)
+        call_command('generate_avatar_renditions', workers=1, stdout=io.StringIO())
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.avatar_version, self.user.avatar_rendered_version), (1, 1))
+        self.assertTrue(default_storage.exists(rendition_name(self.user.id, 256)))
+
+
+# ==================== 账户注销 ====================
+
+@override_settings(IMAGE_PROCESS_WORKERS=0, ACCOUNT_DELETION_BACKGROUND=False, ACCOUNT_DELETION_BATCH_SIZE=2)
+class AccountDeletionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user('u1', 'u1@example.com', 'pw123456')
+        self.other = User.objects.create_user('u2', 'u2@example.com', 'pw123456')
+        self.other_post = Post.objects.create(title='other', content='c', author=self.other)
+        posts = [Post.objects.create(title=f't{i}', content='c', author=self.user) for i in range(3)]
+        for post in posts + [self.other_post]:
+            PostFavorite.objects.create(user=self.user, post=post)
+        for i in range(5):
+            Reply.objects.create(post=self.other_post, author=self.user, content=f'r{i}')
+        Reply.objects.create(post=self.other_post, author=self.other, content='kept')
+        Post.objects.filter(id=self.other_post.id).update(reply_count=6)
+
+        self.own_image = self.forum_image('own.png')
+        self.shared_image = self.forum_image('shared.png')
+        posts[0].images.add(self.own_image, self.shared_image)
+        self.other_post.images.add(self.shared_image)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/upload-avatar/', {'avatar': image_upload()}, **self.auth())
+        self.user.refresh_from_db()
+
+    def auth(self):
+        return {'HTTP_AUTHORIZATION': f'Bearer {tokens_for_user(self.user).access_token}'}
+
+    def forum_image(self, name):
+        image = ForumImage(file=f'posts/images/{name}')
+        default_storage.save(image.file.name, ContentFile(b'image'))
+        image.save()
+        return image
+
+    def request_deletion(self, execute=True):
+        with self.captureOnCommitCallbacks(execute=execute):
+            response = self.client.delete('/api/delete-account/', {'password': 'pw123456'},
+                                          content_type='application/json', **self.auth())
+        self.assertEqual(response.status_code, 202)
+        return AccountDeletion.objects.get(id=response.json()['job_id'])
+
+    def test_account_disabled_before_deletion_runs(self):
+        access = tokens_for_user(self.user).access_token
+        job = self.request_deletion(execute=False)
+        self.assertEqual(job.status, 'pending')
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        response = self.client.get('/api/cart/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, 401)
+
+    def test_wrong_password(self):
+        response = self.client.delete('/api/delete-account/', {'password': 'wrong'},
+                                      content_type='application/json', **self.auth())
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(AccountDeletion.objects.exists())
+
+    def test_deletes_records_and_files_in_batches(self):
+        avatar = self.user.avatar.name
+        job = self.request_deletion()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.deleted_counts, {
+            'post_favorites': 4, 'replies': 5, 'posts': 3, 'account': 1,
+        })
+        self.assertFalse(User.objects.filter(id=self.user.id).exists())
+
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.other_post.reply_count, 1)
+        self.assertFalse(ForumImage.objects.filter(id=self.own_image.id).exists())
+        self.assertFalse(default_storage.exists(self.own_image.file.name))
+        self.assertTrue(default_storage.exists(self.shared_image.file.name))
+        self.assertFalse(default_storage.exists(avatar))
+        self.assertFalse(default_storage.exists(rendition_name(job.account_id, 48)))
+
+    def test_interrupted_job_resumes_from_recorded_step(self):
+        replies = next(step for step in DELETION_STEPS if step.name == 'replies')
+        original = replies.delete_batch
+        calls = []
+
+        def fail_second_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            return original(*args)
+
+        with mock.patch.object(replies, 'delete_batch', side_effect=fail_second_batch):
+            with self.assertRaises(RuntimeError):
+                self.request_deletion()
+        job = AccountDeletion.objects.get()
+        self.assertEqual((job.status, job.step, job.error), ('failed', 'replies', 'connection lost'))
+        self.assertEqual(job.deleted_counts, {'post_favorites': 4, 'replies': 2})
+
+        self.assertFalse(resumable_jobs().exists())
+        call_command('resume_account_deletions', '--retry-failed', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('completed', 2))
+        self.assertEqual(job.deleted_counts['replies'], 5)
+        self.assertFalse(User.objects.filter(id=self.user.id).exists())
+
+    def test_running_job_not_claimed_twice(self):
+        job = self.request_deletion(execute=False)
+        AccountDeletion.objects.filter(id=job.id).update(status='running')
+        self.assertIsNone(run_deletion(job.id))
+        stale = timezone.now() - timedelta(seconds=settings.ACCOUNT_DELETION_STALE_SECONDS + 1)
+        AccountDeletion.objects.filter(id=job.id).update(updated_at=stale)
+        self.assertEqual(run_deletion(job.id).status, 'completed')
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from .views import (
-    RegisterView, LoginView, PostFavoriteViewSet, ProductFavoriteViewSet, CartItemViewSet,
+    RegisterView, LoginView, TokenRefreshView, LogoutView, PostFavoriteViewSet, ProductFavoriteViewSet, CartItemViewSet,
     AddressViewSet, upload_avatar, delete_account, update_bio,
     toggle_post_favorite, check_post_favorite,
     toggle_product_favorite, check_product_favorite,
@@ -20,6 +20,8 @@ urlpatterns = [
     path('', include(router.urls)),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('upload-avatar/', upload_avatar, name='upload_avatar'),
     path('delete-account/', delete_account, name='delete_account'),
     path('update-bio/', update_bio, name='update_bio'),
@@ -5,12 +5,17 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import viewsets
 from rest_framework.pagination import PageNumberPagination
 
 # 序列化器
+from .account_deletion import request_account_deletion
+from .authentication import TOKEN_VERSION_CLAIM, tokens_for_user
+from .revocation import is_revoked, revoke_token
 from .serializers import RegisterSerializer
 from .serializers import LoginSerializer
 from .serializers import UserSerializer
@@ -18,9 +23,12 @@ from .serializers import PostFavoriteSerializer
 from .serializers import ProductFavoriteSerializer
 from .serializers import CartItemSerializer
 from .serializers import AddressSerializer
+from .serializers import PostFavoriteCardSerializer
+from .serializers import ProductFavoriteCardSerializer
+from shopping.serializers import main_image_prefetch
 
 # 模型
-from .models import PostFavorite, ProductFavorite, CartItem, Address
+from .models import User, PostFavorite, ProductFavorite, CartItem, Address
 
 # Create your views here.
 
@@ -49,7 +57,7 @@ class LoginView(APIView):
             user = serializer.validated_data['user']
             
             # 生成 JWT Token
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_for_user(user)
             
             # 序列化用户完整信息
             user_serializer = UserSerializer(user, context={'request': request})
@@ -63,14 +71,70 @@ class LoginView(APIView):
                 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+
+class TokenRefreshView(APIView):
+    """用刷新令牌换取新的访问令牌；开启轮换时旧刷新令牌加入吊销表"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def post(self, request):
+        try:
+            refresh = RefreshToken(request.data.get('refresh', ''))
+        except TokenError:
+            return Response({'error': '刷新令牌无效或已过期'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        if is_revoked(refresh[jwt_settings.JTI_CLAIM]):
+            return Response({'error': '刷新令牌已吊销'}, status=status.HTTP_401_UNAUTHORIZED)
+        user = User.objects.filter(id=refresh.get(jwt_settings.USER_ID_CLAIM), is_active=True).first()
+        if user is None or user.token_version != refresh.get(TOKEN_VERSION_CLAIM, 0):
+            return Response({'error': '刷新令牌已失效，请重新登录'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        if not jwt_settings.ROTATE_REFRESH_TOKENS:
+            return Response({'access': str(refresh.access_token)}, status=status.HTTP_200_OK)
+
+        # 上面的检查和吊销之间，同一刷新令牌的并发请求可能都通过了检查；
+        # 以吊销记录的插入为准，只有插入成功的请求能换取新令牌
+        if jwt_settings.BLACKLIST_AFTER_ROTATION and not revoke_token(refresh, user):
+            return Response({'error': '刷新令牌已吊销'}, status=status.HTTP_401_UNAUTHORIZED)
+        new_refresh = tokens_for_user(user)
+        return Response({
+            'access': str(new_refresh.access_token),
+            'refresh': str(new_refresh),
+        }, status=status.HTTP_200_OK)
+
+
+class LogoutView(APIView):
+    """退出登录：吊销当前访问令牌，以及请求中提供的刷新令牌"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        revoke_token(request.auth, request.user)
+        raw_refresh = request.data.get('refresh')
+        if raw_refresh:
+            try:
+                refresh = RefreshToken(raw_refresh)
+            except TokenError:
+                refresh = None
+            # simplejwt 把用户 ID 声明存为字符串
+            if refresh is not None and str(refresh.get(jwt_settings.USER_ID_CLAIM)) == str(request.user.id):
+                revoke_token(refresh, request.user)
+        return Response({'message': '已退出登录'}, status=status.HTTP_200_OK)
+
         
+AVATAR_UPDATE_FIELDS = [
+    'avatar', 'avatar_version',
+    'avatar_width', 'avatar_height', 'avatar_dominant_color', 'avatar_blurhash', 'avatar_metadata_failed',
+]
+
 # 指定可以处理哪些方法
 @api_view(['POST'])
 # 指定权限类
 @permission_classes([IsAuthenticated])
 def upload_avatar(request):
     """上传或更新用户头像"""
-    user = request.user
+    # request.user 可能来自认证缓存，旧头像和头像版本号以数据库中的记录为准
+    user = User.objects.get(pk=request.user.pk)
         
     # 检查是否有文件上传
     if 'avatar' not in request.FILES:
@@ -82,7 +146,8 @@ def upload_avatar(request):
         
     # 保存新头像
     user.avatar = request.FILES['avatar']
-    user.save()
+    # 只保存头像相关字段，不会写回其他字段（密码、令牌版本等）；版本号和元数据由 pre_save 信号更新
+    user.save(update_fields=AVATAR_UPDATE_FIELDS)
         
     # 返回更新后的用户信息
     serializer = UserSerializer(user, context={'request': request})
@@ -107,7 +172,7 @@ def update_bio(request):
         return Response({'error': '个人简介不能超过 300 字符'}, status=status.HTTP_400_BAD_REQUEST)
 
     user.bio = bio
-    user.save()
+    user.save(update_fields=['bio'])
 
     serializer = UserSerializer(user, context={'request': request})
     return Response({
@@ -131,23 +196,12 @@ def delete_account(request):
             'error': '密码错误'
         }, status=status.HTTP_400_BAD_REQUEST)
         
-    try:
-        # 删除用户头像文件（如果存在且不是默认头像）
-        if user.avatar and user.avatar.name != 'avatars/default.png':
-            user.avatar.delete(save=False)
-                
-        # 删除用户账户
-        username = user.username
-        user.delete()
-                
-        return Response({
-            'message': f'账户 {username} 已成功注销'
-        }, status=status.HTTP_200_OK)
-                
-    except Exception as e:
-        return Response({
-            'error': f'账户注销失败：{str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    # 账户立即停用，关联数据和文件由后台任务分批删除
+    job = request_account_deletion(user)
+    return Response({
+        'message': f'账户 {user.username} 已注销，相关数据将在后台删除',
+        'job_id': job.id,
+    }, status=status.HTTP_202_ACCEPTED)
 
 
 # 自定义分页类，允许客户端指定page_size
@@ -164,14 +218,27 @@ class PostFavoriteViewSet(viewsets.ModelViewSet):
     pagination_class = LargeResultsSetPagination
         
     def get_queryset(self):
-        return PostFavorite.objects.filter(user=self.request.user).select_related(
+        queryset = PostFavorite.objects.filter(user=self.request.user).select_related(
             'post', 
-            'post__author'
+            'post__author',
+            'user'
         ).prefetch_related(
             'post__images',
             'post__tags',
             'post__products'
         )
+        if self.is_card_view():
+            queryset = queryset.prefetch_related(main_image_prefetch('post__products__images'))
+        return queryset
+
+    def is_card_view(self):
+        """?view=card 时返回精简的卡片投影"""
+        return self.request.query_params.get('view') == 'card'
+
+    def get_serializer_class(self):
+        if self.is_card_view():
+            return PostFavoriteCardSerializer
+        return PostFavoriteSerializer
         
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -214,13 +281,25 @@ class ProductFavoriteViewSet(viewsets.ModelViewSet):
     pagination_class = LargeResultsSetPagination
 
     def get_queryset(self):
-        return ProductFavorite.objects.filter(user=self.request.user).select_related(
+        queryset = ProductFavorite.objects.filter(user=self.request.user).select_related(
             'product', 
             'user'
-        ).prefetch_related(
+        )
+        if self.is_card_view():
+            return queryset.prefetch_related(main_image_prefetch('product__images'))
+        return queryset.prefetch_related(
             'product__images'
         )
 
+    def is_card_view(self):
+        """?view=card 时返回精简的卡片投影"""
+        return self.request.query_params.get('view') == 'card'
+
+    def get_serializer_class(self):
+        if self.is_card_view():
+            return ProductFavoriteCardSerializer
+        return ProductFavoriteSerializer
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
@@ -16,6 +16,7 @@ export const favoriteAPI = {
         return apiClient.get('/post-favorites/', { 
             params: {
                 page_size: 1000,  // 获取最多1000条
+                view: 'card',  // 精简卡片投影，不展开回复树
                 ...params
             }
         });
@@ -16,6 +16,7 @@ const productFavoriteAPI = {
         return axios.get('/product-favorites/', {
             params: {
                 page_size: 1000,  // 获取最多1000条
+                view: 'card',  // 精简卡片投影，不再逐条查询收藏状态和评论数
                 ...params
             }
         })